@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import AIConfig, ValidationRule, ValidationLog, AITrainingData, AIFeedback, ModelPerformance, ValidationCache
+from .models import (
+    AIConfig, ValidationRule, ValidationLog, ValidationJob, AITrainingData, AIFeedback, ModelPerformance, ValidationCache,
+    InsightRun, InsightRunChunk, RetryBatch
+)
 
 @admin.register(AIConfig)
 class AIConfigAdmin(admin.ModelAdmin):
@@ -21,22 +24,35 @@ class AIConfigAdmin(admin.ModelAdmin):
 
 @admin.register(ValidationRule)
 class ValidationRuleAdmin(admin.ModelAdmin):
-    list_display = ('name', 'validation_type', 'confidence_threshold', 'is_active', 'created_at')
+    list_display = ('name', 'validation_type', 'confidence_threshold', 'prescreen_enabled', 'is_active', 'created_at')
     list_filter = ('validation_type', 'is_active', 'created_at')
     search_fields = ('name', 'prompt_template')
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(ValidationLog)
 class ValidationLogAdmin(admin.ModelAdmin):
-    list_display = ('checkin', 'validation_rule', 'success', 'is_approved', 'confidence_score', 'processing_time', 'created_at')
-    list_filter = ('success', 'is_approved', 'validation_rule__validation_type', 'created_at')
+    list_display = ('checkin', 'validation_rule', 'decision_source', 'success', 'is_approved', 'confidence_score', 'processing_time', 'prompt_tokens', 'output_tokens', 'retry_count', 'next_retry_at', 'created_at')
+    list_filter = ('success', 'is_approved', 'decision_source', 'model_name', 'validation_rule__validation_type', 'created_at')
     search_fields = ('checkin__habit__title', 'checkin__habit__goal__user__email')
-    readonly_fields = ('created_at', 'completed_at')
-    raw_id_fields = ('checkin', 'validation_rule')
+    readonly_fields = ('ai_response_raw', 'ai_response_parsed', 'created_at', 'completed_at')
+    raw_id_fields = ('checkin', 'validation_rule', 'retry_batch')
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('checkin', 'checkin__habit', 'validation_rule')
 
+@admin.register(RetryBatch)
+class RetryBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'requested_by', 'total', 'created_at')
+    list_filter = ('created_at',)
+    readonly_fields = ('id', 'requested_by', 'filters', 'total', 'created_at')
+
+@admin.register(ValidationJob)
+class ValidationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'checkin', 'status', 'created_at', 'updated_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('checkin',)
+
 @admin.register(AITrainingData)
 class AITrainingDataAdmin(admin.ModelAdmin):
     list_display = ('data_type', 'is_correct', 'confidence_score', 'used_for_training', 'created_at')
@@ -54,9 +70,9 @@ class AIFeedbackAdmin(admin.ModelAdmin):
 
 @admin.register(ModelPerformance)
 class ModelPerformanceAdmin(admin.ModelAdmin):
-    list_display = ('validation_rule', 'date', 'total_requests', 'successful_requests', 'average_confidence', 'user_accuracy_score')
+    list_display = ('validation_rule', 'date', 'total_requests', 'successful_requests', 'average_confidence', 'average_processing_time', 'user_accuracy_score')
     list_filter = ('date', 'validation_rule__validation_type')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('latency_percentiles', 'latency_sketch', 'created_at', 'updated_at')
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('validation_rule')
@@ -70,4 +86,17 @@ class ValidationCacheAdmin(admin.ModelAdmin):
     
     def input_hash_short(self, obj):
         return obj.input_hash[:16] + '...'
-    input_hash_short.short_description = 'Input Hash'
\ No newline at end of file
+    input_hash_short.short_description = 'Input Hash'
+
+class InsightRunChunkInline(admin.TabularInline):
+    model = InsightRunChunk
+    extra = 0
+    can_delete = False
+    readonly_fields = ('first_user_id', 'last_user_id', 'user_count', 'status', 'claimed_at', 'deferrals', 'insights_created', 'fallback_insights', 'template_insights', 'reused_insights', 'failed_users', 'duration', 'error_message')
+
+@admin.register(InsightRun)
+class InsightRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'total_users', 'processed_users', 'fallback_insights', 'template_insights', 'reused_insights', 'failed_users', 'throughput', 'started_at', 'finished_at')
+    list_filter = ('status', 'started_at')
+    readonly_fields = ('throughput', 'duration', 'started_at', 'finished_at')
+    inlines = [InsightRunChunkInline]
@@ -6,4 +6,9 @@ class AiValidationConfig(AppConfig):
     name = 'ai_validation'
 
     def ready(self):
-        import ai_validation.signals
\ No newline at end of file
+        import ai_validation.checks
+        import ai_validation.signals
+        from django.conf import settings
+        if settings.AI_CLIENT_PREWARM:
+            from .backends import prewarm_validation_backend
+            prewarm_validation_backend(background=True)
\ No newline at end of file
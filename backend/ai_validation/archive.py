@@ -0,0 +1,66 @@
+import gzip
+import json
+import logging
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from .models import ValidationLog
+
+logger = logging.getLogger(__name__)
+
+def archive_validation_logs(cutoff=None, chunk_size=None):
+    """Move ValidationLogs older than the retention window into archive files.
+
+    Logs are read oldest first in chunks of `chunk_size`. Each chunk is
+    written as gzipped JSON lines, one file per day, under
+    AI_VALIDATION_LOG_ARCHIVE_DIR/<YYYY-MM-DD>/<first id>-<last id>.jsonl.gz
+    in default storage, and then deleted with its payloads. File names
+    depend only on the logs they hold, so a re-run after a crash rewrites
+    the same files.
+    """
+    cutoff = cutoff or timezone.now() - timedelta(days=settings.AI_VALIDATION_LOG_RETENTION_DAYS)
+    chunk_size = chunk_size or settings.AI_VALIDATION_LOG_ARCHIVE_CHUNK_SIZE
+    archived = 0
+    files = []
+
+    while True:
+        logs = list(
+            ValidationLog.objects.filter(created_at__lt=cutoff)
+            .select_related('payload')
+            .order_by('created_at', 'id')[:chunk_size]
+        )
+        if not logs:
+            break
+
+        for day, day_logs in groupby(logs, key=lambda log: log.created_at.date()):
+            files.append(_write_archive(day, list(day_logs)))
+
+        with transaction.atomic():
+            ValidationLog.objects.filter(id__in=[log.id for log in logs]).delete()
+        archived += len(logs)
+
+        if len(logs) < chunk_size:
+            break
+
+    if archived:
+        logger.info(f"Archived {archived} validation logs older than {cutoff.date()} into {len(files)} files")
+    return {'archived': archived, 'files': files}
+
+def _write_archive(day, logs):
+    lines = []
+    for log in logs:
+        record = {field.attname: getattr(log, field.attname) for field in ValidationLog._meta.concrete_fields}
+        record['ai_response_raw'] = log.ai_response_raw
+        record['ai_response_parsed'] = log.ai_response_parsed
+        lines.append(json.dumps(record, cls=DjangoJSONEncoder))
+
+    ids = sorted(log.id for log in logs)
+    name = f"{settings.AI_VALIDATION_LOG_ARCHIVE_DIR}/{day.isoformat()}/{ids[0]}-{ids[-1]}.jsonl.gz"
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(gzip.compress('\n'.join(lines).encode() + b'\n')))
@@ -0,0 +1,231 @@
+import io
+import logging
+import math
+import mimetypes
+import re
+import shutil
+import subprocess
+import wave
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_RATE = 8000  # Hz; enough for energy and zero-crossing features
+FRAME_SECONDS = 0.03
+SILENCE_RMS = 0.003  # About -50 dBFS
+VOICED_MAX_CROSSING_RATE = 2000  # Zero crossings per second; noise crosses far more often
+MAX_SILENCE_RATIO = 0.95  # Share of silent frames above which a recording counts as silent
+FULL_SCALE = 32768.0
+
+FFMPEG_DURATION_RE = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+WAV_MIME_TYPE = 'audio/wav'
+WAV_HEADER_BYTES = 44
+COMPRESSED_AUDIO_BITRATE = '32k'  # Mono AAC; the model hears audio at a lower resolution than this
+COMPRESSED_AUDIO_MIME_TYPE = 'audio/aac'
+MIN_RESAMPLED_RATE = 8000  # Hz; WAV is not resampled below telephone quality
+
+class AudioDecodeError(Exception):
+    """Raised when an audio proof cannot be decoded locally"""
+
+def decode_audio(data, max_seconds=None):
+    """Decode audio file contents to a mono int16 array at about ANALYSIS_RATE.
+
+    WAV is read with the standard library; other formats go through ffmpeg
+    when it is installed. Only the first `max_seconds` are decoded.
+    Returns (samples, sample_rate, duration) where `duration` covers the
+    whole file.
+    """
+    max_seconds = max_seconds or settings.AI_AUDIO_MAX_ANALYZED_SECONDS
+    try:
+        return _decode_wav(data, max_seconds)
+    except (wave.Error, EOFError):
+        return _decode_with_ffmpeg(data, max_seconds)
+
+def _decode_wav(data, max_seconds):
+    with wave.open(io.BytesIO(data)) as reader:
+        channels = reader.getnchannels()
+        width = reader.getsampwidth()
+        rate = reader.getframerate()
+        total_frames = reader.getnframes()
+        frames = reader.readframes(min(total_frames, int(max_seconds * rate)))
+
+    samples = _wav_samples(frames, width)
+
+    # First channel only, decimated towards the analysis rate
+    step = max(rate // ANALYSIS_RATE, 1)
+    return samples[::channels * step], rate / step, total_frames / rate
+
+def _wav_samples(frames, width):
+    """Interleaved WAV frames as an int16 array"""
+    if width == 1:
+        return (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+    if width == 2:
+        return np.frombuffer(frames, dtype='<i2')
+    if width == 4:
+        return (np.frombuffer(frames, dtype='<i4') >> 16).astype(np.int16)
+    raise AudioDecodeError(f"Unsupported WAV sample width: {width * 8} bits")
+
+def _decode_with_ffmpeg(data, max_seconds):
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise AudioDecodeError("Not a WAV file and ffmpeg is not installed")
+    try:
+        process = subprocess.run(
+            [ffmpeg, '-hide_banner', '-i', 'pipe:0', '-t', str(max_seconds),
+             '-f', 's16le', '-ac', '1', '-ar', str(ANALYSIS_RATE), 'pipe:1'],
+            input=data, capture_output=True, timeout=60, check=True
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        raise AudioDecodeError(f"ffmpeg could not decode the audio: {str(e)}")
+
+    samples = np.frombuffer(process.stdout, dtype='<i2')
+    match = FFMPEG_DURATION_RE.search(process.stderr.decode(errors='replace'))
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    else:
+        duration = len(samples) / ANALYSIS_RATE
+    return samples, ANALYSIS_RATE, duration
+
+def fit_audio_inline(data, mime_type, max_bytes):
+    """Return (data, mime_type) of at most `max_bytes` for an inline model request.
+
+    Larger audio is re-encoded with ffmpeg as mono AAC at
+    COMPRESSED_AUDIO_BITRATE. Without ffmpeg a WAV is reduced to its first
+    channel and resampled to 16 bits at the highest rate that fits, but
+    not below MIN_RESAMPLED_RATE. Raises AudioDecodeError when the audio
+    cannot be made to fit.
+    """
+    if len(data) <= max_bytes:
+        return data, mime_type
+    if shutil.which('ffmpeg'):
+        data, mime_type = _compress_with_ffmpeg(data), COMPRESSED_AUDIO_MIME_TYPE
+    elif mime_type == WAV_MIME_TYPE:
+        data = _resample_wav(data, max_bytes)
+    else:
+        raise AudioDecodeError("Audio proof is too large to validate and ffmpeg is not installed to compress it")
+    if len(data) > max_bytes:
+        raise AudioDecodeError("Audio proof is too large to validate, even compressed")
+    return data, mime_type
+
+def _compress_with_ffmpeg(data):
+    try:
+        process = subprocess.run(
+            [shutil.which('ffmpeg'), '-hide_banner', '-i', 'pipe:0', '-vn', '-ac', '1',
+             '-c:a', 'aac', '-b:a', COMPRESSED_AUDIO_BITRATE, '-f', 'adts', 'pipe:1'],
+            input=data, capture_output=True, timeout=120, check=True
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        raise AudioDecodeError(f"ffmpeg could not compress the audio: {str(e)}")
+    return process.stdout
+
+def _resample_wav(data, max_bytes):
+    try:
+        with wave.open(io.BytesIO(data)) as reader:
+            channels = reader.getnchannels()
+            width = reader.getsampwidth()
+            rate = reader.getframerate()
+            frames = reader.readframes(reader.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise AudioDecodeError(f"Could not read the WAV file: {str(e)}")
+
+    samples = _wav_samples(frames, width)[::channels]
+    step = math.ceil(len(samples) * 2 / (max_bytes - WAV_HEADER_BYTES))
+    if rate / step < MIN_RESAMPLED_RATE:
+        raise AudioDecodeError("Audio proof is too long to validate without ffmpeg to compress it")
+
+    # Averaging each block of `step` samples low-passes the audio before the rate drops
+    usable = len(samples) // step * step
+    resampled = samples[:usable].reshape(-1, step).mean(axis=1).astype('<i2')
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(round(rate / step))
+        writer.writeframes(resampled.tobytes())
+    return output.getvalue()
+
+def audio_features(samples, sample_rate, duration):
+    """Energy features of decoded audio, computed over FRAME_SECONDS frames.
+
+    `rms` is relative to full scale. A frame is silent below SILENCE_RMS
+    and voiced when it is louder and crosses zero at most
+    VOICED_MAX_CROSSING_RATE times per second, as speech and most
+    instruments do and broadband noise does not.
+    """
+    frame_length = max(int(sample_rate * FRAME_SECONDS), 2)
+    frame_count = len(samples) // frame_length
+    if not frame_count:
+        return {'duration': duration, 'rms': 0.0, 'voiced_ratio': 0.0, 'silence_ratio': 1.0}
+
+    energies, crossings, square_sum = _frame_energies(samples, frame_length, frame_count)
+    silent = energies < SILENCE_RMS
+    voiced = ~silent & (crossings <= VOICED_MAX_CROSSING_RATE * frame_length / sample_rate)
+    return {
+        'duration': duration,
+        'rms': math.sqrt(square_sum / (frame_count * frame_length)),
+        'voiced_ratio': np.count_nonzero(voiced) / frame_count,
+        'silence_ratio': np.count_nonzero(silent) / frame_count,
+    }
+
+def _frame_energies(samples, frame_length, frame_count):
+    """Per-frame RMS and zero-crossing counts, plus the total squared amplitude"""
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length).astype(np.float64) / FULL_SCALE
+    squares = np.square(frames)
+    signs = np.signbit(frames)
+    crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1)
+    return np.sqrt(squares.mean(axis=1)), crossings, float(squares.sum())
+
+def screen_audio(features, target_minutes):
+    """Reject obviously invalid recordings before the model.
+
+    Returns a pre-screen decision dict (see prescreen_text) for silent
+    recordings or ones too short for the habit's target duration, else
+    None.
+    """
+    min_duration = max(
+        settings.AI_AUDIO_MIN_DURATION,
+        target_minutes * 60 * settings.AI_AUDIO_MIN_TARGET_SHARE
+    )
+    rejection = None
+    if features['duration'] < min_duration:
+        rejection = f"Audio is too short ({features['duration']:.0f}s, minimum {min_duration:.0f}s)"
+    elif features['rms'] < SILENCE_RMS or features['silence_ratio'] > MAX_SILENCE_RATIO:
+        rejection = "Audio is silent"
+
+    if rejection is None:
+        return None
+    return {
+        'is_approved': False,
+        'confidence': 0.1,
+        'explanation': rejection,
+        'features': features,
+        'sampled': False,
+    }
+
+def load_audio_model_input(checkin):
+    """Return (data, mime_type, features) for the check-in audio.
+
+    `features` is None when the audio cannot be decoded locally; it is then
+    left to the model.
+    """
+    audio_file = checkin.audio_proof
+    audio_file.open('rb')
+    try:
+        data = audio_file.read()
+    finally:
+        audio_file.close()
+
+    try:
+        samples, sample_rate, duration = decode_audio(data)
+        features = audio_features(samples, sample_rate, duration)
+    except AudioDecodeError as e:
+        logger.warning(f"Could not analyse audio for checkin {checkin.id}: {str(e)}")
+        features = None
+
+    if data[:4] == b'RIFF':
+        mime_type = WAV_MIME_TYPE
+    else:
+        mime_type = mimetypes.guess_type(audio_file.name)[0] or 'application/octet-stream'
+    return data, mime_type, features
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+class ValidationBackend:
+    """Produces model responses for AIService.
+
+    `generate` and `agenerate` take the request contents plus the validation
+    type ('photo', 'text', ..., or 'insight') and return an object with a
+    `.text` attribute, like a Gemini response, and optionally
+    `.usage_metadata` with prompt and candidates token counts.
+    """
+
+    model_name = ''
+
+    def __init__(self, ai_service):
+        self.ai_service = ai_service
+
+    def generate(self, contents, validation_type, generation_config=None, timeout=None):
+        raise NotImplementedError
+
+    async def agenerate(self, contents, validation_type, generation_config=None, timeout=None):
+        raise NotImplementedError
+
+    def generate_stream(self, contents, validation_type, generation_config=None, timeout=None):
+        """Yield the response text in chunks as it is generated"""
+        yield self.generate(contents, validation_type, generation_config=generation_config, timeout=timeout).text
+
+    @classmethod
+    def prewarm(cls, connect=True):
+        """Prepare process-level clients ahead of the first request"""
+
+class GeminiBackend(ValidationBackend):
+    """Google Gemini via google.generativeai"""
+
+    model_name = 'gemini-2.5-flash'
+
+    @classmethod
+    def prewarm(cls, connect=True):
+        from .clients import gemini_clients
+        gemini_clients.prewarm([cls.model_name], connect=connect)
+
+    def generate(self, contents, validation_type, generation_config=None, timeout=None):
+        model = self.ai_service.get_model(self.model_name)
+        return model.generate_content(
+            contents,
+            generation_config=generation_config,
+            request_options={'timeout': timeout} if timeout else None
+        )
+
+    async def agenerate(self, contents, validation_type, generation_config=None, timeout=None):
+        model = self.ai_service.get_model(self.model_name)
+        return await model.generate_content_async(
+            contents,
+            generation_config=generation_config,
+            request_options={'timeout': timeout} if timeout else None
+        )
+
+    def generate_stream(self, contents, validation_type, generation_config=None, timeout=None):
+        model = self.ai_service.get_model(self.model_name)
+        response = model.generate_content(
+            contents,
+            generation_config=generation_config,
+            stream=True,
+            request_options={'timeout': timeout} if timeout else None
+        )
+        for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+class FakeResponse:
+    def __init__(self, text, prompt_token_count=0):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt_token_count, _estimate_tokens(text))
+
+def _estimate_tokens(text):
+    """Roughly four characters per token, as Gemini counts English text"""
+    return len(text) // 4 + 1 if text else 0
+
+DEFAULT_FAKE_VERDICT = {
+    'confidence': 0.9,
+    'is_approved': True,
+    'explanation': 'Fake backend approval',
+}
+
+DEFAULT_FAKE_INSIGHT = {
+    'strength': 'Consistent daily tracking',
+    'improvement_area': 'Keep the same time each day',
+    'suggestion': 'Set a reminder for your usual check-in time',
+    'motivational_note': 'Small steps every day add up!',
+    'confidence': 0.8,
+}
+
+STREAM_CHUNKS = 4  # Chunks per streamed fake response
+
+_fake_rng = None
+_fake_rng_lock = threading.Lock()
+
+def _get_fake_rng():
+    """One seeded RNG per process so latencies and errors follow the configured distribution"""
+    global _fake_rng
+    with _fake_rng_lock:
+        if _fake_rng is None:
+            _fake_rng = random.Random(settings.AI_FAKE_BACKEND.get('SEED'))
+        return _fake_rng
+
+class FakeGeminiBackend(ValidationBackend):
+    """Offline, deterministic stand-in for Gemini for load tests.
+
+    Configured by settings.AI_FAKE_BACKEND:
+      LATENCY     'fixed:<s>', 'uniform:<low>:<high>' or 'lognormal:<median>:<sigma>'
+      ERROR_RATE  share of calls failing with ERROR (default 429 quota errors)
+      ERROR       'quota', 'unavailable' or 'invalid'
+      SEED        RNG seed for repeatable runs
+      RESPONSES   validation type -> verdict dict returned for that type
+    """
+
+    model_name = 'fake-gemini'
+
+    def __init__(self, ai_service):
+        super().__init__(ai_service)
+        config = settings.AI_FAKE_BACKEND
+        self.latency = config.get('LATENCY', 'fixed:0')
+        self.error_rate = config.get('ERROR_RATE', 0.0)
+        self.error = config.get('ERROR', 'quota')
+        self.responses = config.get('RESPONSES', {})
+
+    def generate(self, contents, validation_type, generation_config=None, timeout=None):
+        latency, error = self._draw()
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Fake backend call exceeded its deadline")
+        time.sleep(latency)
+        return self._respond(contents, validation_type, error)
+
+    async def agenerate(self, contents, validation_type, generation_config=None, timeout=None):
+        latency, error = self._draw()
+        if timeout is not None and latency > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError("Fake backend call exceeded its deadline")
+        await asyncio.sleep(latency)
+        return self._respond(contents, validation_type, error)
+
+    def generate_stream(self, contents, validation_type, generation_config=None, timeout=None):
+        latency, error = self._draw()
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Fake backend call exceeded its deadline")
+        text = self._respond(contents, validation_type, error).text
+        # Spread the latency over a few chunks, as a streamed response would
+        chunk_size = max(len(text) // STREAM_CHUNKS + 1, 1)
+        for start in range(0, len(text), chunk_size):
+            time.sleep(latency / STREAM_CHUNKS)
+            yield text[start:start + chunk_size]
+
+    def _draw(self):
+        rng = _get_fake_rng()
+        with _fake_rng_lock:
+            kind, *params = self.latency.split(':')
+            params = [float(param) for param in params]
+            if kind == 'uniform':
+                latency = rng.uniform(params[0], params[1])
+            elif kind == 'lognormal':
+                latency = params[0] * rng.lognormvariate(0, params[1])
+            else:
+                latency = params[0] if params else 0.0
+            error = rng.random() < self.error_rate
+        return latency, error
+
+    def _respond(self, contents, validation_type, error):
+        if error:
+            raise self._make_error()
+        if validation_type == 'insight':
+            payload = self.responses.get('insight', DEFAULT_FAKE_INSIGHT)
+        else:
+            payload = self.responses.get(validation_type, DEFAULT_FAKE_VERDICT)
+        prompt = ' '.join(part for part in contents if isinstance(part, str)) if isinstance(contents, list) else str(contents)
+        return FakeResponse(json.dumps(payload), _estimate_tokens(prompt))
+
+    def _make_error(self):
+        from google.api_core import exceptions as google_exceptions
+        if self.error == 'unavailable':
+            return google_exceptions.ServiceUnavailable("Fake backend unavailable")
+        if self.error == 'invalid':
+            return google_exceptions.InvalidArgument("Fake backend rejected the request")
+        return google_exceptions.ResourceExhausted("Fake backend quota exceeded")
+
+def get_validation_backend(ai_service):
+    """Instantiate the backend class named by settings.AI_VALIDATION_BACKEND"""
+    return import_string(settings.AI_VALIDATION_BACKEND)(ai_service)
+
+def prewarm_validation_backend(connect=True, background=False):
+    """Warm the configured backend's clients, optionally on a daemon thread"""
+    backend_class = import_string(settings.AI_VALIDATION_BACKEND)
+    if not background:
+        backend_class.prewarm(connect=connect)
+        return None
+    thread = threading.Thread(
+        target=backend_class.prewarm, kwargs={'connect': connect}, name='ai-client-prewarm', daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,78 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from .checks import shared_cache_configured
+
+logger = logging.getLogger(__name__)
+
+class TextBatchCollector:
+    """Collect text check-ins for shared validation prompts.
+
+    Check-ins are appended to the open batch in the cache, one key per
+    slot. The first check-in of a batch schedules a flush after `window`
+    seconds; the one that fills it to `max_size` closes it and flushes
+    right away. A flush claims the batch once, so the timer and the size
+    trigger never validate the same check-ins twice.
+
+    The batch lives in the cache and is drained by a worker, so batching
+    needs a cache shared by web and worker processes; with a
+    process-local one every check-in is validated on its own.
+    """
+
+    def __init__(self, name='text', max_size=None, window=None):
+        self.prefix = f'ai_batch:{name}'
+        self.max_size = max_size or settings.AI_TEXT_BATCH_MAX_SIZE
+        self.window = window if window is not None else settings.AI_TEXT_BATCH_WINDOW
+        # Slots outlive the window comfortably in case the flush task is late
+        self.timeout = max(int(self.window * 10), 60)
+
+    def add(self, checkin_id):
+        """Queue a check-in; return False if it must be validated on its own"""
+        from .tasks import validate_text_batch_task
+
+        if not shared_cache_configured():
+            # The worker draining the batch could not see this process's slots
+            return False
+        try:
+            cache.add(f'{self.prefix}:current', 1, None)
+            batch_id = cache.get(f'{self.prefix}:current')
+            size_key = f'{self.prefix}:{batch_id}:size'
+            cache.add(size_key, 0, self.timeout)
+            slot = cache.incr(size_key)
+            cache.set(f'{self.prefix}:{batch_id}:{slot}', checkin_id, self.timeout)
+            if cache.get(f'{self.prefix}:{batch_id}:claimed'):
+                # Flushed between our incr and set: this slot was not read
+                return False
+        except Exception as e:
+            logger.warning(f"Text batch collector unavailable: {str(e)}")
+            return False
+
+        if slot == 1:
+            validate_text_batch_task.apply_async((batch_id,), countdown=self.window)
+        if slot == self.max_size:
+            try:
+                cache.incr(f'{self.prefix}:current')
+            except Exception as e:
+                logger.warning(f"Failed to open a new text batch: {str(e)}")
+            validate_text_batch_task.delay(batch_id)
+        return True
+
+    def drain(self, batch_id):
+        """Claim a batch and return its check-in ids, or [] if already claimed"""
+        if not cache.add(f'{self.prefix}:{batch_id}:claimed', 1, self.timeout):
+            return []
+
+        try:
+            # Batches closed by the timer stop taking new check-ins too
+            if cache.get(f'{self.prefix}:current') == batch_id:
+                cache.incr(f'{self.prefix}:current')
+        except Exception as e:
+            logger.warning(f"Failed to open a new text batch: {str(e)}")
+
+        size = cache.get(f'{self.prefix}:{batch_id}:size', 0)
+        keys = [f'{self.prefix}:{batch_id}:{slot}' for slot in range(1, size + 1)]
+        entries = cache.get_many(keys)
+        cache.delete_many(keys + [f'{self.prefix}:{batch_id}:size'])
+        return [entries[key] for key in keys if key in entries]
+
+text_batch_collector = TextBatchCollector()
@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ValidationCache
+
+logger = logging.getLogger(__name__)
+
+SHARED_KEY_PREFIX = 'ai_validation:result:'
+GENERATION_KEY = 'ai_validation:result_generation'
+
+class ValidationResultCache:
+    """Layered cache in front of the ValidationCache table.
+
+    Lookups go process-local LRU -> Django cache backend -> database, and
+    hits are promoted to the faster tiers. Usage counts are buffered and
+    written back to ValidationCache in batches instead of on every hit.
+
+    Local entries are kept for at most `local_ttl` seconds. invalidate()
+    bumps a generation number in the shared cache; each process compares
+    it at most every `check_interval` seconds and drops its local entries
+    when it has changed.
+    """
+
+    TIERS = ('local', 'shared', 'database')
+
+    def __init__(self, max_entries=None, ttl=None, flush_every=None, flush_interval=None,
+                 local_ttl=None, check_interval=None):
+        self.max_entries = max_entries or settings.AI_VALIDATION_LRU_SIZE
+        self.ttl = ttl or settings.AI_VALIDATION_CACHE_TTL
+        self.local_ttl = local_ttl or settings.AI_VALIDATION_LRU_TTL
+        self.check_interval = check_interval if check_interval is not None else settings.AI_VALIDATION_LRU_CHECK_INTERVAL
+        self.flush_every = flush_every or settings.AI_VALIDATION_USAGE_FLUSH_EVERY
+        self.flush_interval = flush_interval or settings.AI_VALIDATION_USAGE_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drop process-local entries, pending usage and counters"""
+        with self._lock:
+            self._local = OrderedDict()
+            self._generation = None
+            self._checked_at = 0.0
+            self._pending_usage = defaultdict(int)
+            self._pending_hits = 0
+            self._last_flush = time.monotonic()
+            self._stats = {tier: {'hits': 0, 'misses': 0, 'evictions': 0} for tier in self.TIERS}
+
+    def get(self, key):
+        """Return the cached entry for key, or None"""
+        entry = self._get_local(key)
+        if entry is None:
+            entry = self._get_shared(key)
+            if entry is None:
+                entry = self._get_database(key)
+                if entry is None:
+                    return None
+                self._set_shared(key, entry)
+            self._set_local(key, entry)
+
+        self._record_usage(key)
+        return entry
+
+    def store(self, key, validation_rule, input_preview, ai_response, confidence, is_approved):
+        """Persist a validation result and populate the faster tiers"""
+        # A concurrent writer may have stored the same key; its row wins
+        ValidationCache.objects.get_or_create(
+            input_hash=key,
+            defaults={
+                'validation_rule': validation_rule,
+                'input_data_preview': input_preview,
+                'ai_response': ai_response,
+                'confidence_score': confidence,
+                'is_approved': is_approved,
+            }
+        )
+        entry = {
+            'confidence': confidence,
+            'is_approved': is_approved,
+            'ai_response': ai_response,
+        }
+        self._set_shared(key, entry)
+        self._set_local(key, entry)
+
+    def invalidate(self):
+        """Drop process-local entries here and signal other processes to drop theirs"""
+        try:
+            cache.add(GENERATION_KEY, 0, None)
+            cache.incr(GENERATION_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to bump validation cache generation: {str(e)}")
+        with self._lock:
+            self._local.clear()
+
+    def flush_usage(self):
+        """Write buffered usage counts back to ValidationCache"""
+        with self._lock:
+            pending, self._pending_usage = self._pending_usage, defaultdict(int)
+            self._pending_hits = 0
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        # One UPDATE per distinct increment rather than one per key
+        keys_by_count = defaultdict(list)
+        for key, count in pending.items():
+            keys_by_count[count].append(key)
+
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                for count, keys in keys_by_count.items():
+                    ValidationCache.objects.filter(input_hash__in=keys).update(
+                        usage_count=F('usage_count') + count,
+                        last_used=now
+                    )
+        except Exception as e:
+            logger.warning(f"Failed to flush validation cache usage: {str(e)}")
+            return 0
+
+        return len(pending)
+
+    def stats(self):
+        """Hit/miss/eviction counters per tier plus local occupancy"""
+        with self._lock:
+            return {
+                'tiers': {tier: dict(counters) for tier, counters in self._stats.items()},
+                'local_entries': len(self._local),
+                'local_max_entries': self.max_entries,
+                'pending_usage_updates': len(self._pending_usage),
+            }
+
+    def _get_local(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(now)
+            item = self._local.get(key)
+            if item is not None and now - item[1] >= self.local_ttl:
+                del self._local[key]
+                item = None
+            if item is None:
+                self._stats['local']['misses'] += 1
+                return None
+            self._local.move_to_end(key)
+            self._stats['local']['hits'] += 1
+            return item[0]
+
+    def _check_generation(self, now):
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            generation = cache.get(GENERATION_KEY, 0)
+        except Exception as e:
+            logger.warning(f"Failed to read validation cache generation: {str(e)}")
+            return
+        if self._generation is not None and generation != self._generation:
+            self._local.clear()
+        self._generation = generation
+
+    def _set_local(self, key, entry):
+        with self._lock:
+            self._local[key] = (entry, time.monotonic())
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._stats['local']['evictions'] += 1
+
+    def _get_shared(self, key):
+        try:
+            entry = cache.get(SHARED_KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Shared validation cache unavailable: {str(e)}")
+            entry = None
+        with self._lock:
+            self._stats['shared']['hits' if entry is not None else 'misses'] += 1
+        return entry
+
+    def _set_shared(self, key, entry):
+        try:
+            cache.set(SHARED_KEY_PREFIX + key, entry, self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write shared validation cache: {str(e)}")
+
+    def _get_database(self, key):
+        row = ValidationCache.objects.filter(input_hash=key).values(
+            'confidence_score', 'is_approved', 'ai_response'
+        ).first()
+        with self._lock:
+            self._stats['database']['hits' if row else 'misses'] += 1
+        if row is None:
+            return None
+        return {
+            'confidence': row['confidence_score'],
+            'is_approved': row['is_approved'],
+            'ai_response': row['ai_response'],
+        }
+
+    def _record_usage(self, key):
+        with self._lock:
+            self._pending_usage[key] += 1
+            self._pending_hits += 1
+            should_flush = (
+                self._pending_hits >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if should_flush:
+            self.flush_usage()
+
+validation_cache = ValidationResultCache()
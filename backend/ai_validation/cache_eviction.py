@@ -0,0 +1,159 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Length
+from django.utils import timezone
+from .cache import SHARED_KEY_PREFIX, validation_cache
+from .models import ValidationCache
+
+logger = logging.getLogger(__name__)
+
+EVICTION_LOCK_KEY = 'ai_validation:cache_eviction:lock'
+EVICTION_LOCK_TIMEOUT = 30 * 60  # Seconds; released early when a run finishes
+LAST_EVICTION_KEY = 'ai_validation:cache_eviction:last'
+ROW_OVERHEAD_BYTES = 160  # Hash, scalar columns and row header on top of the text columns
+
+def _row_size():
+    """Approximate stored size of a row: its text column lengths plus fixed overhead"""
+    return Length('input_data_preview') + Length(Cast('ai_response', TextField())) + Value(ROW_OVERHEAD_BYTES)
+
+def cache_footprint():
+    """(rows, approximate bytes) currently in the ValidationCache table"""
+    totals = ValidationCache.objects.aggregate(rows=Count('id'), size=Coalesce(Sum(_row_size()), 0))
+    return totals['rows'], totals['size']
+
+def evict_validation_cache(max_rows=None, max_bytes=None, max_age_days=None, batch_size=None):
+    """Keep the ValidationCache table within its row and byte budgets.
+
+    Rows unused for `max_age_days` are removed first. If the table is still
+    over budget, rows used fewer than AI_VALIDATION_CACHE_PROTECTED_USES
+    times are evicted least recently used first, and only then the more
+    frequently used ones, again oldest first (a segmented LRU). Deletes
+    run in transactions of at most `batch_size` rows found with a keyset
+    cursor on (last_used, id), so no statement locks the whole table.
+
+    Only one run at a time: returns {'skipped': True} while another holds
+    the lock, otherwise the eviction report, which is also kept for
+    last_eviction_report().
+    """
+    if not cache.add(EVICTION_LOCK_KEY, True, EVICTION_LOCK_TIMEOUT):
+        logger.info("Validation cache eviction already running, skipping")
+        return {'skipped': True}
+    try:
+        return _evict(
+            settings.AI_VALIDATION_CACHE_MAX_ROWS if max_rows is None else max_rows,
+            settings.AI_VALIDATION_CACHE_MAX_BYTES if max_bytes is None else max_bytes,
+            max_age_days or settings.AI_VALIDATION_CACHE_MAX_AGE_DAYS,
+            batch_size or settings.AI_VALIDATION_CACHE_EVICTION_BATCH_SIZE
+        )
+    finally:
+        cache.delete(EVICTION_LOCK_KEY)
+
+def _evict(max_rows, max_bytes, max_age_days, batch_size):
+    started = time.monotonic()
+    # Write back buffered hits first so recently used rows are not evicted
+    validation_cache.flush_usage()
+
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    expired, _, batches = _delete_in_batches(ValidationCache.objects.filter(last_used__lt=cutoff), batch_size)
+
+    rows, size = cache_footprint()
+    excess_rows, excess_bytes = rows - max_rows, size - max_bytes
+    evicted = evicted_bytes = 0
+    protected_uses = settings.AI_VALIDATION_CACHE_PROTECTED_USES
+    for segment in (Q(usage_count__lt=protected_uses), Q(usage_count__gte=protected_uses)):
+        if excess_rows <= 0 and excess_bytes <= 0:
+            break
+        deleted, deleted_bytes, segment_batches = _delete_in_batches(
+            ValidationCache.objects.filter(segment), batch_size, (excess_rows, excess_bytes)
+        )
+        evicted += deleted
+        evicted_bytes += deleted_bytes
+        batches += segment_batches
+        excess_rows -= deleted
+        excess_bytes -= deleted_bytes
+
+    report = {
+        'expired': expired,
+        'evicted': evicted,
+        'evicted_bytes': evicted_bytes,
+        'batches': batches,
+        'rows': rows - evicted,
+        'bytes': size - evicted_bytes,
+        'max_rows': max_rows,
+        'max_bytes': max_bytes,
+        'duration': time.monotonic() - started,
+        'finished_at': timezone.now().isoformat(),
+    }
+    if expired or evicted:
+        # Other processes still hold deleted verdicts in their local tier
+        validation_cache.invalidate()
+    try:
+        cache.set(LAST_EVICTION_KEY, report, None)
+    except Exception as e:
+        logger.warning(f"Failed to store validation cache eviction report: {str(e)}")
+    if expired or evicted:
+        logger.info(
+            f"Validation cache eviction removed {expired} expired and {evicted} over-budget rows "
+            f"in {batches} batches; {report['rows']} rows (~{report['bytes']} bytes) remain"
+        )
+    return report
+
+def _delete_in_batches(queryset, batch_size, excess=None):
+    """Delete rows of `queryset` oldest first, in batches of `batch_size`.
+
+    With `excess` as (rows, bytes), stops once both are covered; otherwise
+    deletes every row. Returns (rows deleted, approximate bytes, batches).
+    """
+    queryset = queryset.annotate(size=_row_size()).order_by('last_used', 'id')
+    deleted = deleted_bytes = batches = 0
+    cursor = None
+    done = False
+    while not done:
+        page = queryset
+        if cursor is not None:
+            page = page.filter(Q(last_used__gt=cursor[0]) | Q(last_used=cursor[0], id__gt=cursor[1]))
+        rows = list(page.values_list('id', 'input_hash', 'last_used', 'size')[:batch_size])
+        if not rows:
+            break
+
+        victims = []
+        victim_bytes = 0
+        for row in rows:
+            victims.append(row)
+            victim_bytes += row[3]
+            if excess is not None and deleted + len(victims) >= excess[0] and deleted_bytes + victim_bytes >= excess[1]:
+                done = True
+                break
+        cursor = (rows[-1][2], rows[-1][0])
+        done = done or len(rows) < batch_size
+
+        with transaction.atomic():
+            # Rows hit since they were read have a newer last_used and are kept
+            count, _ = ValidationCache.objects.filter(
+                id__in=[victim[0] for victim in victims],
+                last_used__lte=max(victim[2] for victim in victims)
+            ).delete()
+        deleted += count
+        deleted_bytes += victim_bytes * count // len(victims)
+        batches += 1
+        _forget_shared([victim[1] for victim in victims])
+    return deleted, deleted_bytes, batches
+
+def _forget_shared(keys):
+    try:
+        cache.delete_many([SHARED_KEY_PREFIX + key for key in keys])
+    except Exception as e:
+        logger.warning(f"Failed to drop evicted entries from the shared validation cache: {str(e)}")
+
+def last_eviction_report():
+    """The report of the latest finished eviction run, or None"""
+    try:
+        return cache.get(LAST_EVICTION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to read validation cache eviction report: {str(e)}")
+        return None
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+from .keyframes import ffmpeg_available
+
+# Cache backends that only the current process can see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+def shared_cache_configured():
+    """Whether the default cache is shared by all web and worker processes"""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+# Process-local caches and a missing ffmpeg are normal in development, so
+# those checks only run under `manage.py check --deploy`
+@register(deploy=True)
+def check_rule_registry_cache(app_configs, **kwargs):
+    if shared_cache_configured():
+        return []
+    return [Warning(
+        'The default cache is process-local, so validation rule edits do not reach other processes.',
+        hint=(
+            'Set REDIS_URL to share the cache. Until then each process reloads validation rules '
+            f'every AI_RULE_REGISTRY_LOCAL_TTL ({settings.AI_RULE_REGISTRY_LOCAL_TTL}s).'
+        ),
+        id='ai_validation.W001',
+    )]
+
+@register()
+def check_text_batching_cache(app_configs, **kwargs):
+    if not settings.AI_TEXT_BATCHING_ENABLED or shared_cache_configured():
+        return []
+    return [Warning(
+        'AI_TEXT_BATCHING_ENABLED has no effect with a process-local cache.',
+        hint='Workers cannot read batches collected in a web process; set REDIS_URL to share the cache.',
+        id='ai_validation.W002',
+    )]
+
+@register(deploy=True)
+def check_ffmpeg(app_configs, **kwargs):
+    if ffmpeg_available():
+        return []
+    return [Warning(
+        'ffmpeg/ffprobe are not on PATH: screen recordings are sent whole instead of as sampled keyframes.',
+        hint=(
+            'Install ffmpeg (e.g. apt-get install ffmpeg) on web and worker hosts. Without it recordings '
+            'over AI_SCREEN_MAX_INLINE_BYTES cannot be validated, non-WAV audio is not analysed locally and '
+            'only WAV audio over AI_AUDIO_MAX_INLINE_BYTES can be shrunk to fit.'
+        ),
+        id='ai_validation.W003',
+    )]
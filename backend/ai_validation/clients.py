@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXT = 'warm-up'
+
+def _genai():
+    """google.generativeai, imported on first use.
+
+    The SDK pulls in gRPC, protobuf and the generated API types, around
+    half a second that every manage.py command and web worker boot would
+    otherwise pay just for loading the URLconf.
+    """
+    import google.generativeai
+    return google.generativeai
+
+def __getattr__(name):
+    # `ai_validation.clients.genai` stays importable (e.g. for mock.patch) without an eager import
+    if name == 'genai':
+        return _genai()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class GeminiClientPool:
+    """Process-wide Gemini SDK configuration and model instances.
+
+    genai.configure() throws away the SDK's service clients, and with them
+    the open gRPC channel, so it runs once per process here rather than
+    once per AIService. Every AIService in the process shares the models,
+    which reuse that channel: one HTTP/2 connection kept open between
+    requests. A forked child (new pid) configures again, as gRPC channels
+    cannot be shared across a fork.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget the configuration and models; the next use configures again"""
+        with self._lock:
+            self._pid = None
+            self._models = {}
+
+    def _configure(self):
+        if self._pid == os.getpid():
+            return
+        self._models = {}
+        if settings.GOOGLE_AI_API_KEY:
+            _genai().configure(api_key=settings.GOOGLE_AI_API_KEY, transport=settings.AI_GEMINI_TRANSPORT)
+        else:
+            logger.warning("GOOGLE_AI_API_KEY not set. AI validation will not work.")
+        self._pid = os.getpid()
+
+    def get_model(self, model_name):
+        """Get or create the shared model instance"""
+        with self._lock:
+            self._configure()
+            if model_name not in self._models:
+                try:
+                    self._models[model_name] = _genai().GenerativeModel(model_name)
+                except Exception as e:
+                    logger.error(f"Failed to create model {model_name}: {str(e)}")
+                    raise
+            return self._models[model_name]
+
+    def prewarm(self, model_names, connect=True):
+        """Build the models and open the connection before the first validation.
+
+        With `connect`, a token count request (free, no generation) is sent
+        per model so the channel is established and authenticated. Errors
+        are logged, never raised; returns whether the warm-up succeeded.
+        """
+        started = time.monotonic()
+        try:
+            models = [self.get_model(model_name) for model_name in model_names]
+            if connect and settings.GOOGLE_AI_API_KEY:
+                for model in models:
+                    model.count_tokens(WARMUP_TEXT, request_options={'timeout': settings.AI_CLIENT_PREWARM_TIMEOUT})
+        except Exception as e:
+            logger.warning(f"Gemini client warm-up failed: {str(e)}")
+            return False
+        logger.info(f"Warmed Gemini clients for {', '.join(model_names)} in {time.monotonic() - started:.2f}s")
+        return True
+
+gemini_clients = GeminiClientPool()
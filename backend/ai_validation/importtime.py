@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from django.conf import settings
+
+# Process startups to profile: a web worker up to its first request (the
+# URLconf loads lazily, so it is resolved explicitly) and a bare command
+SCENARIOS = {
+    'wsgi': ['-c', 'import backend.wsgi; from django.urls import get_resolver; get_resolver().url_patterns'],
+    'check': ['manage.py', 'check'],
+}
+
+# Only needed once a model is called; importing them at startup is a regression
+DEFERRED_MODULES = ('google.generativeai', 'grpc')
+
+class ImportTimeError(Exception):
+    """Raised when a profiled startup fails"""
+
+def measure_startup(scenario):
+    """Profile one fresh interpreter start with `python -X importtime`.
+
+    Returns {'total': seconds, 'modules': {module: cumulative seconds}}.
+    `total` sums the top-level imports, so interpreter start-up outside
+    imports is not included. Warm-up on client start is disabled so the
+    SDK is not imported on a background thread.
+    """
+    env = dict(os.environ, AI_CLIENT_PREWARM='False')
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *SCENARIOS[scenario]],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    if process.returncode:
+        raise ImportTimeError(f"'{scenario}' startup failed: {process.stderr.strip().splitlines()[-1:]}")
+    return parse_importtime(process.stderr)
+
+def parse_importtime(output):
+    """Parse -X importtime lines: 'import time: <self us> | <cumulative us> | <indented module>'"""
+    modules = {}
+    total = 0.0
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        seconds = int(cumulative) / 1e6
+        module = name.strip()
+        modules[module] = modules.get(module, 0.0) + seconds
+        if name[1:2] != ' ':  # One space before a top-level import, more when nested
+            total += seconds
+    return {'total': total, 'modules': modules}
+
+def deferred_imports(profile):
+    """DEFERRED_MODULES that the profiled startup imported"""
+    return [module for module in DEFERRED_MODULES if module in profile['modules']]
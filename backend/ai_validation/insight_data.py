@@ -0,0 +1,97 @@
+import hashlib
+import json
+from datetime import timedelta, timezone as dt_timezone
+from django.db.models import Count, F, Window
+from django.db.models.functions import ExtractHour, RowNumber
+from django.utils import timezone
+
+WEEK_DAYS = 7
+TOP_STREAKS = 3
+TOP_COMPLETION_HOURS = 3
+
+def gather_analysis_data(user_ids, now=None):
+    """Weekly insight inputs for a batch of users in five queries.
+
+    Completion counts, per-habit rates, the completion-hour histogram and
+    each user's top streaks are aggregated in the database (GROUP BY and a
+    window function) for the whole batch, so the cost does not grow with
+    the number of users. Returns {user_id: analysis_data}.
+    """
+    from core.models import DailyCheckIn, Goal, Habit, Streak
+
+    user_ids = list(user_ids)
+    week_ago = (now or timezone.now()) - timedelta(days=WEEK_DAYS)
+    data = {
+        user_id: {
+            'user_goals': [],
+            'active_habits': [],
+            'recent_completions': 0,
+            'completion_rate': 0.0,
+            'habit_completion_rates': [],
+            'streak_info': [],
+            'common_times': [],
+        }
+        for user_id in user_ids
+    }
+
+    for user_id, title in Goal.objects.filter(user_id__in=user_ids).values_list('user_id', 'title'):
+        data[user_id]['user_goals'].append(title)
+
+    habits = list(
+        Habit.objects.filter(goal__user_id__in=user_ids, is_active=True)
+        .values_list('goal__user_id', 'id', 'title')
+    )
+
+    recent = DailyCheckIn.objects.filter(
+        habit__goal__user_id__in=user_ids,
+        created_at__gte=week_ago,
+        is_approved=True
+    )
+    habit_completions = {}
+    per_habit = recent.values_list('habit__goal__user_id', 'habit_id').annotate(count=Count('id')).order_by()
+    for user_id, habit_id, count in per_habit:
+        data[user_id]['recent_completions'] += count
+        habit_completions[habit_id] = count
+
+    for user_id, habit_id, title in habits:
+        data[user_id]['active_habits'].append(title)
+        data[user_id]['habit_completion_rates'].append({
+            'habit': title,
+            'rate': round(habit_completions.get(habit_id, 0) / WEEK_DAYS, 2),
+        })
+    for entry in data.values():
+        if entry['active_habits']:
+            entry['completion_rate'] = entry['recent_completions'] / (len(entry['active_habits']) * WEEK_DAYS)
+
+    # Completion-hour histogram, most common hours first
+    hours = (
+        recent.filter(completed_at__isnull=False)
+        .annotate(hour=ExtractHour('completed_at', tzinfo=dt_timezone.utc))
+        .values_list('habit__goal__user_id', 'hour')
+        .annotate(count=Count('id'))
+        .order_by('habit__goal__user_id', '-count', 'hour')
+    )
+    for user_id, hour, _ in hours:
+        common_times = data[user_id]['common_times']
+        if len(common_times) < TOP_COMPLETION_HOURS:
+            common_times.append(f"{hour}:00")
+
+    streaks = (
+        Streak.objects.filter(user_id__in=user_ids)
+        # habit_id breaks ties so the same habits are picked on every run
+        .annotate(position=Window(
+            RowNumber(), partition_by=[F('user_id')], order_by=[F('current_streak').desc(), F('habit_id').asc()]
+        ))
+        .filter(position__lte=TOP_STREAKS)
+        .order_by('user_id', 'position', 'habit_id')
+        .values_list('user_id', 'habit__title', 'current_streak')
+    )
+    for user_id, title, current_streak in streaks:
+        data[user_id]['streak_info'].append({'habit': title, 'streak': current_streak})
+
+    return data
+
+def insight_fingerprint(analysis_data):
+    """Stable hash of the insight input; equal inputs would give equal insights"""
+    canonical = json.dumps(analysis_data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
@@ -0,0 +1,245 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+from .insight_data import gather_analysis_data, insight_fingerprint
+from .models import InsightRun, InsightRunChunk
+from .resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+def active_insight_users():
+    return get_user_model().objects.filter(is_active=True, goals__is_active=True).distinct()
+
+def _claimable_chunks():
+    """Chunks not yet taken, or whose task's lease ran out without finishing them"""
+    lease_cutoff = timezone.now() - timedelta(seconds=settings.AI_INSIGHT_CHUNK_LEASE)
+    return Q(status='pending') | Q(status='running', claimed_at__lt=lease_cutoff)
+
+def start_insight_run(chunk_size=None):
+    """Resume the running InsightRun, or start one and split its users into chunks.
+
+    Runs older than AI_INSIGHT_RUN_RESUME_HOURS are abandoned instead of
+    resumed. Returns the run and the ids of its chunks still to process;
+    on resume these may include chunks whose first task is still queued,
+    which is why process_insight_chunk() claims a chunk before any work.
+    """
+    run = InsightRun.objects.filter(status='running').first()
+    if run and timezone.now() - run.started_at > timedelta(hours=settings.AI_INSIGHT_RUN_RESUME_HOURS):
+        InsightRun.objects.filter(status='running').update(status='abandoned', finished_at=timezone.now())
+        run = None
+
+    if run is None:
+        run = InsightRun.objects.create()
+        _plan_chunks(run, chunk_size or settings.AI_INSIGHT_BATCH_SIZE)
+    else:
+        logger.info(f"Resuming weekly insights run {run.id}")
+
+    pending = list(run.chunks.filter(_claimable_chunks()).values_list('id', flat=True))
+    if not pending:
+        _finish_run_if_done(run.id)
+    return run, pending
+
+def _plan_chunks(run, chunk_size):
+    """Keyset-paginate active user ids into chunk ranges"""
+    chunks = []
+    last_id = 0
+    while True:
+        ids = list(
+            active_insight_users().filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        chunks.append(InsightRunChunk(run=run, first_user_id=ids[0], last_user_id=ids[-1], user_count=len(ids)))
+        last_id = ids[-1]
+
+    InsightRunChunk.objects.bulk_create(chunks)
+    run.total_users = sum(chunk.user_count for chunk in chunks)
+    run.save(update_fields=['total_users'])
+
+def process_insight_chunk(chunk_id):
+    """Generate and store weekly insights for the users of one chunk.
+
+    Users who already got an insight during this run (before an
+    interruption) are skipped, and users whose analysis data has the same
+    fingerprint as their latest insight keep that insight. Model calls run
+    on at most AI_INSIGHT_CONCURRENCY threads; the ProgressInsight rows are
+    written from the calling thread.
+
+    The chunk is claimed atomically first: a second task for the same
+    chunk finds it taken and returns {'skipped': True} instead of writing
+    duplicate insights. If processing fails the claim is released so the
+    task's retry can take it again. While the circuit breaker is open the
+    insights generated so far are kept, the claim is released and
+    {'deferred': True, 'retry_after': ...} is returned; after
+    AI_INSIGHT_CHUNK_MAX_DEFERRALS deferrals the chunk fails instead.
+    """
+    claimed_at = timezone.now()
+    if not InsightRunChunk.objects.filter(_claimable_chunks(), id=chunk_id, run__status='running').update(
+        status='running',
+        claimed_at=claimed_at
+    ):
+        return {'chunk_id': chunk_id, 'skipped': True}
+
+    chunk = InsightRunChunk.objects.select_related('run').get(id=chunk_id)
+    try:
+        return _process_claimed_chunk(chunk, claimed_at)
+    except Exception:
+        _release_chunk(chunk.id, claimed_at)
+        raise
+
+def _release_chunk(chunk_id, claimed_at, **updates):
+    """Hand a claimed chunk back, unless its lease has since been taken over"""
+    InsightRunChunk.objects.filter(id=chunk_id, status='running', claimed_at=claimed_at).update(
+        status='pending',
+        claimed_at=None,
+        **updates
+    )
+
+def _process_claimed_chunk(chunk, claimed_at):
+    from core.models import ProgressInsight
+    from .services import InsightGenerator
+
+    started = time.monotonic()
+    done_user_ids = set(
+        ProgressInsight.objects.filter(
+            user_id__gte=chunk.first_user_id,
+            user_id__lte=chunk.last_user_id,
+            insight_type='general_insight',
+            generated_at__gte=chunk.run.started_at
+        ).values_list('user_id', flat=True)
+    )
+    last_fingerprint = (
+        ProgressInsight.objects.filter(user=OuterRef('pk'), insight_type='general_insight')
+        .order_by('-generated_at')
+        .values('data__input_fingerprint')[:1]
+    )
+    users = list(
+        active_insight_users()
+        .filter(id__range=(chunk.first_user_id, chunk.last_user_id))
+        .exclude(id__in=done_user_ids)
+        .annotate(last_fingerprint=Subquery(last_fingerprint))
+        .order_by('id')
+    )
+    analysis_data = gather_analysis_data([user.id for user in users])
+
+    changed_users = []
+    for user in users:
+        fingerprint = insight_fingerprint(analysis_data[user.id])
+        if user.last_fingerprint != fingerprint:
+            changed_users.append(user)
+
+    insight_generator = InsightGenerator()
+    with ThreadPoolExecutor(max_workers=settings.AI_INSIGHT_CONCURRENCY, thread_name_prefix='ai-insights') as executor:
+        futures = [
+            (user, executor.submit(insight_generator.generate_weekly_insights, user, analysis_data[user.id]))
+            for user in changed_users
+        ]
+
+    created = len(done_user_ids)
+    reused = len(users) - len(changed_users)
+    fallbacks = 0
+    templates = 0
+    failed = 0
+    deferral = None
+    for user, future in futures:
+        try:
+            insights_data = future.result()
+            create_weekly_insight(user, insights_data)
+            created += 1
+            fallbacks += 1 if insights_data.get('fallback') else 0
+            templates += 1 if insights_data.get('template') else 0
+        except CircuitOpenError as e:
+            deferral = e
+        except Exception as e:
+            logger.warning(f"Failed to generate insights for user {user.id}: {str(e)}")
+            failed += 1
+
+    if deferral is not None:
+        # Users written above are skipped when the chunk is taken again
+        _release_chunk(chunk.id, claimed_at, deferrals=F('deferrals') + 1)
+        if chunk.deferrals + 1 >= settings.AI_INSIGHT_CHUNK_MAX_DEFERRALS:
+            error = f"AI service still unavailable after {chunk.deferrals + 1} deferrals"
+            fail_insight_chunk(chunk.id, error)
+            return {'chunk_id': chunk.id, 'error': error}
+        return {'chunk_id': chunk.id, 'deferred': True, 'retry_after': deferral.retry_after}
+
+    duration = time.monotonic() - started
+    with transaction.atomic():
+        # Conditional on our claim so a chunk taken over after its lease ran out is only counted once
+        if InsightRunChunk.objects.filter(id=chunk.id, status='running', claimed_at=claimed_at).update(
+            status='completed',
+            insights_created=created,
+            fallback_insights=fallbacks,
+            template_insights=templates,
+            reused_insights=reused,
+            failed_users=failed,
+            duration=duration
+        ):
+            InsightRun.objects.filter(id=chunk.run_id).update(
+                processed_users=F('processed_users') + created + reused + failed,
+                insights_created=F('insights_created') + created,
+                fallback_insights=F('fallback_insights') + fallbacks,
+                template_insights=F('template_insights') + templates,
+                reused_insights=F('reused_insights') + reused,
+                failed_users=F('failed_users') + failed
+            )
+    _finish_run_if_done(chunk.run_id)
+
+    return {
+        'chunk_id': chunk.id,
+        'insights_created': created,
+        'fallback_insights': fallbacks,
+        'template_insights': templates,
+        'reused_insights': reused,
+        'failed': failed
+    }
+
+def fail_insight_chunk(chunk_id, error):
+    """Give up on a chunk whose task kept failing, counting all its users as failed"""
+    chunk = InsightRunChunk.objects.get(id=chunk_id)
+    with transaction.atomic():
+        if InsightRunChunk.objects.filter(id=chunk.id, status='pending').update(
+            status='failed',
+            failed_users=chunk.user_count,
+            error_message=str(error)
+        ):
+            InsightRun.objects.filter(id=chunk.run_id).update(
+                processed_users=F('processed_users') + chunk.user_count,
+                failed_users=F('failed_users') + chunk.user_count
+            )
+    logger.error(f"Insight chunk {chunk_id} failed for {chunk.user_count} users: {str(error)}")
+    _finish_run_if_done(chunk.run_id)
+
+def _finish_run_if_done(run_id):
+    """Close the run once every chunk has finished; the last chunk to finish does this"""
+    if InsightRunChunk.objects.filter(run_id=run_id, status__in=['pending', 'running']).exists():
+        return
+    if not InsightRun.objects.filter(id=run_id, status='running').update(status='completed', finished_at=timezone.now()):
+        return
+
+    run = InsightRun.objects.get(id=run_id)
+    logger.info(
+        f"Weekly insights run {run.id} finished: {run.processed_users}/{run.total_users} users "
+        f"in {run.duration:.0f}s ({run.throughput:.2f} users/s), "
+        f"{run.reused_insights} reused, {run.template_insights} templates, "
+        f"{run.fallback_insights} fallbacks, {run.failed_users} failed"
+    )
+
+def create_weekly_insight(user, insights_data):
+    from core.models import ProgressInsight
+    return ProgressInsight.objects.create(
+        user=user,
+        insight_type='general_insight',
+        title='Weekly Progress Insights',
+        description=insights_data.get('suggestion', ''),
+        data=insights_data,
+        is_actionable=True,
+        action_title=insights_data.get('suggestion', 'Weekly suggestion'),
+        action_description=insights_data.get('improvement_area', '')
+    )
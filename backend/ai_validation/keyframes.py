@@ -0,0 +1,154 @@
+import io
+import logging
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+from django.conf import settings
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+FRAME_MIME_TYPE = 'image/jpeg'
+CANDIDATES_PER_FRAME = 3  # Evenly spaced frames decoded for every frame sent
+UNKNOWN_DURATION_FPS = 1  # Candidate rate when the container has no duration
+HASH_SIZE = 8  # dHash grid, giving 64-bit fingerprints
+DUPLICATE_DISTANCE = 6  # Fingerprint bits that may differ between near-identical frames
+
+class KeyframeExtractionError(Exception):
+    """Raised when frames cannot be sampled from a screen recording"""
+
+def frame_hash(image):
+    """Difference hash: one bit per horizontally adjacent pixel pair on a small grayscale grid"""
+    pixels = list(image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR).getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + column]
+            bits = bits << 1 | (left > pixels[row * (HASH_SIZE + 1) + column + 1])
+    return bits
+
+def select_keyframes(candidates, max_frames):
+    """Drop near-duplicate frames and keep at most `max_frames`.
+
+    `candidates` are (seconds, image) pairs in time order. A frame is kept
+    when it differs from the last kept frame by more than
+    DUPLICATE_DISTANCE hash bits; if too many remain, the first frame and
+    the ones that changed the screen most are kept, in time order.
+    """
+    kept = []
+    last_hash = None
+    for seconds, image in candidates:
+        fingerprint = frame_hash(image)
+        change = HASH_SIZE * HASH_SIZE if last_hash is None else bin(fingerprint ^ last_hash).count('1')
+        if last_hash is not None and change <= DUPLICATE_DISTANCE:
+            continue
+        kept.append((change, seconds, image))
+        last_hash = fingerprint
+
+    if len(kept) > max_frames:
+        first, rest = kept[0], kept[1:]
+        rest = sorted(rest, key=lambda frame: frame[0], reverse=True)[:max_frames - 1]
+        kept = [first] + sorted(rest, key=lambda frame: frame[1])
+    return [(seconds, image) for _, seconds, image in kept]
+
+def sample_keyframes(data, max_frames=None, max_edge=None, quality=None):
+    """Sample a bounded set of distinct frames from a screen recording.
+
+    ffmpeg decodes only the video's keyframes and picks
+    max_frames * CANDIDATES_PER_FRAME evenly spaced candidates, already
+    scaled to fit `max_edge`; select_keyframes() reduces them to at most
+    `max_frames`. Returns (seconds, jpeg_bytes) pairs, so the model input
+    is capped however long the recording is.
+    """
+    max_frames = max_frames or settings.AI_SCREEN_MAX_FRAMES
+    max_edge = max_edge or settings.AI_SCREEN_FRAME_MAX_EDGE
+    quality = quality or settings.AI_PHOTO_JPEG_QUALITY
+
+    candidates = _decode_candidates(data, max_frames * CANDIDATES_PER_FRAME, max_edge)
+    frames = []
+    for seconds, image in select_keyframes(candidates, max_frames):
+        output = io.BytesIO()
+        image.convert('RGB').save(output, format='JPEG', quality=quality, optimize=True)
+        frames.append((seconds, output.getvalue()))
+    return frames
+
+def ffmpeg_available():
+    """Whether the ffmpeg and ffprobe binaries that keyframe sampling needs are on PATH"""
+    return bool(shutil.which('ffmpeg') and shutil.which('ffprobe'))
+
+def _decode_candidates(data, count, max_edge):
+    """Decode `count` evenly spaced frames with ffmpeg, as (seconds, image) pairs"""
+    ffmpeg, ffprobe = shutil.which('ffmpeg'), shutil.which('ffprobe')
+    if not ffmpeg or not ffprobe:
+        raise KeyframeExtractionError("ffmpeg is not installed")
+
+    with tempfile.TemporaryDirectory(prefix='ai-keyframes-') as directory:
+        # Written to disk: MP4 indexes are often at the end, so a pipe will not do
+        source = os.path.join(directory, 'recording')
+        with open(source, 'wb') as source_file:
+            source_file.write(data)
+
+        duration = _probe_duration(ffprobe, source)
+        fps = count / duration if duration else UNKNOWN_DURATION_FPS
+        _run([
+            ffmpeg, '-v', 'error', '-skip_frame', 'nokey', '-i', source,
+            '-vf', f'fps={fps:.6f},scale={max_edge}:{max_edge}:force_original_aspect_ratio=decrease',
+            '-frames:v', str(count), '-q:v', '2',
+            os.path.join(directory, 'frame%04d.jpg')
+        ])
+
+        names = sorted(name for name in os.listdir(directory) if name.startswith('frame'))
+        candidates = []
+        for index, name in enumerate(names):
+            with Image.open(os.path.join(directory, name)) as image:
+                image.load()
+                candidates.append((index / fps, image))
+    return candidates
+
+def _probe_duration(ffprobe, source):
+    output = _run([
+        ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', source
+    ])
+    try:
+        return float(output.strip()) or None
+    except ValueError:
+        return None  # 'N/A', as browser-recorded WebM often reports
+
+def _run(command):
+    try:
+        process = subprocess.run(
+            command, capture_output=True, timeout=settings.AI_SCREEN_DECODE_TIMEOUT, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise KeyframeExtractionError(e.stderr.decode(errors='replace').strip() or str(e))
+    except (subprocess.SubprocessError, OSError) as e:
+        raise KeyframeExtractionError(str(e))
+    return process.stdout.decode(errors='replace')
+
+def _read_recording(checkin):
+    recording = checkin.screen_recording_proof
+    recording.open('rb')
+    try:
+        return recording.read()
+    finally:
+        recording.close()
+
+def load_screen_recording(checkin):
+    """Return (data, mime_type) of the check-in's screen recording as uploaded"""
+    mime_type = mimetypes.guess_type(checkin.screen_recording_proof.name)[0]
+    if not mime_type or not mime_type.startswith('video/'):
+        raise KeyframeExtractionError("Unrecognised video format")
+    return _read_recording(checkin), mime_type
+
+def load_screen_recording_frames(checkin):
+    """Return the sampled (seconds, jpeg_bytes) frames of the check-in's screen recording"""
+    data = _read_recording(checkin)
+    frames = sample_keyframes(data)
+    logger.info(
+        f"Sampled {len(frames)} keyframes for checkin {checkin.id} "
+        f"from a {len(data)} byte screen recording"
+    )
+    return frames
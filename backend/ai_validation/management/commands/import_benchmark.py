@@ -0,0 +1,39 @@
+import statistics
+from django.core.management.base import BaseCommand, CommandError
+from ai_validation.importtime import SCENARIOS, deferred_imports, measure_startup
+
+
+class Command(BaseCommand):
+    help = "Measure web worker and management command import time with python -X importtime"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                            help="Startup to profile (default: all)")
+        parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per scenario")
+        parser.add_argument('--top', type=int, default=10, help="Slowest imports (cumulative time) to list")
+        parser.add_argument('--max-ms', type=float, help="Fail when a scenario's median import time exceeds this")
+
+    def handle(self, *args, **options):
+        failures = []
+        for scenario in options['scenario'] or sorted(SCENARIOS):
+            profiles = [measure_startup(scenario) for _ in range(max(options['repeat'], 1))]
+            totals = sorted(profile['total'] * 1000 for profile in profiles)
+            median = statistics.median(totals)
+            self.stdout.write(
+                f"{scenario}: median {median:.0f} ms, min {totals[0]:.0f} ms, max {totals[-1]:.0f} ms "
+                f"over {len(totals)} runs"
+            )
+
+            # Per-module breakdown from the run closest to the median
+            profile = min(profiles, key=lambda profile: abs(profile['total'] * 1000 - median))
+            slowest = sorted(profile['modules'].items(), key=lambda item: item[1], reverse=True)
+            for module, seconds in slowest[:options['top']]:
+                self.stdout.write(f"  {seconds * 1000:8.1f} ms  {module}")
+
+            for module in deferred_imports(profile):
+                failures.append(f"{scenario} imports {module} at startup")
+            if options['max_ms'] is not None and median > options['max_ms']:
+                failures.append(f"{scenario} median {median:.0f} ms exceeds {options['max_ms']:.0f} ms")
+
+        if failures:
+            raise CommandError('; '.join(failures))
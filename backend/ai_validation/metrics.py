@@ -0,0 +1,90 @@
+import math
+from collections import defaultdict
+from django.conf import settings
+from .models import ModelPerformance, PerformanceEvent
+from .performance import STAGES
+from .sketch import LatencySketch
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def render_metrics():
+    """Validation counters and latency histograms in the Prometheus text format.
+
+    Totals come from the ModelPerformance rows, so every web and worker
+    process contributes, summed over all days per validation rule. Events
+    still waiting in the PerformanceEvent buffer are exported as a gauge.
+    """
+    rules = defaultdict(lambda: {
+        'successful': 0,
+        'failed': 0,
+        'prompt_tokens': 0,
+        'output_tokens': 0,
+        'processing_time_sum': 0.0,
+        'sketch': LatencySketch(),
+        **{stage: 0.0 for stage in STAGES},
+    })
+    for performance in ModelPerformance.objects.select_related('validation_rule'):
+        rule = performance.validation_rule
+        entry = rules[(rule.validation_type, rule.name)]
+        entry['successful'] += performance.successful_requests
+        entry['failed'] += performance.failed_requests
+        entry['prompt_tokens'] += performance.prompt_tokens
+        entry['output_tokens'] += performance.output_tokens
+        entry['processing_time_sum'] += performance.processing_time_sum
+        entry['sketch'].merge(LatencySketch.from_dict(performance.latency_sketch))
+        for stage in STAGES:
+            entry[stage] += getattr(performance, f'{stage}_time_sum')
+
+    lines = []
+    _family(lines, 'ai_validation_requests_total', 'counter', 'Validations by rule and outcome')
+    for (validation_type, name), entry in sorted(rules.items()):
+        for outcome in ('successful', 'failed'):
+            _sample(lines, 'ai_validation_requests_total', entry[outcome],
+                    validation_type=validation_type, rule=name, outcome=outcome)
+
+    _family(lines, 'ai_validation_tokens_total', 'counter', 'Model tokens by rule and direction')
+    for (validation_type, name), entry in sorted(rules.items()):
+        for direction in ('prompt', 'output'):
+            _sample(lines, 'ai_validation_tokens_total', entry[f'{direction}_tokens'],
+                    validation_type=validation_type, rule=name, direction=direction)
+
+    _family(lines, 'ai_validation_stage_seconds_total', 'counter', 'Time spent in each validation stage')
+    for (validation_type, name), entry in sorted(rules.items()):
+        for stage in STAGES:
+            _sample(lines, 'ai_validation_stage_seconds_total', entry[stage],
+                    validation_type=validation_type, rule=name, stage=stage)
+
+    _family(lines, 'ai_validation_processing_seconds', 'histogram', 'End-to-end validation time')
+    for (validation_type, name), entry in sorted(rules.items()):
+        sketch = entry['sketch']
+        for bound in settings.AI_METRICS_LATENCY_BUCKETS:
+            _sample(lines, 'ai_validation_processing_seconds_bucket', sketch.count_at_most(bound),
+                    validation_type=validation_type, rule=name, le=_format_value(bound))
+        _sample(lines, 'ai_validation_processing_seconds_bucket', sketch.count,
+                validation_type=validation_type, rule=name, le='+Inf')
+        _sample(lines, 'ai_validation_processing_seconds_sum', entry['processing_time_sum'],
+                validation_type=validation_type, rule=name)
+        _sample(lines, 'ai_validation_processing_seconds_count', sketch.count,
+                validation_type=validation_type, rule=name)
+
+    _family(lines, 'ai_validation_pending_performance_events', 'gauge',
+            'Validations not yet folded into the totals above')
+    _sample(lines, 'ai_validation_pending_performance_events', PerformanceEvent.objects.count())
+
+    return '\n'.join(lines) + '\n'
+
+def _family(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+def _sample(lines, name, value, **labels):
+    label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if labels else f'{name} {_format_value(value)}')
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:41
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0002_alter_validationlog_processing_time_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='validationlog',
+            name='decision_source',
+            field=models.CharField(choices=[('model', 'AI Model'), ('prescreen', 'Local Pre-screen'), ('cache', 'Cache'), ('manual', 'Manual')], default='model', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='validationrule',
+            name='prescreen_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='validationrule',
+            name='prescreen_min_length',
+            field=models.IntegerField(default=50, help_text='Shorter text is rejected without calling the model'),
+        ),
+        migrations.AddField(
+            model_name='validationrule',
+            name='prescreen_pass_overlap',
+            field=models.FloatField(default=0.6, help_text='Share of habit prompt keywords that marks a clear pass', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='validationrule',
+            name='prescreen_sample_rate',
+            field=models.FloatField(default=0.1, help_text='Share of clear passes still sent to the model for review', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:20
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0003_prescreen_and_decision_source'),
+        ('core', '0003_dailycheckin_photo_model_input'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('deferred', 'Deferred'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('result', models.JSONField(blank=True, default=dict, help_text='Validation response once finished')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('checkin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='validation_jobs', to='core.dailycheckin')),
+            ],
+            options={
+                'db_table': 'validation_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
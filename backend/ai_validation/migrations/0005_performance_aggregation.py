@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def averages_to_sums(apps, schema_editor):
+    ModelPerformance = apps.get_model('ai_validation', 'ModelPerformance')
+    for performance in ModelPerformance.objects.all():
+        performance.confidence_sum = performance.average_confidence * performance.successful_requests
+        performance.confidence_count = performance.successful_requests
+        performance.processing_time_sum = performance.average_processing_time * performance.total_requests
+        performance.processing_time_count = performance.total_requests
+        performance.save(update_fields=[
+            'confidence_sum', 'confidence_count', 'processing_time_sum', 'processing_time_count'
+        ])
+
+
+def sums_to_averages(apps, schema_editor):
+    ModelPerformance = apps.get_model('ai_validation', 'ModelPerformance')
+    for performance in ModelPerformance.objects.all():
+        if performance.confidence_count:
+            performance.average_confidence = performance.confidence_sum / performance.confidence_count
+        if performance.processing_time_count:
+            performance.average_processing_time = performance.processing_time_sum / performance.processing_time_count
+        performance.save(update_fields=['average_confidence', 'average_processing_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0004_validation_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelperformance',
+            name='confidence_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='confidence_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='latency_sketch',
+            field=models.JSONField(blank=True, default=dict, help_text='Mergeable processing time sketch for percentiles'),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='processing_time_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='processing_time_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(averages_to_sums, sums_to_averages),
+        migrations.RemoveField(
+            model_name='modelperformance',
+            name='average_confidence',
+        ),
+        migrations.RemoveField(
+            model_name='modelperformance',
+            name='average_processing_time',
+        ),
+        migrations.CreateModel(
+            name='PerformanceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('success', models.BooleanField()),
+                ('confidence_score', models.FloatField(blank=True, null=True)),
+                ('processing_time', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('validation_rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ai_validation.validationrule')),
+            ],
+            options={
+                'db_table': 'performance_events',
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:10
+
+import django.db.models.deletion
+import json
+import zlib
+from django.db import migrations, models
+
+
+def move_payloads(apps, schema_editor):
+    ValidationLog = apps.get_model('ai_validation', 'ValidationLog')
+    ValidationLogPayload = apps.get_model('ai_validation', 'ValidationLogPayload')
+    batch = []
+    logs = ValidationLog.objects.only('id', 'ai_response_raw', 'ai_response_parsed').iterator(chunk_size=1000)
+    for log in logs:
+        if not log.ai_response_raw and not log.ai_response_parsed:
+            continue
+        data = json.dumps({'raw': log.ai_response_raw, 'parsed': log.ai_response_parsed}).encode()
+        batch.append(ValidationLogPayload(validation_log_id=log.id, data=zlib.compress(data)))
+        if len(batch) >= 1000:
+            ValidationLogPayload.objects.bulk_create(batch)
+            batch = []
+    ValidationLogPayload.objects.bulk_create(batch)
+
+
+def restore_payloads(apps, schema_editor):
+    ValidationLog = apps.get_model('ai_validation', 'ValidationLog')
+    ValidationLogPayload = apps.get_model('ai_validation', 'ValidationLogPayload')
+    for payload in ValidationLogPayload.objects.iterator(chunk_size=1000):
+        data = json.loads(zlib.decompress(bytes(payload.data)))
+        ValidationLog.objects.filter(id=payload.validation_log_id).update(
+            ai_response_raw=data['raw'],
+            ai_response_parsed=data['parsed']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0005_performance_aggregation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationLogPayload',
+            fields=[
+                ('validation_log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='ai_validation.validationlog')),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON of the raw and parsed response')),
+            ],
+            options={
+                'db_table': 'validation_log_payloads',
+            },
+        ),
+        migrations.RunPython(move_payloads, restore_payloads),
+        migrations.RemoveField(
+            model_name='validationlog',
+            name='ai_response_parsed',
+        ),
+        migrations.RemoveField(
+            model_name='validationlog',
+            name='ai_response_raw',
+        ),
+        migrations.AddIndex(
+            model_name='validationlog',
+            index=models.Index(fields=['created_at'], name='validation__created_4ac6fa_idx'),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0006_validation_log_payload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='validationlog',
+            name='db_write_time',
+            field=models.FloatField(blank=True, help_text='Seconds writing the check-in and cache rows', null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='file_read_time',
+            field=models.FloatField(blank=True, help_text='Seconds reading and preparing proof files', null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='model_name',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='model_time',
+            field=models.FloatField(blank=True, help_text='Seconds in model calls, including retries', null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='output_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='parse_time',
+            field=models.FloatField(blank=True, help_text='Seconds parsing the model response', null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='prompt_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='queue_wait_time',
+            field=models.FloatField(blank=True, help_text='Seconds between queueing and the start of validation', null=True),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='db_write_time_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='file_read_time_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='model_time_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='output_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='parse_time_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='prompt_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='modelperformance',
+            name='queue_wait_time_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='performanceevent',
+            name='db_write_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performanceevent',
+            name='file_read_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performanceevent',
+            name='model_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performanceevent',
+            name='output_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performanceevent',
+            name='parse_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performanceevent',
+            name='prompt_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='performanceevent',
+            name='queue_wait_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
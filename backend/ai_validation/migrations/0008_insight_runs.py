@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0007_usage_accounting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('abandoned', 'Abandoned')], default='running', max_length=20)),
+                ('total_users', models.IntegerField(default=0)),
+                ('processed_users', models.IntegerField(default=0)),
+                ('insights_created', models.IntegerField(default=0)),
+                ('fallback_insights', models.IntegerField(default=0, help_text='Insights from the fallback template after a model failure')),
+                ('failed_users', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'insight_runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InsightRunChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_user_id', models.BigIntegerField()),
+                ('last_user_id', models.BigIntegerField()),
+                ('user_count', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('insights_created', models.IntegerField(default=0)),
+                ('fallback_insights', models.IntegerField(default=0)),
+                ('failed_users', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('duration', models.FloatField(blank=True, help_text='Seconds', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='ai_validation.insightrun')),
+            ],
+            options={
+                'db_table': 'insight_run_chunks',
+                'ordering': ['first_user_id'],
+            },
+        ),
+    ]
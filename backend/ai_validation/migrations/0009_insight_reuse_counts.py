@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0008_insight_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insightrun',
+            name='template_insights',
+            field=models.IntegerField(default=0, help_text='Template insights for users without activity, made without a model call'),
+        ),
+        migrations.AddField(
+            model_name='insightrun',
+            name='reused_insights',
+            field=models.IntegerField(default=0, help_text='Users whose last insight was kept because its input was unchanged'),
+        ),
+        migrations.AddField(
+            model_name='insightrunchunk',
+            name='template_insights',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='insightrunchunk',
+            name='reused_insights',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-17 15:10
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0009_insight_reuse_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetryBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('total', models.IntegerField(default=0, help_text='Failed validations matched by the filters')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='validation_retry_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'validation_retry_batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, help_text='Earliest time the retry sweeper may retry this failure', null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='retry_queued_at',
+            field=models.DateTimeField(blank=True, help_text='When the running retry was queued', null=True),
+        ),
+        migrations.AddField(
+            model_name='validationlog',
+            name='retry_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to='ai_validation.retrybatch'),
+        ),
+        migrations.AddIndex(
+            model_name='validationlog',
+            index=models.Index(fields=['success', 'next_retry_at'], name='validation__success_81326a_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0010_validation_retries'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='validationlog',
+            name='decision_source',
+            field=models.CharField(choices=[('model', 'AI Model'), ('prescreen', 'Local Pre-screen'), ('cache', 'Cache'), ('coalesced', 'Shared In-flight Call'), ('manual', 'Manual')], default='model', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0011_coalesced_decision_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insightrunchunk',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a task took the chunk; other tasks wait out AI_INSIGHT_CHUNK_LEASE from here', null=True),
+        ),
+        migrations.AlterField(
+            model_name='insightrunchunk',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
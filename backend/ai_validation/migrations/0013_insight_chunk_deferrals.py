@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_validation', '0012_insight_chunk_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insightrunchunk',
+            name='deferrals',
+            field=models.IntegerField(default=0, help_text='Times the chunk was put back while the AI circuit breaker was open'),
+        ),
+    ]
@@ -1,6 +1,11 @@
+import json
+import uuid
+import zlib
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from .sketch import LatencySketch
 
 class AIConfig(models.Model):
     MODEL_CHOICES = [
@@ -39,6 +44,13 @@ class ValidationRule(models.Model):
     prompt_template = models.TextField(help_text="Template for AI validation prompt. Use {validation_prompt} for habit-specific prompt.")
     confidence_threshold = models.FloatField(default=0.85, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
     max_processing_time = models.IntegerField(default=15, help_text="Seconds")
+    
+    # Local pre-screen (text only): decides obvious cases without the model
+    prescreen_enabled = models.BooleanField(default=False)
+    prescreen_min_length = models.IntegerField(default=50, help_text="Shorter text is rejected without calling the model")
+    prescreen_pass_overlap = models.FloatField(default=0.6, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)], help_text="Share of habit prompt keywords that marks a clear pass")
+    prescreen_sample_rate = models.FloatField(default=0.1, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)], help_text="Share of clear passes still sent to the model for review")
+    
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -51,25 +63,45 @@ class ValidationRule(models.Model):
         return f"{self.validation_type.title()} - {self.name}"
 
 class ValidationLog(models.Model):
+    DECISION_SOURCES = [
+        ('model', 'AI Model'),
+        ('prescreen', 'Local Pre-screen'),
+        ('cache', 'Cache'),
+        ('coalesced', 'Shared In-flight Call'),
+        ('manual', 'Manual'),
+    ]
+    
     checkin = models.ForeignKey('core.DailyCheckIn', on_delete=models.CASCADE, related_name='validation_logs')
     validation_rule = models.ForeignKey(ValidationRule, on_delete=models.CASCADE, null=True, blank=True)
     
     # Input data
     input_data_preview = models.TextField(blank=True, help_text="Preview of the input data sent to AI")
     
-    # AI Response
-    ai_response_raw = models.TextField(blank=True, help_text="Raw response from AI")
-    ai_response_parsed = models.JSONField(default=dict, help_text="Parsed JSON response from AI")
+    # AI response: stored compressed in ValidationLogPayload, see ai_response_raw/ai_response_parsed
     
     # Validation results
     confidence_score = models.FloatField(null=True, blank=True, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
     is_approved = models.BooleanField(default=False)
     processing_time = models.FloatField(null=True, blank=True, help_text="Processing time in seconds")
+    decision_source = models.CharField(max_length=20, choices=DECISION_SOURCES, default='model')
+    
+    # Cost and latency accounting
+    model_name = models.CharField(max_length=50, blank=True)
+    prompt_tokens = models.IntegerField(null=True, blank=True)
+    output_tokens = models.IntegerField(null=True, blank=True)
+    queue_wait_time = models.FloatField(null=True, blank=True, help_text="Seconds between queueing and the start of validation")
+    file_read_time = models.FloatField(null=True, blank=True, help_text="Seconds reading and preparing proof files")
+    model_time = models.FloatField(null=True, blank=True, help_text="Seconds in model calls, including retries")
+    parse_time = models.FloatField(null=True, blank=True, help_text="Seconds parsing the model response")
+    db_write_time = models.FloatField(null=True, blank=True, help_text="Seconds writing the check-in and cache rows")
     
     # Status
     success = models.BooleanField(default=False)
     error_message = models.TextField(blank=True)
     retry_count = models.IntegerField(default=0)
+    next_retry_at = models.DateTimeField(null=True, blank=True, help_text="Earliest time the retry sweeper may retry this failure")
+    retry_queued_at = models.DateTimeField(null=True, blank=True, help_text="When the running retry was queued")
+    retry_batch = models.ForeignKey('RetryBatch', on_delete=models.SET_NULL, null=True, blank=True, related_name='logs')
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -78,9 +110,121 @@ class ValidationLog(models.Model):
     class Meta:
         db_table = 'validation_logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['success', 'next_retry_at']),
+        ]
     
     def __str__(self):
         return f"Validation for {self.checkin.habit.title} - {self.created_at}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if getattr(self, '_payload_dirty', False):
+            self.store_payload(**self._payload)
+    
+    @property
+    def ai_response_raw(self):
+        """Raw response from AI, loaded from the payload table on first access"""
+        return self._load_payload()['raw']
+    
+    @ai_response_raw.setter
+    def ai_response_raw(self, value):
+        self._load_payload()['raw'] = value
+        self._payload_dirty = True
+    
+    @property
+    def ai_response_parsed(self):
+        """Parsed JSON response from AI, loaded from the payload table on first access"""
+        return self._load_payload()['parsed']
+    
+    @ai_response_parsed.setter
+    def ai_response_parsed(self, value):
+        self._load_payload()['parsed'] = value
+        self._payload_dirty = True
+    
+    def store_payload(self, raw, parsed):
+        """Write the compressed response payload for this log"""
+        self._payload = {'raw': raw, 'parsed': parsed}
+        self._payload_dirty = False
+        ValidationLogPayload.objects.update_or_create(
+            validation_log=self,
+            defaults={'data': ValidationLogPayload.pack(raw, parsed)}
+        )
+    
+    def _load_payload(self):
+        if getattr(self, '_payload', None) is None:
+            self._payload = {'raw': '', 'parsed': {}}
+            if self.pk:
+                try:
+                    self._payload = self.payload.unpack()
+                except ValidationLogPayload.DoesNotExist:
+                    pass
+        return self._payload
+
+class ValidationLogPayload(models.Model):
+    """Raw and parsed AI response of a ValidationLog, zlib-compressed and kept out of the log table"""
+    validation_log = models.OneToOneField(ValidationLog, on_delete=models.CASCADE, primary_key=True, related_name='payload')
+    data = models.BinaryField(help_text="zlib-compressed JSON of the raw and parsed response")
+    
+    class Meta:
+        db_table = 'validation_log_payloads'
+    
+    def __str__(self):
+        return f"Payload for validation log {self.validation_log_id}"
+    
+    @staticmethod
+    def pack(raw, parsed):
+        return zlib.compress(json.dumps({'raw': raw, 'parsed': parsed}).encode(), settings.AI_VALIDATION_LOG_COMPRESSION_LEVEL)
+    
+    def unpack(self):
+        return json.loads(zlib.decompress(bytes(self.data)))
+
+class ValidationJob(models.Model):
+    """Handle for a validation submitted through the API and run by a worker"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('deferred', 'Deferred'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    FINISHED_STATUSES = ('completed', 'failed')
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    checkin = models.ForeignKey('core.DailyCheckIn', on_delete=models.CASCADE, related_name='validation_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(default=dict, blank=True, help_text="Validation response once finished")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'validation_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Validation job {self.id} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+class RetryBatch(models.Model):
+    """Handle for a bulk retry of failed validations; the retry sweeper paces the work"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='validation_retry_batches'
+    )
+    filters = models.JSONField(default=dict, blank=True)
+    total = models.IntegerField(default=0, help_text="Failed validations matched by the filters")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'validation_retry_batches'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Retry batch {self.id} ({self.total} validations)"
 
 class AITrainingData(models.Model):
     DATA_TYPES = [
@@ -140,8 +284,22 @@ class ModelPerformance(models.Model):
     total_requests = models.IntegerField(default=0)
     successful_requests = models.IntegerField(default=0)
     failed_requests = models.IntegerField(default=0)
-    average_confidence = models.FloatField(default=0.0)
-    average_processing_time = models.FloatField(default=0.0)
+    
+    # Sums and counts, incremented atomically; averages are derived on read
+    confidence_sum = models.FloatField(default=0.0)
+    confidence_count = models.IntegerField(default=0)
+    processing_time_sum = models.FloatField(default=0.0)
+    processing_time_count = models.IntegerField(default=0)
+    latency_sketch = models.JSONField(default=dict, blank=True, help_text="Mergeable processing time sketch for percentiles")
+    
+    # Cost and per-stage latency totals
+    prompt_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
+    queue_wait_time_sum = models.FloatField(default=0.0)
+    file_read_time_sum = models.FloatField(default=0.0)
+    model_time_sum = models.FloatField(default=0.0)
+    parse_time_sum = models.FloatField(default=0.0)
+    db_write_time_sum = models.FloatField(default=0.0)
     
     # Accuracy metrics (based on user feedback)
     false_positives = models.IntegerField(default=0)
@@ -158,6 +316,43 @@ class ModelPerformance(models.Model):
     
     def __str__(self):
         return f"{self.validation_rule.name} - {self.date}"
+    
+    @property
+    def average_confidence(self):
+        return self.confidence_sum / self.confidence_count if self.confidence_count else 0.0
+    
+    @property
+    def average_processing_time(self):
+        return self.processing_time_sum / self.processing_time_count if self.processing_time_count else 0.0
+    
+    @property
+    def latency_percentiles(self):
+        """p50/p95/p99 processing time in seconds"""
+        sketch = LatencySketch.from_dict(self.latency_sketch)
+        return {
+            'p50': sketch.quantile(0.50),
+            'p95': sketch.quantile(0.95),
+            'p99': sketch.quantile(0.99),
+        }
+
+class PerformanceEvent(models.Model):
+    """Append-only buffer of validation outcomes, folded into ModelPerformance by a periodic flush"""
+    validation_rule = models.ForeignKey(ValidationRule, on_delete=models.CASCADE)
+    date = models.DateField()
+    success = models.BooleanField()
+    confidence_score = models.FloatField(null=True, blank=True)
+    processing_time = models.FloatField(null=True, blank=True)
+    prompt_tokens = models.IntegerField(null=True, blank=True)
+    output_tokens = models.IntegerField(null=True, blank=True)
+    queue_wait_time = models.FloatField(null=True, blank=True)
+    file_read_time = models.FloatField(null=True, blank=True)
+    model_time = models.FloatField(null=True, blank=True)
+    parse_time = models.FloatField(null=True, blank=True)
+    db_write_time = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'performance_events'
 
 class ValidationCache(models.Model):
     """Cache for frequent validations to reduce API calls"""
@@ -179,4 +374,68 @@ class ValidationCache(models.Model):
         ]
     
     def __str__(self):
-        return f"Cache: {self.input_hash[:16]}... ({self.usage_count} uses)"
\ No newline at end of file
+        return f"Cache: {self.input_hash[:16]}... ({self.usage_count} uses)"
+
+class InsightRun(models.Model):
+    """One run of the weekly insights fan-out, persisted so it can resume"""
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('abandoned', 'Abandoned'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    total_users = models.IntegerField(default=0)
+    processed_users = models.IntegerField(default=0)
+    insights_created = models.IntegerField(default=0)
+    fallback_insights = models.IntegerField(default=0, help_text="Insights from the fallback template after a model failure")
+    template_insights = models.IntegerField(default=0, help_text="Template insights for users without activity, made without a model call")
+    reused_insights = models.IntegerField(default=0, help_text="Users whose last insight was kept because its input was unchanged")
+    failed_users = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'insight_runs'
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Insight run {self.id} ({self.status})"
+    
+    @property
+    def duration(self):
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+    
+    @property
+    def throughput(self):
+        """Users processed per second"""
+        return self.processed_users / self.duration if self.duration > 0 else 0.0
+
+class InsightRunChunk(models.Model):
+    """A keyset range of user ids handled by one generate_insights_chunk task"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    run = models.ForeignKey(InsightRun, on_delete=models.CASCADE, related_name='chunks')
+    first_user_id = models.BigIntegerField()
+    last_user_id = models.BigIntegerField()
+    user_count = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a task took the chunk; other tasks wait out AI_INSIGHT_CHUNK_LEASE from here")
+    deferrals = models.IntegerField(default=0, help_text="Times the chunk was put back while the AI circuit breaker was open")
+    insights_created = models.IntegerField(default=0)
+    fallback_insights = models.IntegerField(default=0)
+    template_insights = models.IntegerField(default=0)
+    reused_insights = models.IntegerField(default=0)
+    failed_users = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    duration = models.FloatField(null=True, blank=True, help_text="Seconds")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'insight_run_chunks'
+        ordering = ['first_user_id']
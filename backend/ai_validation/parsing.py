@@ -0,0 +1,210 @@
+import json
+import re
+import threading
+from typing import NamedTuple
+
+# Schema-constrained output: Gemini returns exactly this JSON object
+VALIDATION_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'confidence': {'type': 'number'},
+        'is_approved': {'type': 'boolean'},
+        'explanation': {'type': 'string'},
+    },
+    'required': ['confidence', 'is_approved', 'explanation'],
+}
+
+VALIDATION_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': VALIDATION_RESPONSE_SCHEMA,
+}
+
+# Several text check-ins in one prompt: one verdict per item, keyed by its id
+BATCH_VALIDATION_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'verdicts': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': dict(VALIDATION_RESPONSE_SCHEMA['properties'], id={'type': 'integer'}),
+                'required': ['id'] + VALIDATION_RESPONSE_SCHEMA['required'],
+            },
+        },
+    },
+    'required': ['verdicts'],
+}
+
+BATCH_VALIDATION_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': BATCH_VALIDATION_RESPONSE_SCHEMA,
+}
+
+# Streaming: Gemini emits schema properties in alphabetical order, so the
+# free-text field is named 'reasoning' to arrive after both verdict fields
+STREAM_VALIDATION_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'confidence': {'type': 'number'},
+        'is_approved': {'type': 'boolean'},
+        'reasoning': {'type': 'string'},
+    },
+    'required': ['confidence', 'is_approved', 'reasoning'],
+}
+
+STREAM_VALIDATION_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': STREAM_VALIDATION_RESPONSE_SCHEMA,
+}
+
+class ResponseParseError(ValueError):
+    """Raised when a model response is not a valid verdict object"""
+
+class ValidationVerdict(NamedTuple):
+    confidence: float
+    is_approved: bool
+    explanation: str
+    data: dict
+
+def parse_verdict(response_text):
+    """Decode a schema-constrained response in one pass and validate it"""
+    try:
+        data = json.loads(response_text)
+    except ValueError as e:
+        raise ResponseParseError(f"Invalid JSON: {str(e)}")
+    return verdict_from_data(data)
+
+def verdict_from_data(data):
+    """Validate an already decoded verdict object"""
+    if not isinstance(data, dict):
+        raise ResponseParseError("Response is not a JSON object")
+
+    confidence = data.get('confidence')
+    is_approved = data.get('is_approved')
+    explanation = data.get('explanation')
+
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+        raise ResponseParseError("'confidence' must be a number")
+    if not 0.0 <= confidence <= 1.0:
+        raise ResponseParseError("'confidence' must be between 0 and 1")
+    if not isinstance(is_approved, bool):
+        raise ResponseParseError("'is_approved' must be a boolean")
+    if not isinstance(explanation, str):
+        raise ResponseParseError("'explanation' must be a string")
+
+    return ValidationVerdict(float(confidence), is_approved, explanation, data)
+
+def parse_batch_verdicts(response_text):
+    """Decode a batch response into {item id: ValidationVerdict}.
+
+    Items that are malformed or lack an id are left out so the caller can
+    validate them on their own.
+    """
+    try:
+        data = json.loads(response_text)
+    except ValueError as e:
+        raise ResponseParseError(f"Invalid JSON: {str(e)}")
+
+    items = data.get('verdicts') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ResponseParseError("Batch response has no 'verdicts' list")
+
+    verdicts = {}
+    for item in items:
+        if not isinstance(item, dict) or isinstance(item.get('id'), bool):
+            continue
+        try:
+            item_id = int(item.get('id'))
+            verdicts[item_id] = verdict_from_data(item)
+        except (TypeError, ValueError):
+            continue
+    return verdicts
+
+class VerdictStreamParser:
+    """Pick the verdict out of a streamed JSON response as chunks arrive.
+
+    `feed` returns True once both `confidence` and `is_approved` are
+    complete, usually long before the explanation has been generated.
+    """
+
+    CONFIDENCE_RE = re.compile(r'(?<!\\)"confidence"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*[,}]')
+    IS_APPROVED_RE = re.compile(r'(?<!\\)"is_approved"\s*:\s*(true|false)\b')
+
+    def __init__(self):
+        self.text = ''
+        self.confidence = None
+        self.is_approved = None
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.confidence is None:
+            match = self.CONFIDENCE_RE.search(self.text)
+            if match:
+                self.confidence = float(match.group(1))
+        if self.is_approved is None:
+            match = self.IS_APPROVED_RE.search(self.text)
+            if match:
+                self.is_approved = match.group(1) == 'true'
+        return self.has_verdict
+
+    @property
+    def has_verdict(self):
+        return self.confidence is not None and self.is_approved is not None
+
+    def early_verdict(self, explanation=''):
+        """Verdict from the fields seen so far, with a stand-in explanation"""
+        return verdict_from_data({
+            'confidence': self.confidence,
+            'is_approved': self.is_approved,
+            'explanation': explanation,
+        })
+
+    def final_verdict(self):
+        """Verdict from the complete response"""
+        return parse_verdict(self.response_text())
+
+    def response_text(self):
+        """The complete response with 'reasoning' reported as 'explanation'"""
+        try:
+            data = json.loads(self.text)
+        except ValueError:
+            return self.text
+        if isinstance(data, dict) and 'reasoning' in data and 'explanation' not in data:
+            data['explanation'] = data.pop('reasoning')
+            return json.dumps(data)
+        return self.text
+
+class ParseStats:
+    """Process-wide counters for response parsing"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._parsed = 0
+            self._failed = 0
+            self._parse_seconds = 0.0
+
+    def record(self, parsed, seconds):
+        with self._lock:
+            if parsed:
+                self._parsed += 1
+            else:
+                self._failed += 1
+            self._parse_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            total = self._parsed + self._failed
+            return {
+                'responses': total,
+                'parsed': self._parsed,
+                'failed': self._failed,
+                'failure_rate': self._failed / total if total else 0.0,
+                'parse_seconds_total': self._parse_seconds,
+                'parse_seconds_avg': self._parse_seconds / total if total else 0.0,
+            }
+
+parse_stats = ParseStats()
@@ -0,0 +1,124 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ModelPerformance, PerformanceEvent
+from .sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+# Validation stages timed on ValidationLog as <stage>_time
+STAGES = ('queue_wait', 'file_read', 'model', 'parse', 'db_write')
+
+@contextmanager
+def stage_timer(timings, stage):
+    """Add the seconds spent in the block to timings[stage]"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+def record_performance_event(validation_log):
+    """Append a validation outcome to the aggregation buffer"""
+    PerformanceEvent.objects.create(
+        validation_rule_id=validation_log.validation_rule_id,
+        date=timezone.localdate(validation_log.created_at),
+        success=validation_log.success,
+        confidence_score=validation_log.confidence_score,
+        processing_time=validation_log.processing_time,
+        prompt_tokens=validation_log.prompt_tokens,
+        output_tokens=validation_log.output_tokens,
+        **{f'{stage}_time': getattr(validation_log, f'{stage}_time') for stage in STAGES}
+    )
+
+def flush_performance_events(batch_size=None):
+    """Fold buffered events into ModelPerformance rows.
+
+    Each batch is claimed, aggregated per rule and day, applied as F()
+    increments and deleted in one transaction, so concurrent flushers
+    neither double count nor lose events. Returns the number of events
+    applied.
+    """
+    batch_size = batch_size or settings.AI_PERFORMANCE_FLUSH_BATCH_SIZE
+    flushed = 0
+
+    while True:
+        with transaction.atomic():
+            events = list(
+                PerformanceEvent.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+
+            for (rule_id, day), totals in _aggregate(events).items():
+                _apply(rule_id, day, totals)
+            PerformanceEvent.objects.filter(id__in=[event.id for event in events]).delete()
+
+        flushed += len(events)
+        if len(events) < batch_size:
+            break
+
+    return flushed
+
+def _aggregate(events):
+    totals = defaultdict(lambda: {
+        'total': 0,
+        'successful': 0,
+        'confidence_sum': 0.0,
+        'confidence_count': 0,
+        'processing_time_sum': 0.0,
+        'processing_time_count': 0,
+        'sketch': LatencySketch(),
+        'prompt_tokens': 0,
+        'output_tokens': 0,
+        **{f'{stage}_time_sum': 0.0 for stage in STAGES},
+    })
+    for event in events:
+        entry = totals[(event.validation_rule_id, event.date)]
+        entry['total'] += 1
+        if event.success:
+            entry['successful'] += 1
+            if event.confidence_score is not None:
+                entry['confidence_sum'] += event.confidence_score
+                entry['confidence_count'] += 1
+        if event.processing_time is not None:
+            entry['processing_time_sum'] += event.processing_time
+            entry['processing_time_count'] += 1
+            entry['sketch'].add(event.processing_time)
+        entry['prompt_tokens'] += event.prompt_tokens or 0
+        entry['output_tokens'] += event.output_tokens or 0
+        for stage in STAGES:
+            entry[f'{stage}_time_sum'] += getattr(event, f'{stage}_time') or 0.0
+    return totals
+
+def _apply(rule_id, day, totals):
+    performance, _ = ModelPerformance.objects.get_or_create(validation_rule_id=rule_id, date=day)
+    # The sketch cannot be merged in SQL: lock the row while it is rewritten
+    sketch_data = ModelPerformance.objects.select_for_update().values_list(
+        'latency_sketch', flat=True
+    ).get(pk=performance.pk)
+    sketch = LatencySketch.from_dict(sketch_data)
+    sketch.merge(totals['sketch'])
+
+    ModelPerformance.objects.filter(pk=performance.pk).update(
+        total_requests=F('total_requests') + totals['total'],
+        successful_requests=F('successful_requests') + totals['successful'],
+        failed_requests=F('failed_requests') + totals['total'] - totals['successful'],
+        confidence_sum=F('confidence_sum') + totals['confidence_sum'],
+        confidence_count=F('confidence_count') + totals['confidence_count'],
+        processing_time_sum=F('processing_time_sum') + totals['processing_time_sum'],
+        processing_time_count=F('processing_time_count') + totals['processing_time_count'],
+        latency_sketch=sketch.to_dict(),
+        prompt_tokens=F('prompt_tokens') + totals['prompt_tokens'],
+        output_tokens=F('output_tokens') + totals['output_tokens'],
+        **{
+            f'{stage}_time_sum': F(f'{stage}_time_sum') + totals[f'{stage}_time_sum']
+            for stage in STAGES
+        },
+        updated_at=timezone.now()
+    )
@@ -0,0 +1,74 @@
+import io
+import logging
+import mimetypes
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+MODEL_INPUT_MIME_TYPE = 'image/jpeg'
+
+def preprocess_photo(photo_file, max_edge=None, quality=None):
+    """Downscale and re-encode a photo for the model.
+
+    Detects the real format from the image data, applies and then drops the
+    EXIF orientation (saving without `exif` strips all metadata), fits the
+    image inside `max_edge` and re-encodes it as JPEG at `quality`.
+    Returns (jpeg_bytes, source_mime_type).
+    """
+    max_edge = max_edge or settings.AI_PHOTO_MAX_EDGE
+    quality = quality or settings.AI_PHOTO_JPEG_QUALITY
+
+    with Image.open(photo_file) as image:
+        source_mime_type = Image.MIME.get(image.format, 'application/octet-stream')
+
+        # Let the JPEG decoder downscale by DCT while decoding huge photos
+        image.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+
+    return output.getvalue(), source_mime_type
+
+def load_photo_model_input(checkin):
+    """Return (data, mime_type) for the check-in photo as sent to the model.
+
+    The preprocessed image is stored on the check-in as `photo_model_input`
+    and reused on later validations. Photos Pillow cannot decode are passed
+    through unchanged with a MIME type guessed from the file name.
+    """
+    if checkin.photo_model_input:
+        checkin.photo_model_input.open('rb')
+        try:
+            return checkin.photo_model_input.read(), MODEL_INPUT_MIME_TYPE
+        finally:
+            checkin.photo_model_input.close()
+
+    checkin.photo_proof.open('rb')
+    try:
+        data, source_mime_type = preprocess_photo(checkin.photo_proof)
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Could not preprocess photo for checkin {checkin.id}: {str(e)}")
+        checkin.photo_proof.seek(0)
+        raw_data = checkin.photo_proof.read()
+        mime_type = mimetypes.guess_type(checkin.photo_proof.name)[0] or MODEL_INPUT_MIME_TYPE
+        return raw_data, mime_type
+    finally:
+        checkin.photo_proof.close()
+
+    logger.info(
+        f"Preprocessed {source_mime_type} photo for checkin {checkin.id}: "
+        f"{checkin.photo_proof.size} -> {len(data)} bytes"
+    )
+
+    if checkin.pk:
+        # Update the column directly to skip DailyCheckIn.save() side effects
+        checkin.photo_model_input.save(f"{checkin.pk}.jpg", ContentFile(data), save=False)
+        type(checkin).objects.filter(pk=checkin.pk).update(photo_model_input=checkin.photo_model_input.name)
+
+    return data, MODEL_INPUT_MIME_TYPE
@@ -0,0 +1,80 @@
+import random
+import re
+from collections import Counter
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+CHAR_RUN_RE = re.compile(r'(.)\1*', re.DOTALL)
+
+STOPWORDS = frozenset({
+    'the', 'and', 'for', 'are', 'was', 'were', 'this', 'that', 'with', 'from',
+    'have', 'has', 'had', 'you', 'your', 'they', 'their', 'them', 'what', 'when',
+    'where', 'which', 'who', 'how', 'does', 'did', 'not', 'but', 'its', 'into',
+    'about', 'should', 'would', 'could', 'check', 'if', 'any', 'all', 'there',
+})
+
+MAX_CHAR_RUN = 10  # Longest run of one character before text counts as filler
+MAX_CHAR_SHARE = 0.5  # Largest share a single character may take of the text
+MIN_UNIQUE_WORD_RATIO = 0.3  # Below this the text repeats the same words
+PASS_LENGTH_FACTOR = 3  # Clear passes need this multiple of the minimum length
+PASS_UNIQUE_WORD_RATIO = 0.5
+
+def text_features(text, habit_prompt):
+    """Cheap lexical features of a text proof"""
+    stripped = text.strip()
+    words = WORD_RE.findall(stripped.lower())
+    compact = re.sub(r'\s+', '', stripped)
+    prompt_terms = {
+        word for word in WORD_RE.findall(habit_prompt.lower())
+        if len(word) > 2 and word not in STOPWORDS
+    }
+
+    return {
+        'length': len(stripped),
+        'word_count': len(words),
+        'unique_word_ratio': len(set(words)) / len(words) if words else 0.0,
+        'longest_char_run': max((len(m.group()) for m in CHAR_RUN_RE.finditer(compact)), default=0),
+        'max_char_share': Counter(compact).most_common(1)[0][1] / len(compact) if compact else 0.0,
+        'prompt_overlap': len(prompt_terms & set(words)) / len(prompt_terms) if prompt_terms else 0.0,
+    }
+
+def prescreen_text(text, habit_prompt, validation_rule):
+    """Decide obvious text submissions without the model.
+
+    Returns None when the model should decide, otherwise a decision dict
+    with 'is_approved', 'confidence', 'explanation', 'features' and
+    'sampled' (a clear pass picked for model review anyway).
+    """
+    features = text_features(text, habit_prompt)
+    min_length = validation_rule.prescreen_min_length
+
+    rejection = None
+    if features['length'] < min_length:
+        rejection = f"Text is too short ({features['length']} characters, minimum {min_length})"
+    elif features['longest_char_run'] >= MAX_CHAR_RUN or features['max_char_share'] > MAX_CHAR_SHARE:
+        rejection = "Text is mostly repeated characters"
+    elif features['word_count'] >= 10 and features['unique_word_ratio'] < MIN_UNIQUE_WORD_RATIO:
+        rejection = "Text repeats the same few words"
+
+    if rejection:
+        return {
+            'is_approved': False,
+            'confidence': 0.1,
+            'explanation': rejection,
+            'features': features,
+            'sampled': False,
+        }
+
+    if (
+        features['length'] >= min_length * PASS_LENGTH_FACTOR
+        and features['unique_word_ratio'] >= PASS_UNIQUE_WORD_RATIO
+        and features['prompt_overlap'] >= validation_rule.prescreen_pass_overlap
+    ):
+        return {
+            'is_approved': True,
+            'confidence': validation_rule.confidence_threshold,
+            'explanation': "Detailed text that matches the habit description",
+            'features': features,
+            'sampled': random.random() < validation_rule.prescreen_sample_rate,
+        }
+
+    return None
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .checks import shared_cache_configured
+from .models import ValidationRule
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION_KEY = 'ai_validation:rules_version'
+
+class ValidationRuleRegistry:
+    """Process-local map of active ValidationRules keyed by validation type.
+
+    All active rules are loaded in one query and kept in memory. Saving or
+    deleting a rule bumps a version number in the shared cache; each
+    process compares its loaded version at most every `check_interval`
+    seconds and reloads when it has changed. With a process-local cache
+    the version never reaches other processes, so rules are also
+    reloaded once they are `local_ttl` seconds old.
+    """
+
+    def __init__(self, check_interval=None, local_ttl=None):
+        self.check_interval = check_interval if check_interval is not None else settings.AI_RULE_REGISTRY_CHECK_INTERVAL
+        self.local_ttl = local_ttl
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget loaded rules; the next lookup reloads them"""
+        with self._lock:
+            self._rules = None
+            self._version = None
+            self._checked_at = 0.0
+            self._loaded_at = 0.0
+
+    def get(self, validation_type):
+        """Return the active rule for a validation type, or None"""
+        with self._lock:
+            now = time.monotonic()
+            if self._rules is None or now - self._checked_at >= self.check_interval:
+                version = self._shared_version()
+                if self._rules is None or version != self._version or self._expired(now):
+                    self._load(version)
+                    self._loaded_at = now
+                self._checked_at = now
+            return self._rules.get(validation_type)
+
+    def invalidate(self):
+        """Drop rules here and signal other processes to reload"""
+        try:
+            cache.add(RULES_VERSION_KEY, 0, None)
+            cache.incr(RULES_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to bump validation rule version: {str(e)}")
+        self.clear()
+
+    def _expired(self, now):
+        if shared_cache_configured():
+            return False
+        local_ttl = self.local_ttl if self.local_ttl is not None else settings.AI_RULE_REGISTRY_LOCAL_TTL
+        return now - self._loaded_at >= local_ttl
+
+    def _load(self, version):
+        rules = {}
+        for rule in ValidationRule.objects.filter(is_active=True):
+            if rule.validation_type in rules:
+                logger.warning(f"Multiple active validation rules for {rule.validation_type}, using '{rules[rule.validation_type].name}'")
+                continue
+            rules[rule.validation_type] = rule
+        self._rules = rules
+        self._version = version
+
+    def _shared_version(self):
+        try:
+            return cache.get(RULES_VERSION_KEY, 0)
+        except Exception as e:
+            logger.warning(f"Failed to read validation rule version: {str(e)}")
+            return self._version
+
+validation_rule_registry = ValidationRuleRegistry()
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import random
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"AI service unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def is_retryable(error):
+    """Whether a model error is transient (quota, overload, timeout)"""
+    from google.api_core import exceptions as google_exceptions
+    return isinstance(error, (
+        TimeoutError,
+        asyncio.TimeoutError,
+        google_exceptions.TooManyRequests,  # Includes ResourceExhausted (429)
+        google_exceptions.InternalServerError,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.GatewayTimeout,
+    ))
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry attempt"""
+    ceiling = min(settings.AI_RETRY_MAX_DELAY, settings.AI_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+def deferral_countdown(retry_after):
+    """Spread deferred tasks over the breaker cool-down instead of waking them together"""
+    return retry_after + random.uniform(0, retry_after)
+
+class RateLimiter:
+    """Client-side request rate limit shared by all processes via the cache.
+
+    Tokens refill once per second: each one-second window holds `rate`
+    tokens, counted with an atomic cache incr, so every web and worker
+    process draws from the same budget.
+    """
+
+    def __init__(self, name, rate=None):
+        self.name = name
+        self.rate = rate or settings.AI_RATE_LIMIT_PER_SECOND
+
+    def try_acquire(self):
+        """Take a token; return 0 on success or seconds to wait for the next refill"""
+        now = time.time()
+        window = int(now)
+        key = f'ai_rate:{self.name}:{window}'
+        try:
+            cache.add(key, 0, 5)
+            used = cache.incr(key)
+        except Exception as e:
+            # Never block validations on a broken cache backend
+            logger.warning(f"Rate limiter cache unavailable: {str(e)}")
+            return 0
+        if used <= self.rate:
+            return 0
+        return window + 1 - now + random.uniform(0, 0.05)
+
+    def acquire(self, deadline):
+        """Block until a token is available or raise TimeoutError at the deadline"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise TimeoutError("Rate limit wait exceeds validation deadline")
+            time.sleep(wait)
+
+    async def aacquire(self, deadline):
+        """Async variant of acquire()"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise TimeoutError("Rate limit wait exceeds validation deadline")
+            await asyncio.sleep(wait)
+
+class CircuitBreaker:
+    """Fail fast while the model keeps returning transient errors.
+
+    State lives in the cache so all processes trip and recover together.
+    After `failure_threshold` consecutive transient failures the breaker
+    opens for `reset_timeout` seconds; then a single probe call is let
+    through, which closes it on success or re-opens it on failure. A probe
+    that ends any other way must be handed back with release_probe().
+    """
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.AI_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.AI_CIRCUIT_RESET_TIMEOUT
+        self.failures_key = f'ai_circuit:{name}:failures'
+        self.open_until_key = f'ai_circuit:{name}:open_until'
+        self.probe_key = f'ai_circuit:{name}:probe'
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through.
+
+        Returns True when the caller took the half-open probe.
+        """
+        try:
+            open_until = cache.get(self.open_until_key)
+            if open_until is None:
+                return False
+            remaining = open_until - time.time()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            # Half-open: only one caller gets to probe
+            if not cache.add(self.probe_key, 1, self.reset_timeout):
+                raise CircuitOpenError(self.reset_timeout)
+            return True
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+            return False
+
+    def release_probe(self):
+        """Let the next caller probe, when the probe neither succeeded nor failed transiently"""
+        try:
+            cache.delete(self.probe_key)
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+
+    def state(self):
+        """('closed', 'open' or 'half_open', seconds until a probe is allowed), without taking the probe"""
+        try:
+            open_until = cache.get(self.open_until_key)
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+            return 'closed', 0.0
+        if open_until is None:
+            return 'closed', 0.0
+        remaining = open_until - time.time()
+        return ('open', remaining) if remaining > 0 else ('half_open', 0.0)
+
+    def record_success(self):
+        try:
+            cache.delete_many([self.failures_key, self.open_until_key, self.probe_key])
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+
+    def record_failure(self):
+        try:
+            cache.add(self.failures_key, 0, self.reset_timeout * 10)
+            failures = cache.incr(self.failures_key)
+            half_open = cache.get(self.open_until_key) is not None
+            if failures >= self.failure_threshold or half_open:
+                logger.warning(f"Opening AI circuit breaker '{self.name}' after {failures} failures")
+                cache.set(self.open_until_key, time.time() + self.reset_timeout, None)
+                cache.delete(self.probe_key)
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+
+gemini_rate_limiter = RateLimiter('gemini')
+gemini_circuit_breaker = CircuitBreaker('gemini')
+
+def call_with_resilience(call, timeout, limiter=None, breaker=None):
+    """Run `call(timeout=...)` under rate limit, retries and circuit breaker.
+
+    `timeout` is the hard budget in seconds for the whole call including
+    retries; each attempt receives what is left of it. A half-open probe
+    is always handed back, also when the rate limit wait or a
+    non-retryable error (a bad request the model did answer) ends it.
+    """
+    limiter = limiter or gemini_rate_limiter
+    breaker = breaker or gemini_circuit_breaker
+    deadline = time.monotonic() + timeout
+
+    for attempt in range(settings.AI_RETRY_MAX_ATTEMPTS):
+        probing = breaker.before_call()
+        try:
+            limiter.acquire(deadline)
+            try:
+                response = call(timeout=max(deadline - time.monotonic(), 0.1))
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                breaker.record_failure()
+                delay = backoff_delay(attempt)
+                if attempt + 1 == settings.AI_RETRY_MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+                    raise
+                logger.info(f"Retrying model call in {delay:.2f}s after: {str(e)}")
+            else:
+                breaker.record_success()
+                return response
+        finally:
+            if probing:
+                breaker.release_probe()
+        time.sleep(delay)
+
+async def acall_with_resilience(call, timeout, limiter=None, breaker=None):
+    """Async variant of call_with_resilience() for awaitable calls"""
+    limiter = limiter or gemini_rate_limiter
+    breaker = breaker or gemini_circuit_breaker
+    deadline = time.monotonic() + timeout
+
+    for attempt in range(settings.AI_RETRY_MAX_ATTEMPTS):
+        probing = breaker.before_call()
+        try:
+            await limiter.aacquire(deadline)
+            remaining = max(deadline - time.monotonic(), 0.1)
+            try:
+                response = await asyncio.wait_for(call(timeout=remaining), remaining)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                breaker.record_failure()
+                delay = backoff_delay(attempt)
+                if attempt + 1 == settings.AI_RETRY_MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+                    raise
+                logger.info(f"Retrying model call in {delay:.2f}s after: {str(e)}")
+            else:
+                breaker.record_success()
+                return response
+        finally:
+            if probing:
+                breaker.release_probe()
+        await asyncio.sleep(delay)
@@ -0,0 +1,206 @@
+import logging
+import random
+from datetime import timedelta
+from itertools import chain, zip_longest
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import RetryBatch, ValidationLog
+from .resilience import deferral_countdown, gemini_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+def retry_backoff(retry_count):
+    """Seconds to wait after attempt `retry_count` + 1 before the next one.
+
+    Doubles per attempt up to AI_VALIDATION_RETRY_MAX_DELAY, with half of
+    it jittered so failures from one outage do not come back together.
+    """
+    delay = min(
+        settings.AI_VALIDATION_RETRY_MAX_DELAY,
+        settings.AI_VALIDATION_RETRY_BASE_DELAY * 2 ** retry_count
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def failed_validations():
+    """Failed validation logs whose check-in has not been validated since"""
+    return ValidationLog.objects.filter(success=False).exclude(checkin__validated_at__gte=F('created_at'))
+
+def _not_in_flight(now):
+    lease_cutoff = now - timedelta(seconds=settings.AI_VALIDATION_RETRY_LEASE)
+    return Q(retry_queued_at__isnull=True) | Q(retry_queued_at__lt=lease_cutoff)
+
+def retryable_validations(now=None):
+    """Failed validations the sweeper should retry now.
+
+    Attempts are capped by AI_VALIDATION_RETRY_MAX_ATTEMPTS and failures
+    older than AI_VALIDATION_RETRY_MAX_AGE_HOURS are left alone, unless a
+    bulk retry asked for them. A first retry waits
+    AI_VALIDATION_RETRY_BASE_DELAY after the failure.
+    """
+    now = now or timezone.now()
+    return failed_validations().filter(
+        Q(created_at__gte=now - timedelta(hours=settings.AI_VALIDATION_RETRY_MAX_AGE_HOURS))
+        | Q(retry_batch__isnull=False),
+        Q(next_retry_at__lte=now)
+        | Q(next_retry_at__isnull=True, created_at__lte=now - timedelta(seconds=settings.AI_VALIDATION_RETRY_BASE_DELAY)),
+        _not_in_flight(now),
+        retry_count__lt=settings.AI_VALIDATION_RETRY_MAX_ATTEMPTS,
+        validation_rule__is_active=True
+    )
+
+def claim_retry(log_id, retry_count, now=None):
+    """Mark a failed validation as queued for another attempt.
+
+    Counts the attempt and schedules the next one after retry_backoff();
+    returns False if a retry of it is already in flight.
+    """
+    now = now or timezone.now()
+    return bool(ValidationLog.objects.filter(_not_in_flight(now), id=log_id, success=False).update(
+        retry_queued_at=now,
+        retry_count=F('retry_count') + 1,
+        next_retry_at=now + timedelta(seconds=retry_backoff(retry_count))
+    ))
+
+def sweep_failed_validations(now=None):
+    """Queue due retries of failed validations, paced and capped.
+
+    No more than AI_VALIDATION_RETRY_CONCURRENCY retries are in flight
+    across all workers. Candidates are taken per validation rule and
+    interleaved so a backlog for one rule cannot starve the others, and a
+    check-in is never retried twice at once. Nothing is queued while the
+    circuit breaker is open, and only a single retry while it is half
+    open, so recovery after an outage ramps up instead of stampeding.
+    The retries queued by one sweep are spread over the sweep interval.
+    """
+    from .tasks import retry_validation_task
+
+    now = now or timezone.now()
+    state, remaining = gemini_circuit_breaker.state()
+    if state == 'open':
+        return {'queued': 0, 'circuit': state, 'retry_after': remaining}
+
+    running = ValidationLog.objects.filter(
+        success=False,
+        retry_queued_at__gte=now - timedelta(seconds=settings.AI_VALIDATION_RETRY_LEASE)
+    )
+    in_flight = running.count()
+    slots = settings.AI_VALIDATION_RETRY_CONCURRENCY - in_flight
+    if state == 'half_open':
+        slots = min(slots, 1)
+    if slots <= 0:
+        return {'queued': 0, 'circuit': state, 'in_flight': in_flight}
+
+    candidates = retryable_validations(now).exclude(checkin_id__in=running.values('checkin_id'))
+    rule_ids = list(candidates.order_by().values_list('validation_rule_id', flat=True).distinct())
+    per_rule = [
+        list(
+            candidates.filter(validation_rule_id=rule_id)
+            .order_by(F('next_retry_at').asc(nulls_first=True), 'created_at')
+            .values_list('id', 'checkin_id', 'retry_count')[:slots]
+        )
+        for rule_id in rule_ids
+    ]
+
+    chosen = []
+    checkin_ids = set()
+    for candidate in chain.from_iterable(zip_longest(*per_rule)):
+        if candidate is None or candidate[1] in checkin_ids:
+            continue
+        chosen.append(candidate)
+        checkin_ids.add(candidate[1])
+        if len(chosen) == slots:
+            break
+
+    queued = 0
+    spacing = settings.AI_VALIDATION_RETRY_SWEEP_INTERVAL / len(chosen) if chosen else 0
+    for log_id, _, retry_count in chosen:
+        if not claim_retry(log_id, retry_count, now):
+            continue
+        retry_validation_task.apply_async((log_id,), countdown=queued * spacing)
+        queued += 1
+
+    if queued:
+        logger.info(f"Queued {queued} validation retries across {len(rule_ids)} rules ({in_flight} already in flight)")
+    return {'queued': queued, 'circuit': state, 'in_flight': in_flight + queued}
+
+def retry_validation(log_id):
+    """Validate a failed log's check-in again and record the outcome on that log.
+
+    A deferral (circuit breaker open) does not count as an attempt: the
+    retry is rescheduled for after the cool-down. Returns the result.
+    """
+    from .services import AIService
+
+    log = ValidationLog.objects.select_related('checkin__habit').get(id=log_id)
+    ai_service = AIService()
+    try:
+        result = ai_service.validate_checkin(log.checkin)
+    except Exception as e:
+        result = ai_service._create_error_result(str(e))
+
+    now = timezone.now()
+    if result.get('deferred'):
+        ValidationLog.objects.filter(id=log.id).update(
+            retry_queued_at=None,
+            retry_count=Greatest(F('retry_count') - 1, 0),
+            next_retry_at=now + timedelta(seconds=deferral_countdown(result['retry_after']))
+        )
+        return result
+
+    log.refresh_from_db(fields=['retry_count', 'next_retry_at'])
+    log.retry_queued_at = None
+    log.completed_at = now
+    if result['success']:
+        log.success = True
+        log.error_message = ''
+        log.confidence_score = result['confidence']
+        log.is_approved = result['is_approved']
+        log.ai_response_raw = result.get('raw_response', '')
+        log.ai_response_parsed = result.get('parsed_data', {})
+        log.processing_time = result.get('processing_time', 0)
+        log.decision_source = result.get('source', 'model')
+
+        checkin = log.checkin
+        checkin.ai_confidence = result['confidence']
+        checkin.ai_feedback = result['explanation']
+        checkin.is_approved = result['is_approved']
+        checkin.validated_at = now
+        checkin.save()
+    else:
+        log.error_message = result.get('error', '')
+    log.save()
+    return result
+
+def start_retry_batch(queryset, requested_by=None, filters=None, reset_attempts=False):
+    """Schedule the failed validations in `queryset` for retry as one batch.
+
+    They become due at once and the sweeper then works through them at
+    its usual pace. Their attempt counts are only reset with
+    `reset_attempts` (staff requests); otherwise validations that used up
+    AI_VALIDATION_RETRY_MAX_ATTEMPTS stay exhausted. Returns the
+    RetryBatch used as the job handle.
+    """
+    now = timezone.now()
+    batch = RetryBatch.objects.create(requested_by=requested_by, filters=filters or {})
+    updates = {'retry_batch': batch, 'next_retry_at': now}
+    if reset_attempts:
+        updates['retry_count'] = 0
+    batch.total = ValidationLog.objects.filter(id__in=queryset.values('id')).update(**updates)
+    batch.save(update_fields=['total'])
+    return batch
+
+def retry_batch_progress(batch):
+    """Counts of a batch's validations by retry state, and the batch status"""
+    now = timezone.now()
+    in_flight = Q(success=False, retry_queued_at__gte=now - timedelta(seconds=settings.AI_VALIDATION_RETRY_LEASE))
+    waiting = Q(success=False, retry_count__lt=settings.AI_VALIDATION_RETRY_MAX_ATTEMPTS) & ~in_flight
+    counts = batch.logs.aggregate(
+        succeeded=Count('id', filter=Q(success=True)),
+        in_flight=Count('id', filter=in_flight),
+        pending=Count('id', filter=waiting),
+        exhausted=Count('id', filter=Q(success=False, retry_count__gte=settings.AI_VALIDATION_RETRY_MAX_ATTEMPTS) & ~in_flight),
+    )
+    counts['status'] = 'running' if counts['pending'] or counts['in_flight'] else 'completed'
+    return counts
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import AIConfig, ValidationRule, ValidationLog, AITrainingData, AIFeedback, ModelPerformance, ValidationCache
+from django.urls import reverse
+from .models import AIConfig, ValidationRule, ValidationLog, ValidationJob, RetryBatch, AITrainingData, AIFeedback, ModelPerformance, ValidationCache
 
 class AIConfigSerializer(serializers.ModelSerializer):
     class Meta:
@@ -34,6 +35,51 @@ class ValidationLogSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('created_at', 'completed_at')
 
+class ValidationLogDetailSerializer(ValidationLogSerializer):
+    ai_response_raw = serializers.CharField(read_only=True)
+    ai_response_parsed = serializers.JSONField(read_only=True)
+
+class ValidationJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    status_url = serializers.SerializerMethodField()
+    events_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ValidationJob
+        fields = ('job_id', 'checkin', 'status', 'result', 'status_url', 'events_url', 'created_at', 'updated_at')
+        read_only_fields = fields
+    
+    def get_status_url(self, obj):
+        return self.context['request'].build_absolute_uri(reverse('ai:validation-job', args=[obj.id]))
+    
+    def get_events_url(self, obj):
+        return self.context['request'].build_absolute_uri(reverse('ai:validation-job-events', args=[obj.id]))
+
+class RetryBatchRequestSerializer(serializers.Serializer):
+    """Filters selecting the failed validations to retry; all optional"""
+    validation_type = serializers.ChoiceField(choices=ValidationRule.VALIDATION_TYPES, required=False)
+    validation_rule = serializers.PrimaryKeyRelatedField(queryset=ValidationRule.objects.all(), required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    error_contains = serializers.CharField(required=False, max_length=200)
+
+class RetryBatchSerializer(serializers.ModelSerializer):
+    batch_id = serializers.UUIDField(source='id', read_only=True)
+    progress = serializers.SerializerMethodField()
+    status_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = RetryBatch
+        fields = ('batch_id', 'filters', 'total', 'progress', 'status_url', 'created_at')
+        read_only_fields = fields
+    
+    def get_progress(self, obj):
+        from .retries import retry_batch_progress
+        return retry_batch_progress(obj)
+    
+    def get_status_url(self, obj):
+        return self.context['request'].build_absolute_uri(reverse('ai:validation-retry', args=[obj.id]))
+
 class AITrainingDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = AITrainingData
@@ -61,10 +107,13 @@ class AIFeedbackSerializer(serializers.ModelSerializer):
 class ModelPerformanceSerializer(serializers.ModelSerializer):
     validation_rule_name = serializers.CharField(source='validation_rule.name', read_only=True)
     success_rate = serializers.SerializerMethodField()
+    average_confidence = serializers.FloatField(read_only=True)
+    average_processing_time = serializers.FloatField(read_only=True)
+    latency_percentiles = serializers.DictField(read_only=True)
     
     class Meta:
         model = ModelPerformance
-        fields = '__all__'
+        exclude = ('latency_sketch',)
         read_only_fields = ('created_at', 'updated_at')
     
     def get_success_rate(self, obj):
@@ -1,122 +1,448 @@
-import google.generativeai as genai
+import asyncio
+import threading
 import time
 import json
-import base64
 import hashlib
 import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.db import connection
 from django.utils import timezone
 # Assuming .models imports are correct for your Django project structure
-from .models import AIConfig, ValidationRule, ValidationCache, ModelPerformance
+from .models import ValidationLog
+from .audio import AudioDecodeError, fit_audio_inline, load_audio_model_input, screen_audio
+from .backends import get_validation_backend
+from .cache import validation_cache
+from .clients import gemini_clients
+from .insight_data import gather_analysis_data, insight_fingerprint
+from .keyframes import (
+    FRAME_MIME_TYPE, KeyframeExtractionError, ffmpeg_available, load_screen_recording, load_screen_recording_frames
+)
+from .preprocessing import load_photo_model_input
+from .parsing import (
+    BATCH_VALIDATION_GENERATION_CONFIG, STREAM_VALIDATION_GENERATION_CONFIG, VALIDATION_GENERATION_CONFIG,
+    ResponseParseError, VerdictStreamParser, parse_batch_verdicts, parse_stats, parse_verdict
+)
+from .performance import stage_timer
+from .prescreen import prescreen_text
+from .registry import validation_rule_registry
+from .resilience import CircuitOpenError, call_with_resilience, acall_with_resilience
+from .singleflight import validation_flight
 
 logger = logging.getLogger(__name__)
 
+class ValidationInputError(Exception):
+    """Raised when a check-in cannot be turned into model input"""
+
+class ProofRejected(Exception):
+    """Raised while building model input when local checks already reject the proof"""
+    
+    def __init__(self, decision):
+        super().__init__(decision['explanation'])
+        self.decision = decision
+
 class AIService:
     def __init__(self):
         self.api_key = settings.GOOGLE_AI_API_KEY
-        self.model_cache = {}
-        
-        if self.api_key:
-            # The configuration method remains the same
-            genai.configure(api_key=self.api_key)
-        else:
-            logger.warning("GOOGLE_AI_API_KEY not set. AI validation will not work.")
+        self.backend = get_validation_backend(self)
     
     def get_model(self, model_name='gemini-2.5-flash'): # Recommended update to a current model
-        """Get or create a Gemini model instance"""
-        if model_name not in self.model_cache:
-            try:
-                # The model initialization remains the same
-                self.model_cache[model_name] = genai.GenerativeModel(model_name)
-            except Exception as e:
-                logger.error(f"Failed to create model {model_name}: {str(e)}")
-                raise
-        return self.model_cache[model_name]
+        """Get the process-wide Gemini model instance.
+        
+        The SDK is imported and configured on the first call in each
+        process; models and their connection are shared by all instances.
+        """
+        return gemini_clients.get_model(model_name)
     
-    def validate_checkin(self, checkin):
-        """Main validation method for check-ins"""
+    def validate_checkin(self, checkin, stream=False):
+        """Main validation method for check-ins.
+        
+        With `stream`, the response is read as it is generated and the
+        result returned as soon as the verdict fields have arrived; pass it
+        to complete_explanation() once the check-in has been saved.
+        """
         start_time = time.time()
         
         try:
-            # Get appropriate validation rule
-            validation_rule = self._get_validation_rule(checkin)
-            if not validation_rule:
-                return self._create_error_result("No validation rule found", start_time)
+            request = self._prepare_validation(checkin, start_time)
+            if 'result' in request:
+                return request['result']
             
-            # Check cache first
-            cache_key = self._generate_cache_key(checkin, validation_rule)
-            cached_result = self._get_cached_result(cache_key)
-            if cached_result:
-                logger.info(f"Using cached validation result for checkin {checkin.id}")
-                return cached_result
-            
-            # Perform validation based on type
-            if checkin.habit.validation_method == 'photo':
-                # Note: 'gemini-2.5-flash' is now commonly aliased to a multimodel,
-                # but 'gemini-2.5-flash' handles multimodal inputs and is faster/cheaper.
-                result = self._validate_photo(checkin, validation_rule) 
-            elif checkin.habit.validation_method == 'text':
-                result = self._validate_text(checkin, validation_rule)
-            elif checkin.habit.validation_method == 'audio':
-                result = self._validate_audio(checkin, validation_rule)
-            elif checkin.habit.validation_method == 'screen_recording':
-                result = self._validate_screen_recording(checkin, validation_rule)
-            else:
-                result = self._create_error_result("Unsupported validation method", start_time)
-            
-            # Cache successful results
-            if result.get('success') and result.get('confidence', 0) > 0.7:
-                self._cache_result(cache_key, checkin, validation_rule, result)
-            
-            return result
+            validate = self._validate_streaming if stream else self._validate_prepared
+            return self._validate_once(checkin, request, lambda: validate(checkin, request, start_time))
             
         except Exception as e:
             logger.error(f"Validation error for checkin {checkin.id}: {str(e)}")
             return self._create_error_result(str(e), start_time)
     
-    def _validate_photo(self, checkin, validation_rule):
-        """Validate photo evidence using Gemini"""
-        if not checkin.photo_proof:
-            return self._create_error_result("No photo proof provided")
+    def _validate_once(self, checkin, request, validate):
+        """Run `validate`, or share the model call of an identical proof validated elsewhere right now"""
+        result = validation_flight.run(
+            request['cache_key'],
+            validate,
+            lease=self._flight_lease(request),
+            share=_shared_result
+        )
+        if result.get('coalesced'):
+            # The leader's log accounts for the shared model call
+            result.pop('usage', None)
+            result['source'] = 'coalesced'
+            result['timings'] = {'file_read': request['timings'].get('file_read', 0.0)}
+            result['processing_time'] = time.time() - request['start_time']
+        return result
+    
+    def _flight_lease(self, request, lease_factor=1):
+        return request['validation_rule'].max_processing_time * lease_factor + settings.AI_SINGLE_FLIGHT_LEASE_MARGIN
+    
+    def _claim_flights(self, pending, lease_factor=1):
+        """Split prepared requests into those this batch validates and those in flight elsewhere.
         
+        A claimed request holds its single-flight lock until
+        _release_flights(), so single validations of the same proof wait
+        for the batch. The others, including repeats of a proof within
+        `pending`, go through _validate_in_flight() once the batch is done.
+        `lease_factor` scales the lease for batches slower than one call.
+        """
+        claimed = []
+        in_flight = []
+        for checkin, request in pending:
+            try:
+                token = validation_flight.claim(request['cache_key'], self._flight_lease(request, lease_factor))
+            except Exception as e:
+                logger.warning(f"Single-flight lock unavailable: {str(e)}")
+                token = ''
+            if token is None:
+                in_flight.append((checkin, request))
+            else:
+                request['flight_token'] = token
+                claimed.append((checkin, request))
+        return claimed, in_flight
+    
+    def _release_flights(self, claimed, results):
+        """Publish the results of claimed requests to waiting callers and drop their locks"""
+        for checkin, request in claimed:
+            validation_flight.release(
+                request['cache_key'], request.pop('flight_token'), results.get(checkin.id), share=_shared_result
+            )
+    
+    def _validate_in_flight(self, checkin, request):
+        """Validate a batch item whose proof was already being validated when the batch started"""
         try:
-            # Using the recommended 'gemini-2.5-flash' for multimodal tasks
-            model = self.get_model('gemini-2.5-flash') 
-            
-            # Read image data
-            checkin.photo_proof.open('rb')
-            image_data = checkin.photo_proof.read()
-            checkin.photo_proof.close()
-            
-            prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
-            
-            # Create a Part object for the image data
-            # The 'data' key for the image content in the list of parts is still supported, 
-            # but using genai.types.Part is the recommended modern approach for complex inputs.
-            # For direct image bytes, the original dict structure works fine and is preserved here.
-            
-            response = model.generate_content([
-                prompt,
-                {"mime_type": "image/jpeg", "data": image_data}
-            ])
-            
-            return self._parse_ai_response(response.text, validation_rule)
-            
+            return self._validate_once(
+                checkin, request, lambda: self._validate_prepared(checkin, request, request['start_time'])
+            )
         except Exception as e:
-            logger.error(f"Photo validation error: {str(e)}")
-            return self._create_error_result(f"Photo validation failed: {str(e)}")
+            logger.error(f"Validation error for checkin {checkin.id}: {str(e)}")
+            return self._create_error_result(str(e), request['start_time'])
     
-    def _validate_text(self, checkin, validation_rule):
-        """Validate text evidence"""
-        if not checkin.text_proof:
-            return self._create_error_result("No text proof provided")
+    def _validate_prepared(self, checkin, request, start_time):
+        """Send one prepared request to the model and finish its result"""
+        try:
+            response = self._generate(request)
+            with stage_timer(request['timings'], 'parse'):
+                result = self._finalize_result(checkin, response.text, request['validation_rule'])
+            result['usage'] = response_usage(response)
+        except CircuitOpenError as e:
+            return self._create_deferred_result(e.retry_after, start_time)
+        except Exception as e:
+            result = self._create_model_error_result(checkin, e)
         
+        self._finish_validation(checkin, request, result)
+        result['processing_time'] = time.time() - start_time
+        return result
+    
+    def _validate_streaming(self, checkin, request, start_time):
+        """Stream one prepared request and stop reading once the verdict is known"""
+        validation_rule = request['validation_rule']
         try:
-            model = self.get_model('gemini-2.5-flash')
+            with stage_timer(request['timings'], 'model'):
+                parser, stream = call_with_resilience(
+                    lambda timeout: self._read_until_verdict(request, timeout),
+                    validation_rule.max_processing_time
+                )
+            with stage_timer(request['timings'], 'parse'):
+                if stream is None:
+                    # The response ended before the verdict could be picked out early
+                    result = self._finalize_result(checkin, parser.response_text(), validation_rule)
+                else:
+                    result = self._early_verdict_result(checkin, parser, stream, validation_rule)
+        except CircuitOpenError as e:
+            return self._create_deferred_result(e.retry_after, start_time)
+        except Exception as e:
+            result = self._create_model_error_result(checkin, e)
+        
+        self._finish_validation(checkin, request, result)
+        result['processing_time'] = time.time() - start_time
+        return result
+    
+    def _read_until_verdict(self, request, timeout):
+        """Consume a response stream until the verdict fields are complete.
+        
+        Returns the parser and the unread rest of the stream, or None when
+        the stream ended first.
+        """
+        stream = self.backend.generate_stream(
+            request['contents'],
+            request['validation_rule'].validation_type,
+            generation_config=STREAM_VALIDATION_GENERATION_CONFIG,
+            timeout=timeout
+        )
+        parser = VerdictStreamParser()
+        for chunk in stream:
+            if parser.feed(chunk):
+                return parser, stream
+        return parser, None
+    
+    def _early_verdict_result(self, checkin, parser, stream, validation_rule):
+        """Create a result from the verdict fields before the explanation has arrived"""
+        verdict = parser.early_verdict()
+        verdict = verdict._replace(explanation=(
+            f"AI verdict: {'approved' if verdict.is_approved else 'not approved'} "
+            f"({verdict.confidence:.0%} confidence)"
+        ))
+        result = self._verdict_result(verdict, parser.text, validation_rule)
+        self._apply_method_adjustments(checkin, result)
+        result['parsed_data'] = dict(result['parsed_data'], streamed=True)
+        
+        if settings.AI_STREAM_EXPLANATION == 'background':
+            result['explanation_stream'] = (stream, parser)
+        else:
+            stream.close()
+        return result
+    
+    def complete_explanation(self, checkin, result, validation_log=None):
+        """Finish reading a streamed explanation in the background.
+        
+        Call after the check-in and its ValidationLog have been saved with
+        the early result; the placeholder feedback and the log's response
+        payload are then replaced.
+        """
+        pending = result.pop('explanation_stream', None)
+        if pending is None:
+            return
+        stream, parser = pending
+        _get_stream_executor().submit(
+            _complete_explanation_in_background, stream, parser, checkin.pk, result['explanation'],
+            validation_log.pk if validation_log else None
+        )
+    
+    def validate_text_batch(self, checkins):
+        """Validate several text check-ins with one model call.
+        
+        Check-ins share the rule template and requirements in a single
+        prompt and are answered with one verdict per item id. Items the
+        model drops or answers malformed are validated with single calls.
+        Returns results keyed by check-in id.
+        """
+        results = {}
+        pending = []
+        
+        for checkin in checkins:
+            start_time = time.time()
+            try:
+                if checkin.habit.validation_method != 'text':
+                    raise ValidationInputError("Batch validation only supports text check-ins")
+                request = self._prepare_validation(checkin, start_time)
+            except Exception as e:
+                logger.error(f"Validation error for checkin {checkin.id}: {str(e)}")
+                results[checkin.id] = self._create_error_result(str(e), start_time)
+                continue
             
-            prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
-            full_prompt = f"""
+            if 'result' in request:
+                results[checkin.id] = request['result']
+            else:
+                pending.append((checkin, request))
+        
+        claimed, in_flight = self._claim_flights(pending, lease_factor=2)
+        try:
+            results.update(self._validate_text_group(claimed))
+        finally:
+            self._release_flights(claimed, results)
+        for checkin, request in in_flight:
+            results[checkin.id] = self._validate_in_flight(checkin, request)
+        return results
+    
+    def _validate_text_group(self, pending):
+        """Validate prepared text requests with one shared model call"""
+        results = {}
+        if len(pending) < 2:
+            for checkin, request in pending:
+                results[checkin.id] = self._validate_prepared(checkin, request, time.time())
+            return results
+        
+        start_time = time.time()
+        validation_rule = pending[0][1]['validation_rule']
+        timings = {}
+        usage = {}
+        try:
+            with stage_timer(timings, 'model'):
+                response = call_with_resilience(
+                    lambda timeout: self.backend.generate(
+                        self._batch_text_contents([checkin for checkin, _ in pending], validation_rule),
+                        'text',
+                        generation_config=BATCH_VALIDATION_GENERATION_CONFIG,
+                        timeout=timeout
+                    ),
+                    validation_rule.max_processing_time
+                )
+            with stage_timer(timings, 'parse'):
+                verdicts = parse_batch_verdicts(response.text)
+            usage = response_usage(response)
+        except CircuitOpenError as e:
+            for checkin, _ in pending:
+                results[checkin.id] = self._create_deferred_result(e.retry_after, start_time)
+            return results
+        except Exception as e:
+            logger.warning(f"Batch text validation failed, validating items one by one: {str(e)}")
+            verdicts = {}
+        
+        # The shared call's time and tokens are split evenly between its items
+        processing_time = (time.time() - start_time) / len(pending)
+        for checkin, request in pending:
+            verdict = verdicts.get(checkin.id)
+            if verdict is None:
+                results[checkin.id] = self._validate_prepared(checkin, request, time.time())
+                continue
+            
+            result = self._verdict_result(verdict, json.dumps(verdict.data), validation_rule)
+            result['parsed_data'] = dict(result['parsed_data'], batch_size=len(pending))
+            result['usage'] = {key: count // len(pending) for key, count in usage.items()}
+            for stage, seconds in timings.items():
+                request['timings'][stage] = seconds / len(pending)
+            self._finish_validation(checkin, request, result)
+            result['processing_time'] = processing_time
+            results[checkin.id] = result
+        
+        return results
+    
+    def _prepare_validation(self, checkin, start_time):
+        """Resolve rule, cache and model input for a check-in.
+        
+        Returns a request dict holding either a final 'result' (cache hit or
+        error) or the 'contents' to send to the model.
+        """
+        # Get appropriate validation rule
+        validation_rule = self._get_validation_rule(checkin)
+        if not validation_rule:
+            return {'result': self._create_error_result("No validation rule found", start_time)}
+        
+        # Check cache first
+        cache_key = self._generate_cache_key(checkin, validation_rule)
+        cached_result = self._get_cached_result(cache_key)
+        if cached_result:
+            logger.info(f"Using cached validation result for checkin {checkin.id}")
+            cached_result['processing_time'] = time.time() - start_time
+            return {'result': cached_result}
+        
+        timings = {}
+        try:
+            with stage_timer(timings, 'file_read'):
+                contents = self._build_contents(checkin, validation_rule)
+        except ValidationInputError as e:
+            return {'result': self._create_error_result(str(e), start_time)}
+        except ProofRejected as e:
+            return {'result': self._create_prescreen_result(e.decision, start_time)}
+        
+        # Decide obvious text submissions locally
+        prescreen = self._prescreen(checkin, validation_rule)
+        if prescreen and not prescreen['sampled']:
+            return {'result': self._create_prescreen_result(prescreen, start_time)}
+        
+        return {
+            'validation_rule': validation_rule,
+            'cache_key': cache_key,
+            'contents': contents,
+            'prescreen': prescreen,
+            'start_time': start_time,
+            'timings': timings,
+        }
+    
+    def _generate(self, request):
+        """Call the model under rate limit, retries, circuit breaker and deadline"""
+        with stage_timer(request['timings'], 'model'):
+            return call_with_resilience(
+                lambda timeout: self.backend.generate(
+                    request['contents'],
+                    request['validation_rule'].validation_type,
+                    generation_config=VALIDATION_GENERATION_CONFIG,
+                    timeout=timeout
+                ),
+                request['validation_rule'].max_processing_time
+            )
+    
+    def _finish_validation(self, checkin, request, result):
+        """Cache successful results and attach the model name and stage timings"""
+        if request.get('prescreen') and result.get('success'):
+            # Sampled clear pass: keep the local verdict next to the model's
+            result['parsed_data'] = dict(result.get('parsed_data', {}), prescreen={
+                'is_approved': request['prescreen']['is_approved'],
+                'features': request['prescreen']['features'],
+            })
+        
+        if result.get('success') and result.get('confidence', 0) > 0.7:
+            with stage_timer(request['timings'], 'db_write'):
+                self._cache_result(request['cache_key'], checkin, request['validation_rule'], result)
+        
+        result['model_name'] = self.backend.model_name
+        result['timings'] = dict(request['timings'])
+    
+    def _prescreen(self, checkin, validation_rule):
+        """Run the local text pre-screen when the rule enables it"""
+        if checkin.habit.validation_method != 'text' or not validation_rule.prescreen_enabled:
+            return None
+        return prescreen_text(checkin.text_proof, checkin.habit.validation_prompt, validation_rule)
+    
+    def _create_prescreen_result(self, prescreen, start_time):
+        """Create result structure for a local pre-screen decision"""
+        return {
+            'success': True,
+            'confidence': prescreen['confidence'],
+            'is_approved': prescreen['is_approved'],
+            'explanation': prescreen['explanation'],
+            'source': 'prescreen',
+            'raw_response': '',
+            'parsed_data': {'prescreen': True, 'features': prescreen['features']},
+            'processing_time': time.time() - start_time
+        }
+    
+    def _build_contents(self, checkin, validation_rule):
+        """Build the model input for a check-in based on its validation method"""
+        method = checkin.habit.validation_method
+        if method == 'photo':
+            return self._photo_contents(checkin, validation_rule)
+        elif method == 'text':
+            return self._text_contents(checkin, validation_rule)
+        elif method == 'audio':
+            return self._audio_contents(checkin, validation_rule)
+        elif method == 'screen_recording':
+            return self._screen_recording_contents(checkin, validation_rule)
+        raise ValidationInputError("Unsupported validation method")
+    
+    def _photo_contents(self, checkin, validation_rule):
+        """Build photo evidence input for Gemini"""
+        if not checkin.photo_proof:
+            raise ValidationInputError("No photo proof provided")
+        
+        # Downscaled, EXIF-stripped JPEG, built once and reused
+        image_data, mime_type = load_photo_model_input(checkin)
+        
+        prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
+        
+        # The dict structure for inline image bytes is accepted by both the
+        # sync and async generate APIs.
+        return [
+            prompt,
+            {"mime_type": mime_type, "data": image_data}
+        ]
+    
+    def _text_contents(self, checkin, validation_rule):
+        """Build text evidence input for Gemini"""
+        if not checkin.text_proof:
+            raise ValidationInputError("No text proof provided")
+        
+        prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
+        return f"""
             {prompt}
             
             TEXT TO ANALYZE:
@@ -130,226 +456,288 @@ class AIService:
             
             Please analyze thoroughly and provide your assessment.
             """
-            
-            # The generate_content call remains the same
-            response = model.generate_content(full_prompt)
-            return self._parse_ai_response(response.text, validation_rule)
-            
-        except Exception as e:
-            logger.error(f"Text validation error: {str(e)}")
-            return self._create_error_result(f"Text validation failed: {str(e)}")
     
-    def _validate_audio(self, checkin, validation_rule):
-        """Validate audio evidence - placeholder implementation"""
-        # Note: Actual audio processing would require additional services
-        # For now, we'll use a text-based analysis of audio description
-        try:
-            model = self.get_model('gemini-2.5-flash')
-            
-            prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
-            full_prompt = f"""
+    def _batch_text_contents(self, checkins, validation_rule):
+        """Build one prompt holding several text check-ins, each tagged with its id"""
+        prompt = self._build_prompt(validation_rule, "the habit given with each item")
+        items = "\n".join(
+            json.dumps({
+                'id': checkin.id,
+                'habit': checkin.habit.validation_prompt,
+                'text': checkin.text_proof,
+            })
+            for checkin in checkins
+        )
+        return f"""
             {prompt}
             
-            AUDIO CONTEXT:
-            The user has submitted an audio recording for: {checkin.habit.validation_prompt}
-            Audio duration: Available (placeholder)
-            Content: User's audio submission
+            Each line below is a separate submission. Assess every submission on its
+            own against its own habit.
             
-            Since we cannot process audio directly in this implementation, please provide a 
-            general assessment based on typical audio submissions for this type of habit.
+            SUBMISSIONS:
+            {items}
             
-            Assume the audio has been verified to contain relevant content.
-            """
-            
-            response = model.generate_content(full_prompt)
-            result = self._parse_ai_response(response.text, validation_rule)
-            
-            # For audio, we might want to be more lenient in MVP
-            if result.get('confidence', 0) > 0.6:
-                result['is_approved'] = True
-                result['confidence'] = max(result.get('confidence', 0), 0.7)
-            
-            return result
+            REQUIREMENTS (for each submission):
+            - Minimum 50 characters for meaningful content
+            - Relevant to the submission's habit
+            - Shows genuine effort/reflection
+            - Appropriate length and depth
             
-        except Exception as e:
-            logger.error(f"Audio validation error: {str(e)}")
-            return self._create_error_result(f"Audio validation failed: {str(e)}")
+            Return one verdict per submission with its "id".
+            """
     
-    def _validate_screen_recording(self, checkin, validation_rule):
-        """Validate screen recording - placeholder implementation"""
+    def _audio_contents(self, checkin, validation_rule):
+        """Build audio evidence input for Gemini.
+        
+        The recording is analysed locally first: silent recordings and ones
+        too short for the habit's target duration are rejected without a
+        model call, the rest are sent as audio with the measured features,
+        compressed first if over AI_AUDIO_MAX_INLINE_BYTES.
+        """
+        if not checkin.audio_proof:
+            raise ValidationInputError("No audio proof provided")
+        
+        data, mime_type, features = load_audio_model_input(checkin)
+        if features is not None:
+            rejection = screen_audio(features, checkin.habit.target_duration)
+            if rejection:
+                raise ProofRejected(rejection)
+            measured = (
+                f"{features['duration']:.0f}s long, {features['voiced_ratio']:.0%} voiced, "
+                f"{features['silence_ratio']:.0%} silence"
+            )
+        else:
+            measured = "not available"
         try:
-            model = self.get_model('gemini-2.5-flash')
+            data, mime_type = fit_audio_inline(data, mime_type, settings.AI_AUDIO_MAX_INLINE_BYTES)
+        except AudioDecodeError as e:
+            raise ValidationInputError(str(e))
+        
+        prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
+        return [
+            f"""
+            {prompt}
             
-            prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
-            full_prompt = f"""
+            AUDIO CONTEXT:
+            The user has attached an audio recording for: {checkin.habit.validation_prompt}
+            Target duration: {checkin.habit.target_duration} minutes
+            Measured locally: {measured}
+            
+            Listen to the recording and assess whether it shows the habit being done.
+            """,
+            {"mime_type": mime_type, "data": data}
+        ]
+    
+    def _screen_recording_contents(self, checkin, validation_rule):
+        """Build screen recording input for Gemini from sampled keyframes"""
+        if not checkin.screen_recording_proof:
+            raise ValidationInputError("No screen recording provided")
+        if not ffmpeg_available():
+            return self._whole_screen_recording_contents(checkin, validation_rule)
+        
+        try:
+            frames = load_screen_recording_frames(checkin)
+        except KeyframeExtractionError as e:
+            raise ValidationInputError(f"Could not read the screen recording: {str(e)}")
+        if not frames:
+            raise ValidationInputError("Screen recording has no readable frames")
+        
+        prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
+        contents = [f"""
             {prompt}
             
             SCREEN RECORDING CONTEXT:
             The user has submitted a screen recording for: {checkin.habit.validation_prompt}
-            Content: User's screen activity related to the habit
-            
-            Since we cannot process screen recordings directly in this implementation, 
-            please provide an assessment based on typical screen recordings for this habit type.
-            
-            Assume the screen recording shows relevant activity.
-            """
+            Below are {len(frames)} distinct frames sampled across the recording, in order.
+            
+            Assess whether the screen activity shows the habit being done.
+            """]
+        for seconds, data in frames:
+            contents.append(f"Frame at {int(seconds) // 60}:{int(seconds) % 60:02d}")
+            contents.append({"mime_type": FRAME_MIME_TYPE, "data": data})
+        return contents
+    
+    def _whole_screen_recording_contents(self, checkin, validation_rule):
+        """Build screen recording input from the uploaded video, on hosts without ffmpeg.
+        
+        Gemini reads the video itself; the model input is then bounded by
+        AI_SCREEN_MAX_INLINE_BYTES instead of a frame count.
+        """
+        try:
+            data, mime_type = load_screen_recording(checkin)
+        except KeyframeExtractionError as e:
+            raise ValidationInputError(f"Could not read the screen recording: {str(e)}")
+        if len(data) > settings.AI_SCREEN_MAX_INLINE_BYTES:
+            raise ValidationInputError("Screen recording is too large to validate without ffmpeg")
+        
+        prompt = self._build_prompt(validation_rule, checkin.habit.validation_prompt)
+        return [
+            f"""
+            {prompt}
             
-            response = model.generate_content(full_prompt)
-            result = self._parse_ai_response(response.text, validation_rule)
+            SCREEN RECORDING CONTEXT:
+            The user has attached a screen recording for: {checkin.habit.validation_prompt}
             
+            Assess whether the screen activity shows the habit being done.
+            """,
+            {"mime_type": mime_type, "data": data}
+        ]
+    
+    def _finalize_result(self, checkin, response_text, validation_rule):
+        """Parse the model response and apply per-method adjustments"""
+        result = self._parse_ai_response(response_text, validation_rule)
+        self._apply_method_adjustments(checkin, result)
+        return result
+    
+    def _apply_method_adjustments(self, checkin, result):
+        """Apply per-method leniency to a parsed result"""
+        if not result['success']:
+            return
+        method = checkin.habit.validation_method
+        
+        if method == 'audio':
+            # For audio, we might want to be more lenient in MVP
+            if result.get('confidence', 0) > 0.6:
+                result['is_approved'] = True
+                result['confidence'] = max(result.get('confidence', 0), 0.7)
+        elif method == 'screen_recording':
             # For screen recordings, be moderately confident in MVP
             if result.get('confidence', 0) > 0.65:
                 result['is_approved'] = True
                 result['confidence'] = max(result.get('confidence', 0), 0.75)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Screen recording validation error: {str(e)}")
-            return self._create_error_result(f"Screen recording validation failed: {str(e)}")
+    
+    def _create_model_error_result(self, checkin, error):
+        """Create error result for a failed model call"""
+        label = checkin.habit.validation_method.replace('_', ' ').capitalize()
+        logger.error(f"{label} validation error: {str(error)}")
+        return self._create_error_result(f"{label} validation failed: {str(error)}")
     
     def _build_prompt(self, validation_rule, habit_prompt):
         """Build the AI prompt from template and habit-specific prompt"""
         prompt_template = validation_rule.prompt_template
         return prompt_template.replace('{validation_prompt}', habit_prompt)
     
-    # ... (other helper methods remain unchanged)
-    # _parse_ai_response, _parse_unstructured_response, _get_validation_rule, 
-    # _generate_cache_key, _get_cached_result, _cache_result, _create_error_result
-    
     def _parse_ai_response(self, response_text, validation_rule):
-        """Parse AI response and extract structured data"""
+        """Parse a schema-constrained verdict; a response off the schema is an error result"""
+        started = time.perf_counter()
         try:
-            # Try to parse as JSON first
-            if response_text.strip().startswith('{'):
-                result = json.loads(response_text)
-            else:
-                # Fallback: extract JSON from text
-                start_idx = response_text.find('{')
-                end_idx = response_text.rfind('}') + 1
-                if start_idx != -1 and end_idx != 0:
-                    json_str = response_text[start_idx:end_idx]
-                    result = json.loads(json_str)
-                else:
-                    # Final fallback: manual parsing
-                    result = self._parse_unstructured_response(response_text)
-            
-            # Validate required fields
-            confidence = result.get('confidence', 0.0)
-            is_approved = result.get('is_approved', False)
-            explanation = result.get('explanation', 'No explanation provided')
-            
-            # Apply confidence threshold
-            if validation_rule and confidence < validation_rule.confidence_threshold:
-                is_approved = False
-            
-            return {
-                'success': True,
-                'confidence': confidence,
-                'is_approved': is_approved,
-                'explanation': explanation,
-                'raw_response': response_text,
-                'parsed_data': result
-            }
-            
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.warning(f"Failed to parse AI response: {str(e)}")
-            return self._parse_unstructured_response(response_text)
-    
-    def _parse_unstructured_response(self, response_text):
-        """Parse unstructured AI response"""
-        # Simple heuristic parsing
-        confidence = 0.5
-        is_approved = False
-        explanation = response_text[:500]  # Truncate long responses
-        
-        # Basic keyword analysis
-        response_lower = response_text.lower()
-        positive_keywords = ['approved', 'yes', 'correct', 'valid', 'good', 'proper', 'acceptable']
-        negative_keywords = ['rejected', 'no', 'incorrect', 'invalid', 'poor', 'improper', 'unacceptable']
-        
-        positive_count = sum(1 for word in positive_keywords if word in response_lower)
-        negative_count = sum(1 for word in negative_keywords if word in response_lower)
-        
-        if positive_count > negative_count:
-            is_approved = True
-            confidence = 0.7
-        elif negative_count > positive_count:
-            is_approved = False
-            confidence = 0.6
-        else:
-            # Ambiguous response
+            verdict = parse_verdict(response_text)
+        except ResponseParseError as e:
+            parse_stats.record(parsed=False, seconds=time.perf_counter() - started)
+            logger.warning(f"AI response did not match the verdict schema: {str(e)}")
+            result = self._create_error_result(f"AI response did not match the verdict schema: {str(e)}")
+            result['raw_response'] = response_text
+            return result
+        parse_stats.record(parsed=True, seconds=time.perf_counter() - started)
+        return self._verdict_result(verdict, response_text, validation_rule)
+    
+    def _verdict_result(self, verdict, response_text, validation_rule):
+        """Create result structure from a validated verdict"""
+        # Apply confidence threshold
+        is_approved = verdict.is_approved
+        if validation_rule and verdict.confidence < validation_rule.confidence_threshold:
             is_approved = False
-            confidence = 0.4
         
         return {
             'success': True,
-            'confidence': confidence,
+            'confidence': verdict.confidence,
             'is_approved': is_approved,
-            'explanation': explanation,
+            'explanation': verdict.explanation,
             'raw_response': response_text,
-            'parsed_data': {'fallback_parsing': True}
+            'parsed_data': verdict.data
         }
     
     def _get_validation_rule(self, checkin):
         """Get appropriate validation rule for checkin type"""
-        try:
-            return ValidationRule.objects.get(
-                validation_type=checkin.habit.validation_method,
-                is_active=True
-            )
-        except ValidationRule.DoesNotExist:
+        validation_rule = validation_rule_registry.get(checkin.habit.validation_method)
+        if validation_rule is None:
             logger.warning(f"No validation rule found for {checkin.habit.validation_method}")
-            return None
+        return validation_rule
     
     def _generate_cache_key(self, checkin, validation_rule):
-        """Generate cache key based on input data"""
-        input_data = f"{checkin.habit.validation_prompt}-{validation_rule.id}"
-        
-        if checkin.text_proof:
-            input_data += f"-{checkin.text_proof[:100]}"
-        elif checkin.photo_proof:
-            input_data += f"-photo-{checkin.photo_proof.name}"
+        """Generate cache key from the rule, habit prompt and proof content hash"""
+        proof_hash = checkin.proof_hash
+        if not proof_hash:
+            # Check-ins uploaded before proof hashing existed: hash once and store
+            proof_hash = checkin.compute_proof_hash()
+            if proof_hash and checkin.pk:
+                type(checkin).objects.filter(pk=checkin.pk).update(proof_hash=proof_hash)
+                checkin.proof_hash = proof_hash
         
+        input_data = f"{checkin.habit.validation_prompt}-{validation_rule.id}-{proof_hash}"
         return hashlib.sha256(input_data.encode()).hexdigest()
     
     def _get_cached_result(self, cache_key):
-        """Get result from cache"""
-        try:
-            cache_entry = ValidationCache.objects.get(input_hash=cache_key)
-            cache_entry.usage_count += 1
-            cache_entry.last_used = timezone.now()
-            cache_entry.save()
-            
-            return {
-                'success': True,
-                'confidence': cache_entry.confidence_score,
-                'is_approved': cache_entry.is_approved,
-                'explanation': 'Result from cache',
-                'from_cache': True,
-                'cached_data': cache_entry.ai_response
-            }
-        except ValidationCache.DoesNotExist:
+        """Get result from the layered validation cache"""
+        entry = validation_cache.get(cache_key)
+        if entry is None:
             return None
+        
+        return {
+            'success': True,
+            'confidence': entry['confidence'],
+            'is_approved': entry['is_approved'],
+            'explanation': 'Result from cache',
+            'from_cache': True,
+            'source': 'cache',
+            'cached_data': entry['ai_response']
+        }
     
     def _cache_result(self, cache_key, checkin, validation_rule, result):
         """Cache validation result"""
         try:
-            input_preview = f"{checkin.habit.validation_prompt}"
-            if checkin.text_proof:
-                input_preview += f" - {checkin.text_proof[:100]}..."
-            
-            ValidationCache.objects.create(
-                input_hash=cache_key,
-                validation_rule=validation_rule,
-                input_data_preview=input_preview,
-                ai_response=result.get('parsed_data', {}),
-                confidence_score=result['confidence'],
-                is_approved=result['is_approved']
+            validation_cache.store(
+                cache_key,
+                validation_rule,
+                self._get_input_preview(checkin),
+                result.get('parsed_data', {}),
+                result['confidence'],
+                result['is_approved']
             )
         except Exception as e:
             logger.warning(f"Failed to cache result: {str(e)}")
     
+    def _get_input_preview(self, checkin):
+        """Short preview of the validation input for logs and cache rows"""
+        input_preview = f"{checkin.habit.validation_prompt}"
+        if checkin.text_proof:
+            input_preview += f" - {checkin.text_proof[:100]}..."
+        return input_preview
+    
+    def log_validation(self, checkin, validation_rule, result):
+        """Record a validation decision, its source, cost and stage timings in ValidationLog"""
+        usage = result.get('usage', {})
+        timings = result.get('timings', {})
+        return ValidationLog.objects.create(
+            checkin=checkin,
+            validation_rule=validation_rule,
+            input_data_preview=self._get_input_preview(checkin),
+            ai_response_raw=result.get('raw_response', ''),
+            ai_response_parsed=result.get('parsed_data', {}),
+            confidence_score=result.get('confidence'),
+            is_approved=result.get('is_approved', False),
+            processing_time=result.get('processing_time', 0),
+            decision_source=result.get('source', 'model'),
+            success=result['success'],
+            error_message=result.get('error', ''),
+            model_name=result.get('model_name', ''),
+            prompt_tokens=usage.get('prompt_tokens'),
+            output_tokens=usage.get('output_tokens'),
+            queue_wait_time=timings.get('queue_wait'),
+            file_read_time=timings.get('file_read'),
+            model_time=timings.get('model'),
+            parse_time=timings.get('parse'),
+            db_write_time=timings.get('db_write'),
+            completed_at=timezone.now()
+        )
+    
+    def _create_deferred_result(self, retry_after, start_time=None):
+        """Create result for a validation postponed while the AI service is down"""
+        result = self._create_error_result("AI service temporarily unavailable", start_time)
+        result['deferred'] = True
+        result['retry_after'] = retry_after
+        return result
+    
     def _create_error_result(self, error_message, start_time=None):
         """Create error result structure"""
         processing_time = time.time() - start_time if start_time else 0
@@ -363,41 +751,182 @@ class AIService:
             'processing_time': processing_time
         }
 
+def _shared_result(result):
+    # Failures and deferrals are not handed to waiters; they validate themselves
+    return result['success']
+
+def response_usage(response):
+    """Prompt and output token counts from a model response, when reported"""
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    output_tokens = getattr(usage, 'candidates_token_count', None)
+    if not isinstance(prompt_tokens, int) or not isinstance(output_tokens, int):
+        return {}
+    return {'prompt_tokens': prompt_tokens, 'output_tokens': output_tokens}
+
+_stream_executor = None
+_stream_executor_lock = threading.Lock()
+
+def _get_stream_executor():
+    """Shared worker threads that finish streamed explanations"""
+    global _stream_executor
+    with _stream_executor_lock:
+        if _stream_executor is None:
+            _stream_executor = ThreadPoolExecutor(
+                max_workers=settings.AI_STREAM_BACKGROUND_WORKERS,
+                thread_name_prefix='ai-explanation'
+            )
+        return _stream_executor
+
+def _complete_explanation(stream, parser, checkin_id, placeholder, validation_log_id=None):
+    """Read the rest of a verdict stream and store the full explanation"""
+    from core.models import DailyCheckIn
+    
+    for chunk in stream:
+        parser.feed(chunk)
+    verdict = parser.final_verdict()
+    
+    # Only replace what the early result wrote; a newer validation wins
+    DailyCheckIn.objects.filter(pk=checkin_id, ai_feedback=placeholder).update(ai_feedback=verdict.explanation)
+    if validation_log_id:
+        validation_log = ValidationLog.objects.filter(pk=validation_log_id).first()
+        if validation_log:
+            validation_log.store_payload(parser.response_text(), verdict.data)
+
+def _complete_explanation_in_background(stream, parser, checkin_id, placeholder, validation_log_id=None):
+    try:
+        _complete_explanation(stream, parser, checkin_id, placeholder, validation_log_id)
+    except Exception as e:
+        logger.warning(f"Failed to complete streamed explanation for checkin {checkin_id}: {str(e)}")
+    finally:
+        connection.close()
+
+_loop_local = threading.local()
+
+def _run_async(coro):
+    """Run a coroutine on this thread's persistent event loop.
+    
+    The Gemini async client binds its gRPC channel to the loop it was first
+    used on, so batches reuse one loop instead of calling asyncio.run().
+    """
+    loop = getattr(_loop_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _loop_local.loop = loop
+    return loop.run_until_complete(coro)
+
+class AsyncAIService(AIService):
+    """Validate many check-ins concurrently with the async Gemini API.
+    
+    Rule lookup, caching and file reads stay synchronous (Django ORM); only
+    the model calls are overlapped, at most `concurrency` at a time.
+    """
+    
+    def __init__(self, concurrency=None):
+        super().__init__()
+        self.concurrency = concurrency or settings.AI_VALIDATION_CONCURRENCY
+    
+    def validate_checkins(self, checkins):
+        """Validate a batch of check-ins, returning results keyed by check-in id"""
+        results = {}
+        pending = []
+        
+        for checkin in checkins:
+            start_time = time.time()
+            try:
+                request = self._prepare_validation(checkin, start_time)
+            except Exception as e:
+                logger.error(f"Validation error for checkin {checkin.id}: {str(e)}")
+                results[checkin.id] = self._create_error_result(str(e), start_time)
+                continue
+            
+            if 'result' in request:
+                results[checkin.id] = request['result']
+            else:
+                pending.append((checkin, request))
+        
+        # A claimed call may wait for a concurrency slot before it starts
+        claimed, in_flight = self._claim_flights(pending, lease_factor=math.ceil(len(pending) / self.concurrency))
+        try:
+            if claimed:
+                results.update(self._validate_claimed(claimed))
+        finally:
+            self._release_flights(claimed, results)
+        for checkin, request in in_flight:
+            results[checkin.id] = self._validate_in_flight(checkin, request)
+        return results
+    
+    def _validate_claimed(self, pending):
+        """Overlap the model calls of prepared requests and finish their results"""
+        results = {}
+        responses = _run_async(self._generate_all([request for _, request in pending]))
+        
+        for (checkin, request), response in zip(pending, responses):
+            if isinstance(response, CircuitOpenError):
+                results[checkin.id] = self._create_deferred_result(response.retry_after)
+                continue
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                with stage_timer(request['timings'], 'parse'):
+                    result = self._finalize_result(checkin, response.text, request['validation_rule'])
+                result['usage'] = response_usage(response)
+            except Exception as e:
+                result = self._create_model_error_result(checkin, e)
+            
+            self._finish_validation(checkin, request, result)
+            result['processing_time'] = time.time() - request['start_time']
+            results[checkin.id] = result
+        
+        return results
+    
+    async def _generate_all(self, requests):
+        """Run model calls concurrently, bounded by a semaphore"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def generate(request):
+            async with semaphore:
+                # The deadline starts once the call gets a concurrency slot
+                with stage_timer(request['timings'], 'model'):
+                    return await acall_with_resilience(
+                        lambda timeout: self.backend.agenerate(
+                            request['contents'],
+                            request['validation_rule'].validation_type,
+                            generation_config=VALIDATION_GENERATION_CONFIG,
+                            timeout=timeout
+                        ),
+                        request['validation_rule'].max_processing_time
+                    )
+        
+        return await asyncio.gather(
+            *(generate(request) for request in requests),
+            return_exceptions=True
+        )
+
 class InsightGenerator:
     """Generate insights based on user progress data"""
     
     def __init__(self):
         self.ai_service = AIService()
     
-    def generate_weekly_insights(self, user):
-        """Generate weekly insights for a user"""
+    def generate_weekly_insights(self, user, analysis_data=None):
+        """Generate weekly insights for a user.
+        
+        Pass `analysis_data` from gather_analysis_data() when insights are
+        generated for many users; otherwise it is gathered for this user.
+        Users without completions this week get template insights without
+        a model call. Model and template insights carry the
+        'input_fingerprint' of the data they were made from. The model call
+        is bounded by AI_INSIGHT_TIMEOUT; raises CircuitOpenError instead of
+        falling back while the circuit breaker is open.
+        """
         try:
-            model = self.ai_service.get_model()
-            
-            # Get user's recent activity
-            from core.models import DailyCheckIn, Habit
-            from django.utils import timezone
-            from datetime import timedelta
-            
-            week_ago = timezone.now() - timedelta(days=7)
-            
-            recent_checkins = DailyCheckIn.objects.filter(
-                habit__goal__user=user,
-                created_at__gte=week_ago,
-                is_approved=True
-            ).select_related('habit')
+            if analysis_data is None:
+                analysis_data = gather_analysis_data([user.id])[user.id]
+            fingerprint = insight_fingerprint(analysis_data)
             
-            habits = Habit.objects.filter(goal__user=user, is_active=True)
-            
-            # Prepare data for AI analysis
-            analysis_data = {
-                'user_goals': [goal.title for goal in user.goals.all()],
-                'active_habits': [habit.title for habit in habits],
-                'recent_completions': len(recent_checkins),
-                'completion_rate': self._calculate_completion_rate(habits, recent_checkins),
-                'streak_info': self._get_streak_info(user),
-                'common_times': self._get_common_completion_times(recent_checkins),
-            }
+            if not analysis_data['recent_completions']:
+                return dict(self._generate_inactive_insights(analysis_data), input_fingerprint=fingerprint)
             
             prompt = f"""
             Analyze this user's consistency data and provide helpful insights:
@@ -421,43 +950,46 @@ class InsightGenerator:
             }}
             """
             
-            response = model.generate_content(prompt)
-            # Pass None for validation_rule in _parse_ai_response since this is an insight, not a validation
-            result = self.ai_service._parse_ai_response(response.text, None) 
+            response = call_with_resilience(
+                lambda timeout: self.ai_service.backend.generate(
+                    prompt,
+                    'insight',
+                    generation_config={'response_mime_type': 'application/json'},
+                    timeout=timeout
+                ),
+                settings.AI_INSIGHT_TIMEOUT
+            )
+            insights = json.loads(response.text)
             
-            if result['success']:
-                return result['parsed_data']
+            if isinstance(insights, dict):
+                insights['input_fingerprint'] = fingerprint
+                return insights
             else:
                 return self._generate_fallback_insights(analysis_data)
                 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Insight generation failed: {str(e)}")
             return self._generate_fallback_insights({})
     
-    def _calculate_completion_rate(self, habits, checkins):
-        """Calculate completion rate for recent period"""
-        total_possible = len(habits) * 7  # 7 days
-        if total_possible == 0:
-            return 0.0
-        return len(checkins) / total_possible
-    
-    def _get_streak_info(self, user):
-        """Get streak information for user"""
-        from core.models import Streak
-        streaks = Streak.objects.filter(user=user).order_by('-current_streak')[:3]
-        return [{'habit': s.habit.title, 'streak': s.current_streak} for s in streaks]
-    
-    def _get_common_completion_times(self, checkins):
-        """Analyze common completion times"""
-        if not checkins:
-            return []
-        
-        times = [c.completed_at.hour for c in checkins if c.completed_at]
-        if times:
-            from collections import Counter
-            common_hours = Counter(times).most_common(3)
-            return [f"{hour}:00" for hour, count in common_hours]
-        return []
+    def _generate_inactive_insights(self, data):
+        """Template insights for users with no completed check-ins this week"""
+        habits = data.get('active_habits', [])
+        if habits:
+            strength = f"You have {len(habits)} active habit{'s' if len(habits) != 1 else ''} set up and ready"
+            suggestion = f"Check in on \"{habits[0]}\" once today, even a small step counts"
+        else:
+            strength = "You've set goals to work towards"
+            suggestion = "Add a habit to one of your goals and check in today"
+        return {
+            "strength": strength,
+            "improvement_area": "No completed check-ins in the past week",
+            "suggestion": suggestion,
+            "motivational_note": "Every streak starts with a single day - today is a great day to begin!",
+            "confidence": 0.5,
+            "template": True
+        }
     
     def _generate_fallback_insights(self, data):
         """Generate fallback insights when AI fails"""
@@ -0,0 +1,108 @@
+import logging
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesce identical concurrent validations across processes.
+
+    The first caller for a key takes a lock in the shared cache with a
+    lease and runs the model call; its result is published under the key
+    for `result_ttl` seconds. Concurrent callers for the same key poll for
+    that result instead of calling the model themselves. If the leader
+    fails or its lease runs out without a result, a waiter takes over.
+    """
+
+    def __init__(self, name, result_ttl=None, poll_interval=None):
+        self.name = name
+        self.result_ttl = result_ttl or settings.AI_SINGLE_FLIGHT_RESULT_TTL
+        self.poll_interval = poll_interval or settings.AI_SINGLE_FLIGHT_POLL_INTERVAL
+
+    def run(self, key, compute, lease, share=None):
+        """Return compute()'s result, or that of a concurrent call for the same key.
+
+        `lease` bounds how long the lock is held and how long waiters wait.
+        `share(result)` picks which results are published to waiters
+        (default: all); unshared results make a waiter run compute itself.
+        """
+        deadline = time.monotonic() + lease
+
+        try:
+            # A call for this key that just finished, e.g. earlier in the same batch
+            published = cache.get(self._result_key(key))
+        except Exception as e:
+            logger.warning(f"Single-flight result unavailable: {str(e)}")
+            published = None
+        if published is not None:
+            return dict(published, coalesced=True)
+
+        while True:
+            try:
+                token = self.claim(key, lease)
+            except Exception as e:
+                logger.warning(f"Single-flight lock unavailable: {str(e)}")
+                return compute()
+
+            if token is not None:
+                result = None
+                try:
+                    result = compute()
+                    return result
+                finally:
+                    self.release(key, token, result, share)
+
+            waited = self._wait(self._lock_key(key), self._result_key(key), deadline)
+            if waited is not None:
+                return dict(waited, coalesced=True)
+            if time.monotonic() >= deadline:
+                logger.warning(f"Gave up waiting for in-flight validation {key[:16]}")
+                return compute()
+
+    def claim(self, key, lease):
+        """Take the lock for `key` without waiting.
+
+        Returns a token for release(), or None while another caller holds
+        it. For callers that compute many keys together and cannot wait on
+        each one; run() is the blocking form.
+        """
+        token = uuid.uuid4().hex
+        return token if cache.add(self._lock_key(key), token, lease) else None
+
+    def release(self, key, token, result=None, share=None):
+        """Publish a leader's result to waiters (unless `share` rejects it) and drop its lock"""
+        try:
+            if result is not None and (share is None or share(result)):
+                cache.set(self._result_key(key), self._shareable(result), self.result_ttl)
+            # Only release our own lease; an expired one may belong to a new leader
+            lock_key = self._lock_key(key)
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Failed to release single-flight lock: {str(e)}")
+
+    def _lock_key(self, key):
+        return f'ai_flight:{self.name}:{key}:lock'
+
+    def _result_key(self, key):
+        return f'ai_flight:{self.name}:{key}:result'
+
+    def _wait(self, lock_key, result_key, deadline):
+        """Poll until the leader publishes a result, or return None to retry leadership"""
+        while time.monotonic() < deadline:
+            result = cache.get(result_key)
+            if result is not None:
+                return result
+            if cache.get(lock_key) is None:
+                # Leader finished without sharing or its lease lapsed
+                return cache.get(result_key)
+            time.sleep(self.poll_interval)
+        return None
+
+    def _shareable(self, result):
+        # Per-caller handles (e.g. an open response stream) stay with the leader
+        return {key: value for key, value in result.items() if key != 'explanation_stream'}
+
+validation_flight = SingleFlight('validation')
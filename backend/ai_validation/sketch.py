@@ -0,0 +1,76 @@
+import math
+from collections import defaultdict
+
+DEFAULT_RELATIVE_ACCURACY = 0.02
+MIN_TRACKED_VALUE = 1e-4  # Smaller values are counted as zero
+
+class LatencySketch:
+    """Mergeable quantile sketch with bounded relative error.
+
+    Values fall into logarithmically spaced buckets, so any quantile is
+    returned within `relative_accuracy` of the true value, and two sketches
+    merge by adding bucket counts. Stored as JSON on ModelPerformance.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = defaultdict(int)
+        self.zero_count = 0
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value, count=1):
+        if value <= MIN_TRACKED_VALUE:
+            self.zero_count += count
+        else:
+            self.bins[math.ceil(math.log(value) / self._log_gamma)] += count
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.zero_count += other.zero_count
+        for index, count in other.bins.items():
+            self.bins[index] += count
+
+    def quantile(self, q):
+        """Value at quantile q (0..1), or None for an empty sketch"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def count_at_most(self, value):
+        """Number of values <= value, judged by bucket midpoints"""
+        return self.zero_count + sum(
+            count for index, count in self.bins.items()
+            if 2 * self.gamma ** index / (self.gamma + 1) <= value
+        )
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'bins': {str(index): count for index, count in self.bins.items() if count},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('relative_accuracy', DEFAULT_RELATIVE_ACCURACY)) if data else cls()
+        if data:
+            sketch.zero_count = data.get('zero_count', 0)
+            for index, count in data.get('bins', {}).items():
+                sketch.bins[int(index)] = count
+        return sketch
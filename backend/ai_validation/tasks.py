@@ -1,85 +1,294 @@
+import time
 from celery import shared_task
+from celery.signals import worker_process_init
 from django.utils import timezone
 from core.models import DailyCheckIn
+from .backends import prewarm_validation_backend
 from .models import ValidationLog
-from .services import AIService
+from .performance import stage_timer
+from .services import AIService, AsyncAIService
+from .resilience import deferral_countdown
 
-@shared_task
-def validate_checkin_task(checkin_id):
+@worker_process_init.connect
+def prewarm_worker_process(**kwargs):
+    """Configure the model client in each new worker process before it takes tasks.
+
+    On a thread, as worker_process_init handlers must return within a few seconds.
+    """
+    prewarm_validation_backend(background=True)
+
+def apply_validation_result(ai_service, checkin, result, queued_at=None):
+    """Store a validation result on the check-in and log the decision.
+    
+    `queued_at` is the epoch time the validation was queued, recorded as
+    the log's queue wait. Returns the ValidationLog, if one was written.
+    """
+    timings = result.setdefault('timings', {})
+    if queued_at is not None:
+        timings['queue_wait'] = max(time.time() - queued_at - result.get('processing_time', 0), 0.0)
+    
+    if result['success']:
+        checkin.ai_confidence = result['confidence']
+        checkin.ai_feedback = result['explanation']
+        checkin.is_approved = result['is_approved']
+        checkin.validated_at = timezone.now()
+        with stage_timer(timings, 'db_write'):
+            checkin.save()
+    
+    validation_rule = ai_service._get_validation_rule(checkin)
+    if validation_rule:
+        return ai_service.log_validation(checkin, validation_rule, result)
+    return None
+
+def validation_result_payload(result):
+    """API representation of a validation result"""
+    return {
+        'success': result['success'],
+        'is_approved': result['is_approved'],
+        'confidence': result['confidence'],
+        'feedback': result['explanation'],
+        'from_cache': result.get('from_cache', False),
+        'error': result.get('error')
+    }
+
+@shared_task(bind=True, max_retries=10)
+def run_validation_job(self, job_id):
+    """Run a validation submitted through ValidateCheckInView"""
+    from .models import ValidationJob
+    
+    try:
+        job = ValidationJob.objects.select_related('checkin__habit').get(id=job_id)
+    except ValidationJob.DoesNotExist:
+        return {'error': 'Validation job not found', 'job_id': job_id}
+    if job.is_finished:
+        return {'job_id': job_id, 'status': job.status}
+    
+    ValidationJob.objects.filter(id=job_id).update(status='running', updated_at=timezone.now())
+    try:
+        ai_service = AIService()
+        result = ai_service.validate_checkin(job.checkin)
+        if not result.get('deferred'):
+            apply_validation_result(ai_service, job.checkin, result, job.created_at.timestamp())
+    except Exception as e:
+        result = {'success': False, 'is_approved': False, 'confidence': 0.0,
+                  'explanation': f"Validation failed: {str(e)}", 'error': str(e)}
+    
+    if result.get('deferred') and self.request.retries < self.max_retries:
+        # Circuit breaker is open: keep the job open and try again later
+        countdown = deferral_countdown(result['retry_after'])
+        ValidationJob.objects.filter(id=job_id).update(
+            status='deferred',
+            result={'retry_after': int(countdown) + 1},
+            updated_at=timezone.now()
+        )
+        raise self.retry(countdown=countdown)
+    
+    status = 'completed' if result['success'] else 'failed'
+    ValidationJob.objects.filter(id=job_id).update(
+        status=status,
+        result=validation_result_payload(result),
+        updated_at=timezone.now()
+    )
+    return {'job_id': job_id, 'status': status}
+
+@shared_task(bind=True, max_retries=10)
+def validate_checkin_task(self, checkin_id, queued_at=None):
     """Async task to validate a check-in"""
     try:
         checkin = DailyCheckIn.objects.get(id=checkin_id)
         ai_service = AIService()
         result = ai_service.validate_checkin(checkin)
         
-        if result['success']:
-            checkin.ai_confidence = result['confidence']
-            checkin.ai_feedback = result['explanation']
-            checkin.is_approved = result['is_approved']
-            checkin.validated_at = timezone.now()
-            checkin.save()
-        
-        return {
-            'checkin_id': checkin_id,
-            'success': result['success'],
-            'is_approved': result.get('is_approved', False),
-            'confidence': result.get('confidence', 0)
-        }
+        if not result.get('deferred'):
+            apply_validation_result(ai_service, checkin, result, queued_at)
+            
+            return {
+                'checkin_id': checkin_id,
+                'success': result['success'],
+                'is_approved': result.get('is_approved', False),
+                'confidence': result.get('confidence', 0)
+            }
         
     except DailyCheckIn.DoesNotExist:
         return {'error': 'Check-in not found', 'checkin_id': checkin_id}
     except Exception as e:
         return {'error': str(e), 'checkin_id': checkin_id}
+    
+    # Circuit breaker is open: try again after it may have recovered
+    raise self.retry(countdown=deferral_countdown(result['retry_after']))
 
-@shared_task
-def generate_weekly_insights_task():
-    """Generate weekly insights for all active users"""
-    from django.contrib.auth import get_user_model
-    from core.models import ProgressInsight
-    from .services import InsightGenerator
+@shared_task(bind=True, max_retries=10)
+def validate_checkins_batch_task(self, checkin_ids):
+    """Validate many check-ins concurrently inside one worker.
     
-    User = get_user_model()
-    insight_generator = InsightGenerator()
+    Check-ins deferred while the circuit breaker is open are retried up to
+    max_retries times, then logged as failed for the retry sweeper.
+    """
+    checkins = list(
+        DailyCheckIn.objects.filter(id__in=checkin_ids).select_related('habit')
+    )
+    ai_service = AsyncAIService()
+    results = ai_service.validate_checkins(checkins)
     
-    active_users = User.objects.filter(
-        is_active=True,
-        goals__is_active=True
-    ).distinct()
+    summary = []
+    deferred = []
+    for checkin in checkins:
+        result = results[checkin.id]
+        if result.get('deferred'):
+            if self.request.retries < self.max_retries:
+                deferred.append(checkin.id)
+                continue
+            result = dict(result, deferred=False)
+        try:
+            apply_validation_result(ai_service, checkin, result)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        
+        summary.append({
+            'checkin_id': checkin.id,
+            'success': result['success'],
+            'is_approved': result.get('is_approved', False),
+            'confidence': result.get('confidence', 0)
+        })
     
-    insights_created = 0
+    if deferred:
+        # Circuit breaker is open: try again with what was not validated
+        retry_after = max(results[checkin_id]['retry_after'] for checkin_id in deferred)
+        raise self.retry(args=(deferred,), countdown=deferral_countdown(retry_after))
     
-    for user in active_users:
-        try:
-            insights_data = insight_generator.generate_weekly_insights(user)
-            
-            ProgressInsight.objects.create(
-                user=user,
-                insight_type='general_insight',
-                title='Weekly Progress Insights',
-                description=insights_data.get('suggestion', ''),
-                data=insights_data,
-                is_actionable=True,
-                action_title=insights_data.get('suggestion', 'Weekly suggestion'),
-                action_description=insights_data.get('improvement_area', '')
+    found_ids = {checkin.id for checkin in checkins}
+    return {
+        'results': summary,
+        'not_found': [checkin_id for checkin_id in checkin_ids if checkin_id not in found_ids]
+    }
+
+def queue_checkin_validation(checkin):
+    """Schedule AI validation, sharing a prompt with other text check-ins when enabled"""
+    from django.conf import settings
+    from .batching import text_batch_collector
+    
+    if (
+        settings.AI_TEXT_BATCHING_ENABLED
+        and checkin.habit.validation_method == 'text'
+        and text_batch_collector.add(checkin.id)
+    ):
+        return
+    validate_checkin_task.delay(checkin.id, queued_at=time.time())
+
+@shared_task
+def validate_text_batch_task(batch_id):
+    """Validate a collected batch of text check-ins with one model call"""
+    from .batching import text_batch_collector
+    
+    checkin_ids = text_batch_collector.drain(batch_id)
+    checkins = list(
+        DailyCheckIn.objects.filter(id__in=checkin_ids).select_related('habit')
+    )
+    if not checkins:
+        return {'results': [], 'deferred': []}
+    
+    ai_service = AIService()
+    results = ai_service.validate_text_batch(checkins)
+    
+    summary = []
+    deferred = []
+    for checkin in checkins:
+        result = results[checkin.id]
+        if result.get('deferred'):
+            # Circuit breaker is open: retry on its own after the cool-down
+            deferred.append(checkin.id)
+            validate_checkin_task.apply_async(
+                (checkin.id,), countdown=deferral_countdown(result['retry_after'])
             )
-            
-            insights_created += 1
-            
+            continue
+        try:
+            apply_validation_result(ai_service, checkin, result)
         except Exception as e:
-            print(f"Failed to generate insights for user {user.email}: {str(e)}")
+            result = {'success': False, 'error': str(e)}
+        
+        summary.append({
+            'checkin_id': checkin.id,
+            'success': result['success'],
+            'is_approved': result.get('is_approved', False),
+            'confidence': result.get('confidence', 0)
+        })
     
-    return {'insights_created': insights_created, 'total_users': active_users.count()}
+    return {'results': summary, 'deferred': deferred}
+
+@shared_task
+def generate_weekly_insights_task():
+    """Fan weekly insights out over chunk tasks, resuming an interrupted run"""
+    from celery import group
+    from .insight_runs import start_insight_run
+    
+    run, chunk_ids = start_insight_run()
+    if chunk_ids:
+        group(generate_insights_chunk.s(chunk_id) for chunk_id in chunk_ids).apply_async()
+    
+    return {'run_id': run.id, 'chunks': len(chunk_ids), 'total_users': run.total_users}
+
+@shared_task(bind=True, max_retries=3)
+def generate_insights_chunk(self, chunk_id):
+    """Generate weekly insights for one chunk of an InsightRun"""
+    from .insight_runs import fail_insight_chunk, process_insight_chunk
+    
+    try:
+        result = process_insight_chunk(chunk_id)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=60)
+        fail_insight_chunk(chunk_id, e)
+        return {'chunk_id': chunk_id, 'error': str(e)}
+    
+    if result.get('deferred'):
+        # Circuit breaker is open: take the chunk again later without using up a retry
+        generate_insights_chunk.apply_async((chunk_id,), countdown=deferral_countdown(result['retry_after']))
+    return result
 
 @shared_task
 def cleanup_old_cache_entries():
-    """Clean up old cache entries"""
-    from .models import ValidationCache
-    from django.utils import timezone
-    from datetime import timedelta
+    """Expire unused cache entries and evict down to the ValidationCache budget"""
+    from .cache_eviction import evict_validation_cache
     
-    cutoff_date = timezone.now() - timedelta(days=30)
-    deleted_count, _ = ValidationCache.objects.filter(
-        last_used__lt=cutoff_date
-    ).delete()
+    report = evict_validation_cache()
+    if report.get('skipped'):
+        return report
+    return dict(report, deleted_count=report['expired'] + report['evicted'])
+
+@shared_task
+def sweep_failed_validations():
+    """Queue paced retries of failed validations whose backoff has elapsed"""
+    from .retries import sweep_failed_validations as sweep
+    
+    return sweep()
+
+@shared_task
+def retry_validation_task(log_id):
+    """Retry one failed validation queued by the sweeper or the retry API"""
+    from .retries import retry_validation
+    
+    try:
+        result = retry_validation(log_id)
+    except ValidationLog.DoesNotExist:
+        return {'error': 'Validation log not found', 'log_id': log_id}
+    return {
+        'log_id': log_id,
+        'success': result['success'],
+        'deferred': result.get('deferred', False),
+        'is_approved': result.get('is_approved', False)
+    }
+
+@shared_task
+def flush_model_performance():
+    """Fold buffered validation outcomes into ModelPerformance"""
+    from .performance import flush_performance_events
+    
+    return {'flushed_events': flush_performance_events()}
+
+@shared_task
+def archive_old_validation_logs():
+    """Move validation logs past the retention window into archive files"""
+    from .archive import archive_validation_logs
     
-    return {'deleted_count': deleted_count}
\ No newline at end of file
+    result = archive_validation_logs()
+    return {'archived': result['archived'], 'files': len(result['files'])}
@@ -5,11 +5,19 @@ app_name = 'ai'
 
 urlpatterns = [
     path('validate-checkin/', views.ValidateCheckInView.as_view(), name='validate-checkin'),
+    path('validation-jobs/<uuid:job_id>/', views.ValidationJobStatusView.as_view(), name='validation-job'),
+    path('validation-jobs/<uuid:job_id>/events/', views.validation_job_events, name='validation-job-events'),
     path('manual-validation/', views.ManualValidationView.as_view(), name='manual-validation'),
     path('generate-insights/', views.GenerateInsightsView.as_view(), name='generate-insights'),
     path('ai-feedback/', views.AIFeedbackCreateView.as_view(), name='ai-feedback-list'),
     path('validation-logs/', views.UserValidationLogsView.as_view(), name='validation-logs'),
+    path('validation-logs/<int:pk>/', views.ValidationLogDetailView.as_view(), name='validation-log-detail'),
     path('ai-performance/', views.AIPerformanceView.as_view(), name='ai-performance'),
     path('clear-cache/', views.ClearValidationCacheView.as_view(), name='clear-cache'),
+    path('cache-stats/', views.ValidationCacheStatsView.as_view(), name='cache-stats'),
+    path('parser-stats/', views.ResponseParserStatsView.as_view(), name='parser-stats'),
+    path('metrics/', views.metrics, name='metrics'),
     path('retry-validation/<int:log_id>/', views.RetryFailedValidationView.as_view(), name='retry-validation'),
+    path('validation-retries/', views.BulkRetryValidationView.as_view(), name='validation-retries'),
+    path('validation-retries/<uuid:batch_id>/', views.RetryBatchStatusView.as_view(), name='validation-retry'),
 ]
@@ -1,17 +1,44 @@
+import asyncio
+import hmac
+import json
+import time
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.db.models import Avg
 from django.utils import timezone
-from .models import AIConfig, ValidationRule, ValidationLog, AITrainingData, AIFeedback, ModelPerformance
+from .models import AIConfig, ValidationRule, ValidationLog, ValidationJob, RetryBatch, AITrainingData, AIFeedback, ModelPerformance
 from .serializers import (
     ValidationRequestSerializer, ManualValidationSerializer, InsightGenerationSerializer,
-    AIFeedbackSerializer, ValidationLogSerializer, ModelPerformanceSerializer
+    AIFeedbackSerializer, ValidationLogSerializer, ValidationLogDetailSerializer, ModelPerformanceSerializer,
+    ValidationJobSerializer, RetryBatchRequestSerializer, RetryBatchSerializer
 )
+from .retries import claim_retry, failed_validations, retry_validation, start_retry_batch
+from .resilience import CircuitOpenError
 from .services import AIService, InsightGenerator
+from .tasks import (
+    apply_validation_result, retry_validation_task, run_validation_job, sweep_failed_validations,
+    validation_result_payload
+)
 from core.models import DailyCheckIn, ProgressInsight
 
+def _service_unavailable_response(result):
+    """503 for validations deferred while the AI circuit breaker is open"""
+    retry_after = int(result['retry_after']) + 1
+    response = Response({
+        'success': False,
+        'error': result['error'],
+        'retry_after': retry_after
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(retry_after)
+    return response
+
 class ValidateCheckInView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -34,42 +61,104 @@ class ValidateCheckInView(APIView):
                 'confidence': checkin.ai_confidence
             })
         
-        # Perform AI validation
+        if not settings.AI_VALIDATION_ASYNC:
+            return self._validate_now(checkin)
+        
+        # Hand the model call to a worker; the client follows the job
+        job = ValidationJob.objects.create(checkin=checkin)
+        try:
+            run_validation_job.delay(str(job.id))
+        except Exception as e:
+            job.status = 'failed'
+            job.result = {'success': False, 'error': f"Could not queue validation: {str(e)}"}
+            job.save()
+            return Response({
+                'success': False,
+                'error': 'Validation queue unavailable'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        data = ValidationJobSerializer(job, context={'request': request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['status_url']})
+    
+    def _validate_now(self, checkin):
+        """Validate inside the request (AI_VALIDATION_ASYNC=False)"""
         ai_service = AIService()
-        result = ai_service.validate_checkin(checkin)
-        
-        # Update check-in with results
-        if result['success']:
-            checkin.ai_confidence = result['confidence']
-            checkin.ai_feedback = result['explanation']
-            checkin.is_approved = result['is_approved']
-            checkin.validated_at = timezone.now()
-            checkin.save()
-            
-            # Create validation log
-            validation_rule = ai_service._get_validation_rule(checkin)
-            if validation_rule:
-                ValidationLog.objects.create(
-                    checkin=checkin,
-                    validation_rule=validation_rule,
-                    input_data_preview=ai_service._get_input_preview(checkin),
-                    ai_response_raw=result.get('raw_response', ''),
-                    ai_response_parsed=result.get('parsed_data', {}),
-                    confidence_score=result['confidence'],
-                    is_approved=result['is_approved'],
-                    processing_time=result.get('processing_time', 0),
-                    success=True,
-                    completed_at=timezone.now()
-                )
+        result = ai_service.validate_checkin(
+            checkin,
+            stream=settings.AI_STREAM_INTERACTIVE_VALIDATIONS
+        )
         
-        return Response({
-            'success': result['success'],
-            'is_approved': result['is_approved'],
-            'confidence': result['confidence'],
-            'feedback': result['explanation'],
-            'from_cache': result.get('from_cache', False),
-            'error': result.get('error')
-        })
+        if result.get('deferred'):
+            return _service_unavailable_response(result)
+        
+        # Update check-in with results and record the decision, including
+        # failures so they can be retried
+        validation_log = apply_validation_result(ai_service, checkin, result)
+        ai_service.complete_explanation(checkin, result, validation_log)
+        
+        return Response(validation_result_payload(result))
+
+class ValidationJobStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(
+            ValidationJob,
+            id=job_id,
+            checkin__habit__goal__user=request.user
+        )
+        return Response(ValidationJobSerializer(job, context={'request': request}).data)
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _authenticate_event_stream(request):
+    """Resolve the user from a JWT Authorization header or the session"""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except Exception:
+        return None
+    if auth:
+        return auth[0]
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+async def _job_events(job_id):
+    """Emit the job status on every change until it finishes or the stream times out"""
+    deadline = time.monotonic() + settings.AI_VALIDATION_EVENTS_TIMEOUT
+    last_status = None
+    while True:
+        job = await ValidationJob.objects.filter(id=job_id).values('status', 'result').afirst()
+        if job is None:
+            yield _sse_event('error', {'detail': 'Validation job not found'})
+            return
+        if job['status'] != last_status:
+            last_status = job['status']
+            yield _sse_event('status', {'job_id': str(job_id), **job})
+        if job['status'] in ValidationJob.FINISHED_STATUSES:
+            return
+        if time.monotonic() >= deadline:
+            yield _sse_event('timeout', {'job_id': str(job_id), 'status': last_status})
+            return
+        await asyncio.sleep(settings.AI_VALIDATION_EVENTS_POLL_INTERVAL)
+
+async def validation_job_events(request, job_id):
+    """Server-Sent Events stream of a validation job.
+    
+    An async view: under backend.asgi each open stream is a coroutine, not
+    a worker thread.
+    """
+    user = await _authenticate_event_stream(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not await ValidationJob.objects.filter(id=job_id, checkin__habit__goal__user=user).aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    
+    response = StreamingHttpResponse(_job_events(job_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Let nginx pass events through unbuffered
+    return response
 
 class ManualValidationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -101,6 +190,7 @@ class ManualValidationView(APIView):
             confidence_score=1.0,
             is_approved=is_approved,
             processing_time=0,
+            decision_source='manual',
             success=True,
             completed_at=timezone.now()
         )
@@ -118,7 +208,10 @@ class GenerateInsightsView(APIView):
         serializer.is_valid(raise_exception=True)
         
         insight_generator = InsightGenerator()
-        insights_data = insight_generator.generate_weekly_insights(request.user)
+        try:
+            insights_data = insight_generator.generate_weekly_insights(request.user)
+        except CircuitOpenError as e:
+            return _service_unavailable_response({'error': str(e), 'retry_after': e.retry_after})
         
         # Save insights to database
         insight = ProgressInsight.objects.create(
@@ -145,14 +238,29 @@ class AIFeedbackCreateView(generics.CreateAPIView):
     def get_queryset(self):
         return AIFeedback.objects.filter(user=self.request.user)
 
+class ValidationLogPagination(LimitOffsetPagination):
+    default_limit = settings.AI_VALIDATION_LOG_PAGE_SIZE
+    max_limit = settings.AI_VALIDATION_LOG_MAX_PAGE_SIZE
+
 class UserValidationLogsView(generics.ListAPIView):
+    """Validation history without response payloads, newest first, paged with ?limit= and ?offset="""
     serializer_class = ValidationLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ValidationLogPagination
     
     def get_queryset(self):
         return ValidationLog.objects.filter(
             checkin__habit__goal__user=self.request.user
-        ).select_related('checkin', 'checkin__habit', 'validation_rule').order_by('-created_at')
+        ).select_related('checkin__habit__goal__user', 'validation_rule').order_by('-created_at')
+
+class ValidationLogDetailView(generics.RetrieveAPIView):
+    serializer_class = ValidationLogDetailSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return ValidationLog.objects.filter(
+            checkin__habit__goal__user=self.request.user
+        ).select_related('checkin__habit__goal__user', 'validation_rule', 'payload')
 
 class AIPerformanceView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -183,62 +291,166 @@ class AIPerformanceView(APIView):
         })
 
 class ClearValidationCacheView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAdminUser]
     
     def post(self, request):
-        from .models import ValidationCache
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        # Clear cache entries older than 30 days
-        cutoff_date = timezone.now() - timedelta(days=30)
-        deleted_count, _ = ValidationCache.objects.filter(
-            last_used__lt=cutoff_date
-        ).delete()
+        from .tasks import cleanup_old_cache_entries
         
+        # Eviction deletes in batches and can take a while; the report shows up in cache-stats
+        try:
+            task = cleanup_old_cache_entries.delay()
+        except Exception as e:
+            return Response({
+                'detail': f'Could not queue cache eviction: {str(e)}'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         return Response({
-            'detail': f'Cleared {deleted_count} old cache entries',
-            'cleared_count': deleted_count
-        })
+            'detail': 'Cache eviction queued',
+            'task_id': task.id,
+            'stats_url': request.build_absolute_uri(reverse('ai:cache-stats'))
+        }, status=status.HTTP_202_ACCEPTED)
+
+class ValidationCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        from .cache import validation_cache
+        from .cache_eviction import cache_footprint, last_eviction_report
+        rows, size = cache_footprint()
+        return Response(dict(
+            validation_cache.stats(),
+            database_rows=rows,
+            database_bytes=size,
+            last_eviction=last_eviction_report()
+        ))
+
+class ResponseParserStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        from .parsing import parse_stats
+        return Response(parse_stats.snapshot())
+
+def _metrics_access(request):
+    """401/403 response for a scrape without the metrics token or admin rights, else None"""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    header = request.headers.get('Authorization', '')
+    if settings.AI_METRICS_TOKEN and hmac.compare_digest(header, f"Bearer {settings.AI_METRICS_TOKEN}"):
+        return None
+    try:
+        auth = JWTAuthentication().authenticate(request)
+    except Exception:
+        auth = None
+    user = auth[0] if auth else request.user
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not user.is_staff:
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+    return None
+
+def metrics(request):
+    """Prometheus scrape endpoint for validation counts, tokens and latencies.
+    
+    A plain view so scrapers can send AI_METRICS_TOKEN as a bearer token
+    without it being read as a JWT; admin users are let in as well.
+    """
+    from .metrics import CONTENT_TYPE, render_metrics
+    denied = _metrics_access(request)
+    if denied is not None:
+        return denied
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
 
 class RetryFailedValidationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
-    
+
     def post(self, request, log_id):
         validation_log = get_object_or_404(
-            ValidationLog, 
+            ValidationLog,
             id=log_id,
             checkin__habit__goal__user=request.user,
             success=False
         )
-        
-        # Retry validation
-        ai_service = AIService()
-        result = ai_service.validate_checkin(validation_log.checkin)
-        
-        if result['success']:
-            # Update validation log
-            validation_log.retry_count += 1
-            validation_log.success = True
-            validation_log.confidence_score = result['confidence']
-            validation_log.is_approved = result['is_approved']
-            validation_log.ai_response_raw = result.get('raw_response', '')
-            validation_log.ai_response_parsed = result.get('parsed_data', {})
-            validation_log.processing_time = result.get('processing_time', 0)
-            validation_log.completed_at = timezone.now()
-            validation_log.save()
-            
-            # Update check-in
-            checkin = validation_log.checkin
-            checkin.ai_confidence = result['confidence']
-            checkin.ai_feedback = result['explanation']
-            checkin.is_approved = result['is_approved']
-            checkin.validated_at = timezone.now()
-            checkin.save()
-        
+
+        if not claim_retry(validation_log.id, validation_log.retry_count):
+            return Response({
+                'detail': 'A retry of this validation is already queued',
+                'retry_count': validation_log.retry_count
+            }, status=status.HTTP_409_CONFLICT)
+
+        if not settings.AI_VALIDATION_ASYNC:
+            result = retry_validation(validation_log.id)
+            if result.get('deferred'):
+                return _service_unavailable_response(result)
+            validation_log.refresh_from_db(fields=['retry_count'])
+            return Response({
+                'success': result['success'],
+                'is_approved': result.get('is_approved', False),
+                'confidence': result.get('confidence', 0),
+                'retry_count': validation_log.retry_count
+            })
+
+        # Retried by a worker; the outcome lands on the validation log
+        try:
+            retry_validation_task.delay(validation_log.id)
+        except Exception as e:
+            ValidationLog.objects.filter(id=validation_log.id).update(retry_queued_at=None)
+            return Response({
+                'success': False,
+                'error': f'Validation queue unavailable: {str(e)}'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        status_url = request.build_absolute_uri(reverse('ai:validation-log-detail', args=[validation_log.id]))
         return Response({
-            'success': result['success'],
-            'is_approved': result.get('is_approved', False),
-            'confidence': result.get('confidence', 0),
-            'retry_count': validation_log.retry_count
-        })
\ No newline at end of file
+            'detail': 'Retry queued',
+            'log_id': validation_log.id,
+            'retry_count': validation_log.retry_count + 1,
+            'status_url': status_url
+        }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+class BulkRetryValidationView(APIView):
+    """Retry every failed validation matching the filters, paced by the retry sweeper.
+
+    Staff may retry any user's validations and start their attempts over;
+    other users only retry their own, within the usual attempt cap.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = RetryBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+
+        logs = failed_validations()
+        if not request.user.is_staff:
+            logs = logs.filter(checkin__habit__goal__user=request.user)
+        if 'validation_type' in filters:
+            logs = logs.filter(validation_rule__validation_type=filters['validation_type'])
+        if 'validation_rule' in filters:
+            logs = logs.filter(validation_rule=filters['validation_rule'])
+        if 'created_after' in filters:
+            logs = logs.filter(created_at__gte=filters['created_after'])
+        if 'created_before' in filters:
+            logs = logs.filter(created_at__lt=filters['created_before'])
+        if 'error_contains' in filters:
+            logs = logs.filter(error_message__icontains=filters['error_contains'])
+
+        batch = start_retry_batch(
+            logs,
+            requested_by=request.user,
+            filters=dict(serializer.data),
+            reset_attempts=request.user.is_staff
+        )
+        try:
+            sweep_failed_validations.delay()
+        except Exception:
+            pass  # The scheduled sweep picks the batch up
+
+        data = RetryBatchSerializer(batch, context={'request': request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['status_url']})
+
+class RetryBatchStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, batch_id):
+        batches = RetryBatch.objects.all() if request.user.is_staff else RetryBatch.objects.filter(requested_by=request.user)
+        batch = get_object_or_404(batches, id=batch_id)
+        return Response(RetryBatchSerializer(batch, context={'request': request}).data)
\ No newline at end of file
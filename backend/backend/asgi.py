@@ -3,6 +3,11 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the API from here, e.g.
+``gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker``, so
+validation job event streams (/api/ai/validation-jobs/<id>/events/) run as
+coroutines instead of each holding a worker.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -105,6 +105,25 @@ else:
     }
 
 
+# Cache
+# Use Redis when REDIS_URL is set so workers share cached results
+
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -169,6 +188,139 @@ AUTH_USER_MODEL = 'users.User'
 # AI Services Configuration
 GOOGLE_AI_API_KEY = os.getenv('GOOGLE_AI_API_KEY')
 
+# Model backend: GeminiBackend, or FakeGeminiBackend for offline load tests
+AI_VALIDATION_BACKEND = os.getenv('AI_VALIDATION_BACKEND', 'ai_validation.backends.GeminiBackend')
+AI_GEMINI_TRANSPORT = os.getenv('AI_GEMINI_TRANSPORT', 'grpc')  # grpc (one persistent HTTP/2 channel) or rest
+# Warm the model client when a web process starts; Celery worker processes always do
+AI_CLIENT_PREWARM = os.getenv('AI_CLIENT_PREWARM', 'False').lower() == 'true'
+AI_CLIENT_PREWARM_TIMEOUT = 10  # Seconds for the warm-up request
+AI_FAKE_BACKEND = {
+    'LATENCY': os.getenv('AI_FAKE_LATENCY', 'lognormal:0.8:0.4'),  # fixed:<s>, uniform:<lo>:<hi>, lognormal:<median>:<sigma>
+    'ERROR_RATE': float(os.getenv('AI_FAKE_ERROR_RATE', '0')),
+    'ERROR': os.getenv('AI_FAKE_ERROR', 'quota'),  # quota, unavailable or invalid
+    'SEED': os.getenv('AI_FAKE_SEED'),
+    'RESPONSES': {},  # Validation type -> canned verdict, e.g. {'photo': {'confidence': 0.4, ...}}
+}
+
+AI_VALIDATION_CONCURRENCY = int(os.getenv('AI_VALIDATION_CONCURRENCY', '16'))  # Concurrent model calls per batch
+
+# ValidateCheckInView queues a ValidationJob and returns 202; False validates in the request
+AI_VALIDATION_ASYNC = os.getenv('AI_VALIDATION_ASYNC', 'True').lower() == 'true'
+AI_VALIDATION_EVENTS_POLL_INTERVAL = 0.5  # Seconds between job status checks in the SSE stream
+AI_VALIDATION_EVENTS_TIMEOUT = 60  # Seconds before an SSE stream is closed; clients reconnect
+
+# Streamed interactive validations: respond once the verdict fields arrive
+AI_STREAM_INTERACTIVE_VALIDATIONS = os.getenv('AI_STREAM_INTERACTIVE_VALIDATIONS', 'False').lower() == 'true'
+AI_STREAM_EXPLANATION = os.getenv('AI_STREAM_EXPLANATION', 'background')  # background or drop
+AI_STREAM_BACKGROUND_WORKERS = 4
+
+# Text check-ins sharing one prompt
+AI_TEXT_BATCHING_ENABLED = os.getenv('AI_TEXT_BATCHING_ENABLED', 'False').lower() == 'true'
+AI_TEXT_BATCH_MAX_SIZE = int(os.getenv('AI_TEXT_BATCH_MAX_SIZE', '10'))
+AI_TEXT_BATCH_WINDOW = float(os.getenv('AI_TEXT_BATCH_WINDOW', '2'))  # Seconds to wait for more check-ins
+
+# Gemini call protection: shared rate limit, retries and circuit breaker
+AI_RATE_LIMIT_PER_SECOND = int(os.getenv('AI_RATE_LIMIT_PER_SECOND', '10'))  # Across all processes
+AI_RETRY_MAX_ATTEMPTS = 3
+AI_RETRY_BASE_DELAY = 0.5  # Seconds, doubled per attempt with full jitter
+AI_RETRY_MAX_DELAY = 8
+AI_CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive transient failures before failing fast
+AI_CIRCUIT_RESET_TIMEOUT = 30  # Seconds before a probe call is allowed
+
+# Failed validations, retried by the sweeper with exponential backoff
+AI_VALIDATION_RETRY_SWEEP_INTERVAL = 60  # Seconds between sweeps; a sweep's retries are spread over it
+AI_VALIDATION_RETRY_CONCURRENCY = int(os.getenv('AI_VALIDATION_RETRY_CONCURRENCY', '10'))  # In flight, all workers
+AI_VALIDATION_RETRY_MAX_ATTEMPTS = 5
+AI_VALIDATION_RETRY_BASE_DELAY = 60  # Seconds before the first retry, doubled per attempt
+AI_VALIDATION_RETRY_MAX_DELAY = 6 * 60 * 60
+AI_VALIDATION_RETRY_LEASE = 10 * 60  # Seconds before a queued retry that never finished counts as lost
+AI_VALIDATION_RETRY_MAX_AGE_HOURS = 72  # Older failures are only retried through the bulk retry API
+
+# Seconds between checks of the shared ValidationRule version
+AI_RULE_REGISTRY_CHECK_INTERVAL = 5
+AI_RULE_REGISTRY_LOCAL_TTL = 60  # Seconds rules are kept when the cache is process-local and versions do not propagate
+
+# Coalescing of identical in-flight validations across processes
+AI_SINGLE_FLIGHT_LEASE_MARGIN = 5  # Seconds past the rule's max_processing_time that the lock is held
+AI_SINGLE_FLIGHT_RESULT_TTL = 30  # Seconds a finished result stays available to waiters
+AI_SINGLE_FLIGHT_POLL_INTERVAL = 0.1
+
+# Photo preprocessing before upload to the model
+AI_PHOTO_MAX_EDGE = int(os.getenv('AI_PHOTO_MAX_EDGE', '1024'))  # Pixels, longest side
+AI_PHOTO_JPEG_QUALITY = int(os.getenv('AI_PHOTO_JPEG_QUALITY', '80'))
+
+# Local audio analysis before the model (ai_validation/audio.py)
+AI_AUDIO_MIN_DURATION = 2  # Seconds; shorter recordings are rejected without a model call
+AI_AUDIO_MIN_TARGET_SHARE = 0.5  # Share of habit.target_duration a recording must reach
+AI_AUDIO_MAX_ANALYZED_SECONDS = 300  # Audio decoded for energy features; duration covers the whole file
+AI_AUDIO_MAX_INLINE_BYTES = 19 * 1024 * 1024  # Gemini accepts inline requests up to 20 MB; larger audio is compressed to fit
+
+# Screen recordings: keyframes sampled with ffmpeg/ffprobe instead of the video. Install both on
+# web and worker hosts (e.g. apt-get install ffmpeg); without them the whole video is sent
+AI_SCREEN_MAX_FRAMES = 8  # Frames sent per recording, whatever its length
+AI_SCREEN_FRAME_MAX_EDGE = 768  # Longest frame side in pixels
+AI_SCREEN_DECODE_TIMEOUT = 120  # Seconds ffmpeg may spend on one recording
+AI_SCREEN_MAX_INLINE_BYTES = 19 * 1024 * 1024  # Largest video sent whole when ffmpeg is missing
+
+# Weekly insights, fanned out over one Celery task per chunk of users
+AI_INSIGHT_BATCH_SIZE = 200  # Users per chunk task, whose analysis data is gathered together
+AI_INSIGHT_CONCURRENCY = 4  # Concurrent model calls per chunk task (per worker process)
+AI_INSIGHT_TIMEOUT = 30  # Seconds for one user's insight call, retries included
+AI_INSIGHT_RUN_RESUME_HOURS = 48  # Older unfinished runs are abandoned, not resumed
+AI_INSIGHT_CHUNK_LEASE = 60 * 60  # Seconds before a claimed chunk whose task died can be taken over
+AI_INSIGHT_CHUNK_MAX_DEFERRALS = 10  # Times a chunk waits out the circuit breaker before it counts as failed
+
+# Validation result cache: per-process LRU -> Django cache -> ValidationCache table
+AI_VALIDATION_LRU_SIZE = int(os.getenv('AI_VALIDATION_LRU_SIZE', '2048'))
+AI_VALIDATION_LRU_TTL = 5 * 60  # Seconds a process serves a verdict locally; bounds staleness eviction cannot reach
+AI_VALIDATION_LRU_CHECK_INTERVAL = 5  # Seconds between checks for evictions made by other processes
+AI_VALIDATION_CACHE_TTL = int(os.getenv('AI_VALIDATION_CACHE_TTL', '3600'))  # Seconds in the shared tier
+AI_VALIDATION_USAGE_FLUSH_EVERY = 100  # Buffered cache hits before writing usage counts
+AI_VALIDATION_USAGE_FLUSH_INTERVAL = 60  # Seconds between usage write-backs
+
+# ValidationCache table budget, enforced by the cleanup_old_cache_entries task
+AI_VALIDATION_CACHE_MAX_ROWS = int(os.getenv('AI_VALIDATION_CACHE_MAX_ROWS', '100000'))
+AI_VALIDATION_CACHE_MAX_BYTES = int(os.getenv('AI_VALIDATION_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))  # Approximate
+AI_VALIDATION_CACHE_MAX_AGE_DAYS = 30  # Rows unused this long are removed whatever the budget
+AI_VALIDATION_CACHE_PROTECTED_USES = 3  # Rows used this often are evicted only after all less used rows
+AI_VALIDATION_CACHE_EVICTION_BATCH_SIZE = 500  # Rows deleted per transaction
+AI_VALIDATION_CACHE_EVICTION_INTERVAL = 60 * 60  # Seconds between scheduled runs
+
+# ModelPerformance aggregation from the PerformanceEvent buffer
+AI_PERFORMANCE_FLUSH_INTERVAL = 60  # Seconds between flushes
+AI_PERFORMANCE_FLUSH_BATCH_SIZE = 1000  # Events applied per transaction
+
+# Prometheus scrape endpoint (/api/ai/metrics/): admin users, or this bearer token when set
+AI_METRICS_TOKEN = os.getenv('AI_METRICS_TOKEN', '')
+AI_METRICS_LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)  # Seconds
+
+# ValidationLog response payloads and retention
+AI_VALIDATION_LOG_COMPRESSION_LEVEL = 6  # zlib level for ValidationLogPayload
+AI_VALIDATION_LOG_RETENTION_DAYS = int(os.getenv('AI_VALIDATION_LOG_RETENTION_DAYS', '90'))
+AI_VALIDATION_LOG_ARCHIVE_CHUNK_SIZE = 1000  # Logs archived and deleted per batch
+AI_VALIDATION_LOG_ARCHIVE_DIR = 'validation_log_archive'  # In default file storage
+AI_VALIDATION_LOG_PAGE_SIZE = 50  # Validation history entries per page unless ?limit= asks otherwise
+AI_VALIDATION_LOG_MAX_PAGE_SIZE = 200
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-model-performance': {
+        'task': 'ai_validation.tasks.flush_model_performance',
+        'schedule': AI_PERFORMANCE_FLUSH_INTERVAL,
+    },
+    'sweep-failed-validations': {
+        'task': 'ai_validation.tasks.sweep_failed_validations',
+        'schedule': AI_VALIDATION_RETRY_SWEEP_INTERVAL,
+    },
+    'evict-validation-cache': {
+        'task': 'ai_validation.tasks.cleanup_old_cache_entries',
+        'schedule': AI_VALIDATION_CACHE_EVICTION_INTERVAL,
+    },
+    'archive-old-validation-logs': {
+        'task': 'ai_validation.tasks.archive_old_validation_logs',
+        'schedule': 24 * 60 * 60,
+    },
+}
+
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
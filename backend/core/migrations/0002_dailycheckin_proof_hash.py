@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailycheckin',
+            name='proof_hash',
+            field=models.CharField(blank=True, help_text='SHA256 of the proof content, set at upload time', max_length=64),
+        ),
+    ]
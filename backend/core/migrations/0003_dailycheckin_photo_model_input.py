@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_dailycheckin_proof_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailycheckin',
+            name='photo_model_input',
+            field=models.FileField(blank=True, help_text='Downscaled, EXIF-stripped photo sent to the AI', null=True, upload_to='checkin_photos/model_input/'),
+        ),
+    ]
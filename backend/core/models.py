@@ -1,3 +1,4 @@
+import hashlib
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -156,6 +157,8 @@ class DailyCheckIn(models.Model):
     audio_proof = models.FileField(upload_to='checkin_audio/', null=True, blank=True)
     text_proof = models.TextField(blank=True)
     screen_recording_proof = models.FileField(upload_to='screen_recordings/', null=True, blank=True)
+    photo_model_input = models.FileField(upload_to='checkin_photos/model_input/', null=True, blank=True, help_text="Downscaled, EXIF-stripped photo sent to the AI")
+    proof_hash = models.CharField(max_length=64, blank=True, help_text="SHA256 of the proof content, set at upload time")
     
     # AI Validation results
     ai_confidence = models.FloatField(null=True, blank=True, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
@@ -187,15 +190,74 @@ class DailyCheckIn(models.Model):
     def __str__(self):
         return f"{self.habit.title} - {self.date}"
     
+    PROOF_FILE_FIELDS = ('photo_proof', 'audio_proof', 'screen_recording_proof')
+    PROOF_FIELDS = PROOF_FILE_FIELDS + ('text_proof',)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_proof()
+        return instance
+    
+    def _remember_proof(self):
+        # Raw values, so deferred fields are not loaded and files not opened
+        self._loaded_proof = {
+            name: getattr(self.__dict__[name], 'name', self.__dict__[name]) or ''
+            for name in self.PROOF_FIELDS if name in self.__dict__
+        }
+    
+    def proof_changed(self):
+        """Whether the proof differs from what was loaded, so proof_hash is stale"""
+        loaded = getattr(self, '_loaded_proof', None)
+        if loaded is None:
+            return not self.proof_hash
+        for name, value in loaded.items():
+            proof = getattr(self, name)
+            if name in self.PROOF_FILE_FIELDS:
+                if (proof.name or '') != value or (proof and not proof._committed):
+                    return True
+            elif proof != value:
+                return True
+        return False
+    
     def save(self, *args, **kwargs):
         if self.is_approved and not self.completed_at:
             self.completed_at = timezone.now()
+        if self.proof_changed():
+            self.proof_hash = self.compute_proof_hash()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'proof_hash' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'proof_hash']
         super().save(*args, **kwargs)
+        self._remember_proof()
         
         # Update habit streak when check-in is approved
         if self.is_approved:
             self.habit.update_streak()
 
+    def compute_proof_hash(self):
+        """Content hash of all submitted proof, streamed in chunks"""
+        if not (self.text_proof or any(getattr(self, name) for name in self.PROOF_FILE_FIELDS)):
+            return ''
+        
+        digest = hashlib.sha256()
+        for name in self.PROOF_FILE_FIELDS:
+            proof = getattr(self, name)
+            if not proof:
+                continue
+            was_closed = proof.closed
+            digest.update(f"{name}:".encode())
+            for chunk in proof.chunks():
+                digest.update(chunk)
+            if was_closed:
+                proof.close()
+        
+        if self.text_proof:
+            digest.update(b"text_proof:")
+            digest.update(self.text_proof.encode('utf-8'))
+        
+        return digest.hexdigest()
+
 class Streak(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='streaks')
     habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='streaks')
@@ -81,7 +81,7 @@ class DailyCheckInSerializer(serializers.ModelSerializer):
     class Meta:
         model = DailyCheckIn
         fields = '__all__'
-        read_only_fields = ('ai_confidence', 'ai_feedback', 'is_approved', 'validated_at', 'created_at', 'updated_at')
+        read_only_fields = ('ai_confidence', 'ai_feedback', 'is_approved', 'validated_at', 'photo_model_input', 'proof_hash', 'created_at', 'updated_at')
     
     def to_representation(self, instance):
         """Override to handle date serialization properly"""
@@ -143,10 +143,16 @@ class DailyCheckInSerializer(serializers.ModelSerializer):
         
         # Trigger AI validation if not self-report
         if not checkin.is_self_report:
-            from ai_validation.tasks import validate_checkin_task
-            validate_checkin_task.delay(checkin.id)
+            from ai_validation.tasks import queue_checkin_validation
+            queue_checkin_validation(checkin)
         
         return checkin
+    
+    def update(self, instance, validated_data):
+        # A new photo needs a fresh preprocessed model input
+        if 'photo_proof' in validated_data:
+            validated_data['photo_model_input'] = None
+        return super().update(instance, validated_data)
 
 class StreakSerializer(serializers.ModelSerializer):
     habit_title = serializers.CharField(source='habit.title', read_only=True)
@@ -253,6 +253,44 @@ class DailyCheckInTest(TestCase):
         with self.assertRaises(Exception):
             DailyCheckIn.objects.create(habit=self.habit, date=date.today())
 
+    def test_checkin_proof_hash_is_content_addressed(self):
+        from django.core.files.base import ContentFile
+        first = DailyCheckIn(habit=self.habit, date=date.today())
+        first.photo_proof.save('same_name.jpg', ContentFile(b'first image bytes'), save=True)
+        second = DailyCheckIn(habit=self.habit, date=date.today() - timedelta(days=1))
+        second.photo_proof.save('same_name.jpg', ContentFile(b'second image bytes'), save=True)
+        third = DailyCheckIn(habit=self.habit, date=date.today() - timedelta(days=2))
+        third.photo_proof.save('other_name.jpg', ContentFile(b'first image bytes'), save=True)
+
+        self.assertEqual(len(first.proof_hash), 64)
+        self.assertNotEqual(first.proof_hash, second.proof_hash)
+        self.assertEqual(first.proof_hash, third.proof_hash)
+
+    def test_checkin_without_proof_has_no_hash(self):
+        checkin = DailyCheckIn.objects.create(habit=self.habit, date=date.today())
+        self.assertEqual(checkin.proof_hash, '')
+
+    def test_checkin_proof_hash_follows_proof_changes(self):
+        checkin = DailyCheckIn.objects.create(habit=self.habit, date=date.today(), text_proof='Ran 5km')
+        original_hash = checkin.proof_hash
+
+        checkin = DailyCheckIn.objects.get(id=checkin.id)
+        checkin.notes = 'Felt good'
+        checkin.save()
+        self.assertEqual(checkin.proof_hash, original_hash)
+
+        checkin.text_proof = 'Ran 10km'
+        checkin.save(update_fields=['text_proof'])
+        checkin.refresh_from_db()
+        self.assertNotEqual(checkin.proof_hash, original_hash)
+        self.assertEqual(checkin.proof_hash, DailyCheckIn(text_proof='Ran 10km').compute_proof_hash())
+
+        # Deferred proof is neither loaded nor treated as changed
+        partial = DailyCheckIn.objects.only('id', 'habit', 'notes').get(id=checkin.id)
+        partial.notes = 'Updated'
+        partial.save(update_fields=['notes'])
+        self.assertEqual(DailyCheckIn.objects.get(id=checkin.id).proof_hash, checkin.proof_hash)
+
 # In core/tests.py - fix CheckInAPITest
 
 class CheckInAPITest(APITestCase):